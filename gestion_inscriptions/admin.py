@@ -1,12 +1,129 @@
-from django.contrib import admin
-from .models import Cours, Etudiant
+from django.contrib import admin, messages
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseRedirect
+from .forms import InscriptionForm
+from .models import Cours, Etudiant, Inscription
+from .pagination import EstimatedCountPaginator
+from .reservations import ReservationError, save_inscription
+from .search import matching_course_ids, search_courses
 
-admin.site.register(Etudiant)
 
-class CoursAdmin(admin.ModelAdmin):
-    list_display = ('id', 'nom', 'prix', 'duree', 'resume')
-    list_filter = ('nom', 'prix', 'duree','resume')
-    search_fields = ('nom', 'prix', 'duree','resume')
-    
+def _prefix(field, term):
+    """``field`` starting with ``term`` as a range, which an index serves
+    (SQLite's LIKE behind istartswith can't use one)"""
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + '\uffff'})
 
-admin.site.register(Cours, CoursAdmin)
\ No newline at end of file
+
+def student_search(term):
+    """Students with this email, or whose name starts with ``term``"""
+    if '@' in term:
+        return Q(email=term) | Q(email=term.lower())
+    return _prefix('nom', term) | _prefix('nom', term[:1].upper() + term[1:])
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelists that stay cheap on million-row tables: estimated totals,
+    no second COUNT(*) for the unfiltered total"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CoursAdmin(LargeTableAdmin):
+    list_display = (
+        'id', 'nom', 'category', 'prix', 'duree', 'max_students', 'enrolled', 'pending', 'is_full', 'is_active'
+    )
+    list_filter = ('category', 'is_active', 'occupancy__is_full')
+    list_select_related = ('occupancy',)
+    # Searched through the full-text index, see get_search_results
+    search_fields = ('nom',)
+    ordering = ('nom', 'id')
+
+    @admin.display(description='Enrolled', ordering='confirmed_count')
+    def enrolled(self, cours):
+        return cours.confirmed_count
+
+    @admin.display(description='Pending', ordering='occupancy__pending')
+    def pending(self, cours):
+        return cours.occupancy.pending if hasattr(cours, 'occupancy') else None
+
+    @admin.display(description='Full', boolean=True, ordering='occupancy__is_full')
+    def is_full(self, cours):
+        return cours.occupancy.is_full if hasattr(cours, 'occupancy') else None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_courses(queryset, search_term), False
+
+
+class EtudiantAdmin(LargeTableAdmin):
+    list_display = ('nom', 'email', 'telephone', 'registrations', 'created_at')
+    # Exact emails and name prefixes, see get_search_results
+    search_fields = ('nom', '=email')
+    ordering = ('nom', 'id')
+    autocomplete_fields = ('user',)
+
+    def get_queryset(self, request):
+        # A correlated count, run for the rows of the page only rather than
+        # grouping the whole inscription table
+        registrations = Inscription.objects.filter(etudiant=OuterRef('pk')).order_by().values(
+            'etudiant'
+        ).annotate(total=Count('pk')).values('total')
+        return super().get_queryset(request).annotate(
+            registrations=Coalesce(Subquery(registrations, output_field=IntegerField()), 0)
+        )
+
+    @admin.display(description='Registrations', ordering='registrations')
+    def registrations(self, etudiant):
+        return etudiant.registrations
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(student_search(term)), False
+
+
+class InscriptionAdminForm(InscriptionForm):
+    class Meta(InscriptionForm.Meta):
+        # The admin's autocomplete widgets instead of a <select> of every student
+        widgets = {}
+
+
+class InscriptionAdmin(LargeTableAdmin):
+    form = InscriptionAdminForm
+    list_display = ('id', 'etudiant', 'cours', 'status', 'payment_status', 'inscription_date')
+    list_filter = ('status', 'payment_status')
+    list_select_related = ('etudiant', 'cours')
+    # Student email or name prefix, or course words, see get_search_results
+    search_fields = ('etudiant__nom',)
+    autocomplete_fields = ('etudiant', 'cours')
+    # Newest first through the primary key, not a sort of the whole table
+    ordering = ('-id',)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        students = Etudiant.objects.filter(student_search(term)).values('pk')
+        return queryset.filter(Q(etudiant__in=students) | Q(cours__in=matching_course_ids(term, queryset.db))), False
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except ReservationError as e:
+            # The seat went to someone else since clean() checked the capacity,
+            # the transaction of the view was rolled back
+            self.message_user(request, f'Not saved: {e}.', messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_model(self, request, obj, form, change):
+        # Confirming claims the seat like the registration wizard does;
+        # InscriptionForm.clean() checked the capacity beforehand
+        save_inscription(obj)
+
+
+admin.site.register(Cours, CoursAdmin)
+admin.site.register(Etudiant, EtudiantAdmin)
+admin.site.register(Inscription, InscriptionAdmin)
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.models.signals import post_migrate
 
 
 class GestionInscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestion_inscriptions'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.create_course_search_index, sender=self)
+        post_migrate.connect(signals.create_auth_email_index, sender=self)
+        post_migrate.connect(signals.create_course_occupancy, sender=self)
+        if getattr(settings, 'METRICS_FLUSH_THREAD', True):
+            request_started.connect(signals.start_metrics_flusher)
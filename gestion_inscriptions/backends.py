@@ -0,0 +1,89 @@
+# backends.py - Authentication with the email address
+import logging
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import DatabaseError, connections, transaction
+from .hashing import run_hasher
+from .timing import timed
+
+logger = logging.getLogger(__name__)
+
+EMAIL_INDEX = 'auth_user_email_idx'
+EMAIL_UNIQUE_INDEX = 'auth_user_email_uniq'
+
+
+def create_email_index(using='default'):
+    """Index auth_user.email, and make non-blank emails unique when the data allows it.
+
+    auth_user belongs to django.contrib.auth, so the indexes can't be declared
+    on the model. The lookups need a plain index: SQLite can't use the partial
+    unique one for ``email = ?``, it can't tell the parameter isn't blank.
+    Returns whether emails are unique.
+    """
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        # No partial indexes: leave the column alone
+        return False
+
+    table = get_user_model()._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {EMAIL_INDEX} ON {table} (email)")
+        if EMAIL_UNIQUE_INDEX in connection.introspection.get_constraints(cursor, table):
+            return True
+        try:
+            with transaction.atomic(using=using):
+                cursor.execute(
+                    f"CREATE UNIQUE INDEX {EMAIL_UNIQUE_INDEX} ON {table} (email) WHERE email <> ''"
+                )
+            return True
+        except DatabaseError as e:
+            # Existing accounts share an email, the backend refuses to pick one of them
+            logger.warning(f"Duplicate emails in {table}, they can't be made unique: {e}")
+            return False
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with ``email`` and ``password`` in one indexed lookup.
+
+    Calls without an ``email`` are left to the other backends, so the admin
+    keeps logging in with usernames.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        users = list(get_user_model()._default_manager.filter(email=email)[:2])
+        if len(users) != 1:
+            if users:
+                logger.warning(f"Login refused: several accounts use the email {email}")
+            # Hash anyway so unknown emails take as long as wrong passwords
+            with timed('hashing'):
+                get_user_model()().set_password(password)
+            return None
+
+        user = users[0]
+        with timed('hashing'):
+            valid = user.check_password(password)
+        if valid and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None, **kwargs):
+        """Same as authenticate(), with the password hashing run in the hashing pool"""
+        if email is None or password is None:
+            return None
+
+        users = [user async for user in get_user_model()._default_manager.filter(email=email)[:2]]
+        if len(users) != 1:
+            if users:
+                logger.warning(f"Login refused: several accounts use the email {email}")
+            await run_hasher(make_password, password)
+            return None
+
+        # Unlike user.check_password(), doesn't save an upgraded hash from the pool thread
+        user = users[0]
+        if await run_hasher(check_password, password, user.password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,272 @@
+# benchmarks.py - Shared helpers for the stress and benchmark commands
+import json
+import random
+import statistics
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.test import override_settings
+from .models import Cours, Etudiant
+from .reservations import CourseFullError, reserve_seat
+
+
+@contextmanager
+def isolated_database(keepdb=False, verbosity=0):
+    """Run the body against throwaway test databases instead of the configured ones"""
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity, keepdb=keepdb)
+
+
+class BenchmarkCommand(BaseCommand):
+    """Base of the benchmark commands. handle() runs measure() against
+    throwaway test databases, prints the report it returns as JSON, and
+    writes it to --output if given. Then summarize() writes the outcome in
+    one line.
+
+    Subclasses that set up the databases themselves set ``isolated = False``
+    and use --keepdb in measure().
+    """
+    isolated = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Also write the JSON report to this file')
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the throwaway test database between runs'
+        )
+
+    def bench_settings(self, options):
+        """Settings overridden while measuring"""
+        # The test clients send Host: testserver
+        return {'ALLOWED_HOSTS': ['testserver']}
+
+    def measure(self, options):
+        raise NotImplementedError('subclasses of BenchmarkCommand must provide a measure() method')
+
+    def summarize(self, report):
+        pass
+
+    def handle(self, *args, **options):
+        databases = isolated_database(keepdb=options['keepdb']) if self.isolated else nullcontext()
+        with databases, override_settings(**self.bench_settings(options)):
+            report = self.measure(options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        self.summarize(report)
+
+
+def run_concurrently(worker, chunks):
+    """Run ``worker(chunk)`` in one thread per chunk, returns the elapsed seconds"""
+    def target(chunk):
+        try:
+            worker(chunk)
+        finally:
+            # Each thread opened its own connection
+            connection.close()
+
+    threads = [threading.Thread(target=target, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def run_reservation_stress(threads=16, attempts=400, capacity=50):
+    """Have ``attempts`` students race for the ``capacity`` seats of a single course"""
+    cours = Cours.objects.create(
+        nom="Stress Test Course",
+        prix=Decimal('10.00'),
+        duree="1 week",
+        resume="Seat reservation stress test",
+        max_students=capacity
+    )
+    Etudiant.objects.bulk_create([
+        Etudiant(
+            nom="Stress Student",
+            email=f"stress{i}@example.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        for i in range(attempts)
+    ])
+    students = list(Etudiant.objects.filter(email__startswith='stress'))
+
+    results = {'confirmed': 0, 'full': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker(chunk):
+        for student in chunk:
+            try:
+                reserve_seat(student, Cours.objects.get(pk=cours.pk))
+                outcome = 'confirmed'
+            except CourseFullError:
+                outcome = 'full'
+            except Exception:
+                outcome = 'errors'
+            with lock:
+                results[outcome] += 1
+
+    elapsed = run_concurrently(worker, [students[i::threads] for i in range(threads)])
+
+    cours.refresh_from_db()
+    stored = cours.inscriptions.filter(status='confirmed').count()
+    return {
+        'threads': threads,
+        'attempts': attempts,
+        'capacity': capacity,
+        **results,
+        'stored_confirmed': stored,
+        'seat_counter': cours.confirmed_count,
+        'overbooked': max(stored - capacity, 0),
+        'seconds': round(elapsed, 4),
+        'seats_per_second': round(results['confirmed'] / elapsed, 1) if elapsed else None,
+        'attempts_per_second': round(attempts / elapsed, 1) if elapsed else None,
+    }
+
+
+SEARCH_WORDS = [
+    'python', 'django', 'data', 'science', 'machine', 'learning', 'web', 'design',
+    'marketing', 'finance', 'english', 'french', 'spanish', 'arabic', 'painting',
+    'photography', 'physics', 'chemistry', 'biology', 'statistics', 'management',
+    'leadership', 'accounting', 'networks', 'security', 'cloud', 'mobile', 'writing',
+    'music', 'history', 'introduction', 'advanced', 'beginner', 'practical', 'workshop',
+    'javascript', 'databases', 'algorithms', 'economics', 'psychology', 'philosophy',
+    'sculpture', 'drawing', 'animation', 'video', 'editing', 'journalism', 'negotiation',
+    'sales', 'entrepreneurship', 'law', 'medicine', 'nutrition', 'astronomy', 'geology',
+    'mathematics', 'calculus', 'algebra', 'robotics', 'electronics', 'german', 'italian',
+    'chinese', 'japanese', 'portuguese', 'guitar', 'piano', 'singing', 'theatre', 'dance',
+    'cooking', 'gardening', 'architecture', 'interior', 'fashion', 'typography', 'branding',
+]
+
+
+def create_search_courses(count, seed=0, batch_size=5000):
+    """Bulk-create ``count`` courses with names and descriptions drawn from SEARCH_WORDS"""
+    rng = random.Random(seed)
+    categories = [key for key, _ in Cours.CATEGORY_CHOICES]
+    for start in range(0, count, batch_size):
+        Cours.objects.bulk_create([
+            Cours(
+                nom=' '.join(rng.choice(SEARCH_WORDS).capitalize() for _ in range(3)) + f' {i}',
+                prix=Decimal('100.00'),
+                duree='4 weeks',
+                resume=' '.join(rng.choice(SEARCH_WORDS) for _ in range(12)),
+                category=rng.choice(categories)
+            )
+            for i in range(start, min(start + batch_size, count))
+        ])
+
+
+def time_queries(run, queries, repeat=1):
+    """Latencies in milliseconds of ``run(query)`` for every query, ``repeat`` times"""
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _percentile(timings, fraction):
+    return round(timings[min(int(len(timings) * fraction), len(timings) - 1)], 3)
+
+
+def latency_summary(timings):
+    timings = sorted(timings)
+    if not timings:
+        return {'runs': 0}
+    return {
+        'runs': len(timings),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': _percentile(timings, 0.5),
+        'p95_ms': _percentile(timings, 0.95),
+        'p99_ms': _percentile(timings, 0.99),
+    }
+
+
+def create_users(count, password, batch_size=10000):
+    """Bulk-create ``count`` users bench<i>@example.com sharing one password hash"""
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+
+    hashed = make_password(password)
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create([
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password=hashed)
+            for i in range(start, min(start + batch_size, count))
+        ])
+
+
+def session_writes(queries):
+    """Number of INSERT/UPDATE statements on django_session among ``queries``"""
+    return sum(
+        1 for query in queries
+        if 'django_session' in query['sql'] and query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+    )
+
+
+def timed_request(client, method, path, data=None):
+    """Send a request with the test ``client`` like a server thread would: (response, milliseconds).
+
+    The response is None when the view raised. Ends the request as the
+    handler does, keeping or closing the connection according to CONN_MAX_AGE.
+    """
+    start = time.perf_counter()
+    try:
+        response = getattr(client, method)(path, data or {})
+        if response.streaming:
+            b''.join(response.streaming_content)
+    except Exception:
+        response = None
+    finally:
+        close_old_connections()
+    return response, (time.perf_counter() - start) * 1000
+
+
+# SQLite's defaults: rollback journal, a connection per request
+DEFAULT_DATABASE_PROFILE = {
+    'settings': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}},
+    'pragmas': {},
+}
+
+# DATABASE_PROFILE = 'production' in the settings
+PRODUCTION_DATABASE_PROFILE = {
+    'settings': settings.PRODUCTION_CONNECTION_SETTINGS,
+    'pragmas': settings.PRODUCTION_SQLITE_PRAGMAS,
+}
+
+
+@contextmanager
+def database_profile(profile, using='default'):
+    """Open the connections of the body with ``profile``'s settings and pragmas.
+
+    Enter it before isolated_database() so the test database is created with
+    the profile's journal mode.
+    """
+    settings_dict = connections.settings[using]
+    saved = {key: settings_dict[key] for key in profile['settings']}
+    connections[using].close()
+    settings_dict.update(profile['settings'])
+    try:
+        with override_settings(SQLITE_PRAGMAS=profile['pragmas']):
+            yield
+    finally:
+        connections[using].close()
+        settings_dict.update(saved)
@@ -0,0 +1,149 @@
+# catalog.py - Cached course catalog, invalidated by gestion_inscriptions.signals
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .models import Cours
+from .occupancy import open_courses
+from .pagination import KeysetPaginator
+from .search import search_courses
+
+CATALOG_CACHE_ALIAS = getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')
+# Changes that don't go through the invalidations (queryset.update()) show up
+# after at most this many seconds
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60)
+
+CATALOG_PAGE_SIZE = 9
+# The catalog total is only shown as an estimate, recounted every 5 minutes
+CATALOG_COUNT_TIMEOUT = 300
+
+# Listings without a category filter, the other scopes are the categories
+ALL_CATEGORIES = 'all'
+
+_MISSING = object()
+
+
+class CatalogCacheStats:
+    """Hit/miss counters of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+stats = CatalogCacheStats()
+
+
+def _version_key(scope):
+    return f'catalog:version:{scope}'
+
+
+def _version(cache, scope):
+    version = cache.get(_version_key(scope))
+    if version is None:
+        # Start from the clock so a version lost by the cache never matches old entries
+        cache.add(_version_key(scope), time.time_ns(), None)
+        version = cache.get(_version_key(scope))
+    return version
+
+
+def _cached(scope, name, params, compute):
+    """Value of ``compute()``, cached under the current version of ``scope``"""
+    cache = caches[CATALOG_CACHE_ALIAS]
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    key = f'catalog:{scope}:{_version(cache, scope)}:{name}:{digest}'
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        stats.record('hits')
+        return value
+
+    stats.record('misses')
+    value = compute()
+    cache.set(key, value, CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def _bump(cache, scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            # No version yet: nothing was cached under this scope
+            pass
+
+
+def invalidate_catalog(category=None):
+    """Drop the cached listings showing ``category``, every listing when None"""
+    cache = caches[CATALOG_CACHE_ALIAS]
+    if category is None:
+        scopes = [ALL_CATEGORIES] + [key for key, _ in Cours.CATEGORY_CHOICES]
+    else:
+        scopes = [ALL_CATEGORIES, category]
+
+    _bump(cache, scopes)
+    # Again once committed: a listing computed meanwhile saw the old rows
+    # and was cached under the new version
+    transaction.on_commit(lambda: _bump(cache, scopes))
+    stats.record('invalidations')
+
+
+def invalidate_courses(cours_ids):
+    """invalidate_catalog() for the categories of ``cours_ids``"""
+    categories = set(Cours.objects.filter(pk__in=cours_ids).values_list('category', flat=True))
+    if len(categories) == 1:
+        invalidate_catalog(categories.pop())
+    elif categories:
+        invalidate_catalog()
+
+
+def catalog_page(category=None, search=None, cursor=None):
+    """Page of active courses for the catalog views, filtered on category and search"""
+    def compute():
+        courses = Cours.objects.filter(is_active=True)
+        if category:
+            courses = courses.filter(category=category)
+        if search:
+            # Ranked by relevance
+            courses = search_courses(courses, search)
+
+        # Keyset pagination: no OFFSET scan and a cached total instead of a COUNT(*) per page
+        paginator = KeysetPaginator(courses, CATALOG_PAGE_SIZE, count_timeout=CATALOG_COUNT_TIMEOUT)
+        return paginator.get_page(cursor)
+
+    return _cached(category or ALL_CATEGORIES, 'page', (search, cursor), compute)
+
+
+def featured_courses(limit=6):
+    """The first courses with a seat left, for the dashboard"""
+    return _cached(
+        ALL_CATEGORIES, 'featured', limit,
+        lambda: list(open_courses()[:limit])
+    )
+
+
+def active_courses():
+    """Every active course, full ones included, ordered for the course selection step"""
+    return _cached(
+        ALL_CATEGORIES, 'active', None,
+        lambda: list(Cours.objects.filter(is_active=True).order_by('category', 'nom'))
+    )
@@ -0,0 +1,53 @@
+# database.py - SQLite tuning of the connections and copies for the replicas
+import re
+import sqlite3
+import time
+from contextlib import closing
+from django.conf import settings
+from django.db import connections
+
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+
+
+def apply_sqlite_pragmas(connection, pragmas=None):
+    """Run ``PRAGMA name = value`` for SQLITE_PRAGMAS on a new SQLite connection.
+
+    journal_mode is stored in the database file, the other pragmas only last
+    as long as the connection: hence the connection_created hook rather than
+    a one-off migration.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {}) if pragmas is None else pragmas
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not _PRAGMA_NAME.match(name) or not re.match(r'^[\w-]+$', str(value)):
+                raise ValueError(f"Invalid SQLite pragma {name} = {value!r}")
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def sqlite_pragmas(connection, names=('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout')):
+    """Current value of the ``names`` pragmas on ``connection``"""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            values[name] = row[0] if row else None
+    return values
+
+
+def copy_sqlite_database(source, target_path, pages=1024):
+    """Copy the committed data of the SQLite database ``source`` (an alias) into ``target_path``.
+
+    Uses SQLite's online backup from a connection of its own: the copy is a
+    consistent snapshot, and ``pages`` at a time let writers on the source go
+    on in between. Returns the seconds it took.
+    """
+    settings_dict = connections[source].settings_dict
+    if connections[source].vendor != 'sqlite':
+        raise ValueError(f"Database {source!r} is not SQLite")
+    start = time.perf_counter()
+    with closing(sqlite3.connect(settings_dict['NAME'])) as database, closing(sqlite3.connect(target_path)) as target:
+        database.backup(target, pages=pages)
+    return time.perf_counter() - start
@@ -3,8 +3,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Count, Q, F
 from .models import Etudiant, Cours, Inscription
+from .catalog import active_courses
+from .occupancy import is_full, is_full_for
+from .reservations import save_inscription
 from datetime import date, timedelta
 
 class CustomUserCreationForm(UserCreationForm):
@@ -182,36 +184,45 @@ class CoursChoiceForm(forms.Form):
         required=True,
         label="Select a Course"
     )
+    join_waitlist = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={
+            'class': 'form-check-input'
+        }),
+        label="Join the waitlist if the course is full"
+    )
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
+        # Student submitting the form, whose own seat hold doesn't make a course full
+        self.etudiant = kwargs.pop('etudiant', None)
         super().__init__(*args, **kwargs)
         
-        # Get available courses
-        available_courses = Cours.objects.filter(is_active=True).annotate(
-            enrolled_count=Count('inscriptions', filter=Q(inscriptions__status='confirmed'))
-        )
-        
-        # Filter out full courses (unless max_students is 0 which means unlimited)
-        available_courses = available_courses.filter(
-            Q(max_students__gt=F('enrolled_count')) | Q(max_students=0)
-        )
+        # Get available courses, full ones included so students can join their waitlist
+        available_courses = Cours.objects.filter(is_active=True)
+        # The catalog comes from the cache, only the student's own enrollments are queried
+        courses = active_courses()
         
         # If user is provided, exclude courses they're already enrolled in
         if user and hasattr(user, 'etudiant'):
             try:
                 etudiant = user.etudiant
-                enrolled_course_ids = Inscription.objects.filter(
+                enrolled_course_ids = set(Inscription.objects.filter(
                     etudiant=etudiant
-                ).values_list('cours_id', flat=True)
+                ).values_list('cours_id', flat=True))
                 available_courses = available_courses.exclude(id__in=enrolled_course_ids)
+                courses = [cours for cours in courses if cours.pk not in enrolled_course_ids]
             except Etudiant.DoesNotExist:
                 pass
         
+        # The queryset is only used to validate the submitted choice
         self.fields['cours'].queryset = available_courses.order_by('category', 'nom')
+        for cours in courses:
+            cours.is_full = is_full(cours)
+        self.courses = courses
         
         # If no courses available, show a helpful message
-        if not available_courses.exists():
+        if not courses:
             self.fields['cours'].empty_label = "No courses available at the moment"
             self.fields['cours'].required = False
     
@@ -224,11 +235,19 @@ class CoursChoiceForm(forms.Form):
         if not cours.is_active:
             raise forms.ValidationError("This course is no longer available.")
         
+        return cours
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        cours = cleaned_data.get('cours')
+        
         # Check if course is full
-        if cours.max_students > 0 and cours.available_slots <= 0:
-            raise forms.ValidationError("This course is full. Please select another course.")
+        if cours and not cleaned_data.get('join_waitlist') and is_full_for(cours, self.etudiant):
+            self.add_error('cours', forms.ValidationError(
+                "This course is full. Please select another course or join its waitlist.", code='full'
+            ))
         
-        return cours
+        return cleaned_data
 
 class InscriptionForm(forms.ModelForm):
     """Form for admin to manage inscriptions"""
@@ -265,10 +284,8 @@ class InscriptionForm(forms.ModelForm):
             
             # Check course capacity
             if cours.max_students > 0:
-                confirmed_count = Inscription.objects.filter(
-                    cours=cours, 
-                    status='confirmed'
-                ).count()
+                # Seats held by students in the middle of the wizard are taken too
+                confirmed_count = cours.confirmed_count + cours.held_count
                 
                 if self.instance.pk and self.initial.get('status') == 'confirmed':
                     confirmed_count -= 1  # Don't count current instance if it was confirmed
@@ -280,6 +297,14 @@ class InscriptionForm(forms.ModelForm):
                     )
         
         return cleaned_data
+    
+    def save(self, commit=True):
+        inscription = super().save(commit=False)
+        if commit:
+            # Go through the reservation service so that confirming claims the seat
+            # atomically; the capacity check in clean() is only advisory
+            save_inscription(inscription)
+        return inscription
 
 class ContactForm(forms.Form):
     """Contact form for general inquiries"""
@@ -371,4 +396,37 @@ class CourseSearchForm(forms.Form):
         if min_price and max_price and min_price > max_price:
             raise forms.ValidationError("Minimum price cannot be greater than maximum price.")
         
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+class ExportFilterForm(forms.Form):
+    """Filters of the registrations export"""
+    STATUS_CHOICES = [('', 'All Statuses')] + Inscription.STATUS_CHOICES
+    CATEGORY_CHOICES = [('', 'All Categories')] + Cours.CATEGORY_CHOICES
+    PAYMENT_CHOICES = [('', 'All'), ('paid', 'Paid'), ('unpaid', 'Unpaid')]
+    
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], required=False)
+    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False)
+    category = forms.ChoiceField(choices=CATEGORY_CHOICES, required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    payment = forms.ChoiceField(choices=PAYMENT_CHOICES, required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+        
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Start date cannot be after end date.")
+        
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        cleaned_data['payment_status'] = {'paid': True, 'unpaid': False}.get(cleaned_data.get('payment'))
+        return cleaned_data
+    
+    def export_filters(self):
+        """Keyword arguments for exports.registrations_queryset()"""
+        return {
+            name: self.cleaned_data.get(name)
+            for name in ('status', 'category', 'date_from', 'date_to', 'payment_status')
+        }
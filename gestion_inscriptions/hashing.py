@@ -0,0 +1,31 @@
+# hashing.py - Password hashing off the event loop for the ASGI views
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from .timing import timed
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hashing_executor():
+    """Thread pool shared by every request. PBKDF2 releases the GIL, so the
+    hashes run in parallel up to PASSWORD_HASHING_WORKERS while the event loop
+    keeps serving other requests; extra hashes wait in the pool queue."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    return _executor
+
+
+async def run_hasher(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` run in the hashing pool, timed as hashing"""
+    loop = asyncio.get_running_loop()
+    with timed('hashing'):
+        return await loop.run_in_executor(hashing_executor(), partial(func, *args, **kwargs))
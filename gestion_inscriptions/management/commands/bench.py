@@ -0,0 +1,171 @@
+import threading
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from gestion_inscriptions.benchmarks import (
+    SEARCH_WORDS, BenchmarkCommand, create_search_courses, latency_summary, run_concurrently, timed_request
+)
+from gestion_inscriptions.models import Cours, Etudiant, Inscription
+from gestion_inscriptions.search import rebuild_search_index
+
+PASSWORD = 'Bench-pass-123'
+
+
+class Scenarios:
+    """The user journeys of the benchmark. Each one runs ``iterations`` times
+    in a worker thread and sends its requests through ``request``."""
+
+    def __init__(self, courses, iterations):
+        self.courses = courses
+        self.iterations = iterations
+
+    def student_client(self, worker):
+        client = Client()
+        client.force_login(User.objects.get(username=f'student{worker}'))
+        return client
+
+    def login(self, worker, request):
+        for i in range(self.iterations):
+            request(Client(), 'post', reverse('login'), {'email': f'student{worker}@example.com', 'password': PASSWORD})
+
+    def dashboard(self, worker, request):
+        client = self.student_client(worker)
+        for i in range(self.iterations):
+            request(client, 'get', reverse('dashboard'))
+
+    def catalog(self, worker, request):
+        client = self.student_client(worker)
+        categories = [key for key, _ in Cours.CATEGORY_CHOICES]
+        for i in range(self.iterations):
+            response = request(client, 'get', reverse('courses_list'), {'category': categories[i % len(categories)]})
+            if response is not None and response.context and response.context['page_obj'].next_cursor:
+                request(client, 'get', reverse('courses_list'), {
+                    'category': categories[i % len(categories)],
+                    'cursor': response.context['page_obj'].next_cursor,
+                })
+            request(client, 'get', reverse('courses_list'), {'search': SEARCH_WORDS[(worker + i) % len(SEARCH_WORDS)]})
+
+    def registration(self, worker, request):
+        """etape1 -> etape2 -> confirmation for new users"""
+        for i in range(self.iterations):
+            user = User.objects.create_user(
+                username=f'new{worker}-{i}', email=f'new{worker}-{i}@example.com', password=None
+            )
+            client = Client()
+            client.force_login(user)
+            request(client, 'get', reverse('etape1'))
+            request(client, 'post', reverse('etape1'), {
+                'nom': 'Bench Student',
+                'email': f'new{worker}-{i}@example.com',
+                'telephone': '+1234567890',
+                'date_naissance': '1990-01-01',
+            })
+            request(client, 'get', reverse('etape2'))
+            cours = self.courses[(worker * self.iterations + i) % len(self.courses)]
+            request(client, 'post', reverse('etape2'), {'cours': cours.pk})
+            request(client, 'get', reverse('confirmation'))
+            request(client, 'post', reverse('confirmation'))
+
+    def my_registrations(self, worker, request):
+        client = self.student_client(worker)
+        for i in range(self.iterations):
+            request(client, 'get', reverse('my_registrations'))
+
+
+SCENARIOS = ['login', 'dashboard', 'catalog', 'registration', 'my_registrations']
+
+
+class Command(BenchmarkCommand):
+    help = 'Drive the views in process through user scenarios with concurrent workers, report latencies as JSON'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Scenario to run, repeat for several (default: all)'
+        )
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads per scenario')
+        parser.add_argument('--iterations', type=int, default=10, help='Runs of the scenario per worker')
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument(
+            '--no-request-timing',
+            action='store_true',
+            help='Disable RequestTimingMiddleware, to measure its overhead'
+        )
+
+    def seed(self, concurrency, courses):
+        create_search_courses(courses)
+        # Bulk-created: index them for the catalog search
+        rebuild_search_index()
+        Cours.objects.update(max_students=1000)
+        registered = list(Cours.objects.order_by('id')[:5])
+        for worker in range(concurrency):
+            user = User.objects.create_user(
+                username=f'student{worker}', email=f'student{worker}@example.com', password=PASSWORD
+            )
+            student = Etudiant.objects.create(
+                user=user,
+                nom="Bench Student",
+                email=f"student{worker}@example.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for cours in registered:
+                Inscription.objects.create(etudiant=student, cours=cours, status='confirmed')
+
+    def run_scenario(self, scenario, concurrency):
+        timings = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def request(client, method, path, data=None):
+            response, elapsed = timed_request(client, method, path, data)
+            with lock:
+                timings.append(elapsed)
+                errors[0] += response is None or response.status_code >= 500
+            return response
+
+        elapsed = run_concurrently(lambda worker: scenario(worker, request), range(concurrency))
+        return {
+            'requests': len(timings),
+            'errors': errors[0],
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(timings) / elapsed, 1) if elapsed else None,
+            **latency_summary(timings),
+        }
+
+    def bench_settings(self, options):
+        return {
+            **super().bench_settings(options),
+            # Every worker logs in from the same address
+            'LOGIN_THROTTLE_RATES': {'ip': (10 ** 9, 1), 'email': (10 ** 9, 1)},
+            'REQUEST_TIMING_ENABLED': not options['no_request_timing'],
+        }
+
+    def measure(self, options):
+        concurrency = options['concurrency']
+        report = {
+            'concurrency': concurrency,
+            'iterations': options['iterations'],
+            'courses': options['courses'],
+            'database': connection.vendor,
+            'request_timing': not options['no_request_timing'],
+            'scenarios': {},
+        }
+        self.seed(concurrency, options['courses'])
+        scenarios = Scenarios(list(Cours.objects.order_by('id')), options['iterations'])
+        for name in options['scenario'] or SCENARIOS:
+            report['scenarios'][name] = self.run_scenario(getattr(scenarios, name), concurrency)
+            connection.close()
+        return report
+
+    def summarize(self, report):
+        for name, result in report['scenarios'].items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {result['requests_per_second']} req/s, p50 {result.get('p50_ms')} ms, "
+                f"p95 {result.get('p95_ms')} ms, p99 {result.get('p99_ms')} ms, {result['errors']} errors"
+            ))
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from datetime import date
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from gestion_inscriptions.benchmarks import BenchmarkCommand, create_search_courses, run_concurrently
+from gestion_inscriptions.models import Cours, Etudiant, Inscription
+
+VIEWS = ['dashboard', 'courses_list', 'my_registrations']
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare requests/second of the student area views under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--requests', type=int, default=300, help='Requests per handler')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--courses', type=int, default=1000, help='Number of courses to generate')
+
+    def seed(self, courses):
+        create_search_courses(courses)
+        user = User.objects.create_user(username='bench', first_name='Bench', password='Bench-pass-123')
+        student = Etudiant.objects.create(
+            user=user,
+            nom="Bench Student",
+            email="bench.student@example.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        for cours in Cours.objects.all()[:5]:
+            Inscription.objects.create(etudiant=student, cours=cours, status='confirmed')
+        return user
+
+    def measure(self, options):
+        count, concurrency = options['requests'], options['concurrency']
+        paths = [reverse(VIEWS[i % len(VIEWS)]) for i in range(count)]
+        chunks = [paths[i::concurrency] for i in range(concurrency)]
+
+        user = self.seed(options['courses'])
+        statuses = []
+
+        def wsgi_worker(chunk):
+            client = Client()
+            client.force_login(user)
+            statuses.extend(client.get(path).status_code for path in chunk)
+
+        wsgi_seconds = run_concurrently(wsgi_worker, chunks)
+
+        async def asgi_run():
+            async def asgi_worker(chunk):
+                client = AsyncClient()
+                await client.aforce_login(user)
+                for path in chunk:
+                    statuses.append((await client.get(path)).status_code)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(asgi_worker(chunk) for chunk in chunks))
+            return time.perf_counter() - start
+
+        with override_settings(ROOT_URLCONF='inscription_cours.asgi_urls'):
+            asgi_seconds = asyncio.run(asgi_run())
+
+        return {
+            'requests': count,
+            'concurrency': concurrency,
+            'courses': options['courses'],
+            'errors': sum(status != 200 for status in statuses),
+            'wsgi_requests_per_second': round(count / wsgi_seconds, 1),
+            'asgi_requests_per_second': round(count / asgi_seconds, 1),
+        }
+
+    def summarize(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"ASGI: {report['asgi_requests_per_second']} req/s, WSGI: {report['wsgi_requests_per_second']} req/s"
+        ))
@@ -0,0 +1,54 @@
+import random
+from django.contrib.auth import authenticate
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from gestion_inscriptions.backends import EMAIL_INDEX, create_email_index
+from gestion_inscriptions.benchmarks import BenchmarkCommand, create_users, latency_summary, time_queries
+
+PASSWORD = 'Bench-pass-123'
+
+
+class Command(BenchmarkCommand):
+    help = 'Measure email logins against a large auth_user table'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--users', type=int, default=1000000, help='Number of users to generate')
+        parser.add_argument('--logins', type=int, default=50, help='Number of logins to time')
+
+    def measure(self, options):
+        from django.contrib.auth.models import User
+
+        rng = random.Random(0)
+        emails = [f'bench{rng.randrange(options["users"])}@example.com' for _ in range(options['logins'])]
+
+        create_users(options['users'], PASSWORD)
+        lookup = lambda email: list(User.objects.filter(email=email)[:2])
+
+        # The bulk inserts filled the query log under DEBUG
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            authenticate(email=emails[0], password=PASSWORD)
+
+        report = {
+            'users': options['users'],
+            'queries_per_login': len(queries),
+            'lookup_indexed': latency_summary(time_queries(lookup, emails)),
+            'login': latency_summary(time_queries(
+                lambda email: authenticate(email=email, password=PASSWORD), emails
+            )),
+        }
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {EMAIL_INDEX}')
+        report['lookup_unindexed'] = latency_summary(time_queries(lookup, emails[:10]))
+        create_email_index()
+
+        report['logins_per_second'] = round(1000 / report['login']['mean_ms'], 1)
+        return report
+
+    def summarize(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['logins_per_second']} logins/second, email lookup "
+            f"{report['lookup_indexed']['mean_ms']}ms indexed vs {report['lookup_unindexed']['mean_ms']}ms without the index"
+        ))
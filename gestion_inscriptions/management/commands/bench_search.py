@@ -0,0 +1,42 @@
+from django.core.management.base import CommandError
+from gestion_inscriptions.benchmarks import BenchmarkCommand, create_search_courses, latency_summary, time_queries
+from gestion_inscriptions.models import Cours
+from gestion_inscriptions.search import fts_enabled, rebuild_search_index, search_courses
+
+QUERIES = ['python', 'data sci', 'advanced photo', 'fren', 'machine learning workshop', 'histo']
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare the full-text course search with the former nom__icontains filter'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--courses', type=int, default=100000, help='Number of courses to generate')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs of each query')
+
+    def measure(self, options):
+        if not fts_enabled():
+            raise CommandError('Full-text search needs SQLite with FTS5')
+
+        create_search_courses(options['courses'])
+        rebuild_search_index()
+        courses = Cours.objects.filter(is_active=True)
+
+        def first_page(queryset):
+            # What the course list does: count for the paginator, then one page
+            return queryset.count(), list(queryset[:9])
+
+        return {
+            'courses': options['courses'],
+            'queries': QUERIES,
+            'icontains': latency_summary(time_queries(
+                lambda query: first_page(courses.filter(nom__icontains=query)), QUERIES, options['repeat']
+            )),
+            'fts': latency_summary(time_queries(
+                lambda query: first_page(search_courses(courses, query)), QUERIES, options['repeat']
+            )),
+        }
+
+    def summarize(self, report):
+        speedup = report['icontains']['mean_ms'] / report['fts']['mean_ms']
+        self.stdout.write(self.style.SUCCESS(f'Full-text search is {speedup:.1f}x faster on average'))
@@ -0,0 +1,76 @@
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from gestion_inscriptions.benchmarks import BenchmarkCommand, create_search_courses, session_writes
+from gestion_inscriptions.models import Cours, Etudiant
+
+PAGES = ['dashboard', 'courses_list', 'my_registrations']
+
+# The former settings: every request saved its session to the database
+SAVE_EVERY_REQUEST = {
+    'MIDDLEWARE': [
+        'django.contrib.sessions.middleware.SessionMiddleware' if name.endswith('LowWriteSessionMiddleware') else name
+        for name in settings.MIDDLEWARE
+    ],
+    'SESSION_SAVE_EVERY_REQUEST': True,
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'WIZARD_STATE_STORAGE': 'session',
+}
+
+
+class Command(BenchmarkCommand):
+    help = 'Count django_session writes per page view with the former and the low-write session settings'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--views', type=int, default=300, help='Page views per mode')
+
+    def browse(self, user, cours, views):
+        """Page views of a logged in student, with one course selection per 10 views"""
+        client = Client()
+        client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(views):
+                if i % 10 == 9:
+                    client.post(reverse('etape2'), {'cours': cours.pk})
+                else:
+                    client.get(reverse(PAGES[i % len(PAGES)]))
+        return session_writes(queries)
+
+    def measure(self, options):
+        views = options['views']
+        create_search_courses(100)
+        cours = Cours.objects.first()
+        users = []
+        for name in ('before', 'after'):
+            user = User.objects.create_user(username=name, password='Bench-pass-123')
+            Etudiant.objects.create(
+                user=user,
+                nom=f"Bench {name}",
+                email=f"{name}@example.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            users.append(user)
+
+        with override_settings(**SAVE_EVERY_REQUEST):
+            before = self.browse(users[0], cours, views)
+        after = self.browse(users[1], cours, views)
+
+        return {
+            'page_views': views,
+            'save_every_request_writes': before,
+            'low_write_writes': after,
+            'save_every_request_writes_per_view': round(before / views, 3),
+            'low_write_writes_per_view': round(after / views, 3),
+        }
+
+    def summarize(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"Session writes: {report['save_every_request_writes']} -> {report['low_write_writes']} "
+            f"for {report['page_views']} page views"
+        ))
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from gestion_inscriptions.benchmarks import BenchmarkCommand
+from gestion_inscriptions.hashing import hashing_executor, run_hasher
+from gestion_inscriptions.views import _new_user
+
+PASSWORD = 'Bench-pass-123'
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare signups/second of the former double-hash path with the single-hash and pooled ones'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--signups', type=int, default=20, help='Number of signups per scenario')
+
+    def measure(self, options):
+        count = options['signups']
+
+        def double_hash(i):
+            # Former signup_view: create_user() hashes, authenticate() hashes again
+            email = f'double{i}@example.com'
+            User.objects.create_user(username=email, email=email, password=PASSWORD)
+            authenticate(username=email, password=PASSWORD)
+
+        def single_hash(i):
+            _new_user('Bench Student', f'single{i}@example.com', make_password(PASSWORD)).save()
+
+        async def pooled():
+            async def signup(i):
+                user = _new_user('Bench Student', f'pooled{i}@example.com', await run_hasher(make_password, PASSWORD))
+                await user.asave()
+            await asyncio.gather(*(signup(i) for i in range(count)))
+
+        def rate(run):
+            start = time.perf_counter()
+            run()
+            return round(count / (time.perf_counter() - start), 2)
+
+        return {
+            'signups': count,
+            'hashing_workers': hashing_executor()._max_workers,
+            'double_hash_per_second': rate(lambda: [double_hash(i) for i in range(count)]),
+            'single_hash_per_second': rate(lambda: [single_hash(i) for i in range(count)]),
+            'async_pool_per_second': rate(lambda: asyncio.run(pooled())),
+        }
+
+    def summarize(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"Single hash: {report['single_hash_per_second'] / report['double_hash_per_second']:.1f}x the former "
+            f"signups/second, {report['async_pool_per_second'] / report['double_hash_per_second']:.1f}x with the pool"
+        ))
@@ -0,0 +1,123 @@
+import threading
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from gestion_inscriptions.benchmarks import (
+    DEFAULT_DATABASE_PROFILE, PRODUCTION_DATABASE_PROFILE, SEARCH_WORDS, BenchmarkCommand, create_search_courses,
+    database_profile, isolated_database, latency_summary, run_concurrently, timed_request
+)
+from gestion_inscriptions.database import sqlite_pragmas
+from gestion_inscriptions.models import Cours, Etudiant, Inscription
+
+class Command(BenchmarkCommand):
+    help = (
+        'Concurrent course listings and registrations with SQLite defaults and with the '
+        'production database profile (WAL, pragmas, persistent connections)'
+    )
+
+    # Each profile creates its test database, see database_profile()
+    isolated = False
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--readers', type=int, default=8, help='Threads listing courses')
+        parser.add_argument('--writers', type=int, default=4, help='Threads registering to courses')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per reader, registrations per writer')
+        parser.add_argument('--courses', type=int, default=2000)
+
+    def bench_settings(self, options):
+        return {
+            **super().bench_settings(options),
+            # No catalog cache: every course listing reads SQLite
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        }
+
+    def request(self, client, timings, errors, lock, method, *args):
+        response, elapsed = timed_request(client, method, *args)
+        failed = response is None or response.status_code >= 500
+        with lock:
+            timings.append(elapsed)
+            errors[0] += failed
+        return not failed
+
+    def run_profile(self, profile, options):
+        readers, writers, requests = options['readers'], options['writers'], options['requests']
+        with database_profile(profile), isolated_database(keepdb=options['keepdb']):
+            create_search_courses(options['courses'])
+            for cours in Cours.objects.all()[:requests]:
+                cours.max_students = writers
+                cours.save()
+            courses = list(Cours.objects.order_by('id')[:requests])
+
+            users = []
+            for i in range(writers):
+                user = User.objects.create_user(username=f'writer{i}', password='Bench-pass-123')
+                Etudiant.objects.create(
+                    user=user,
+                    nom=f"Writer {i}",
+                    email=f"writer{i}@example.com",
+                    telephone="+1234567890",
+                    date_naissance=date(1990, 1, 1)
+                )
+                users.append(user)
+            reader = User.objects.create_user(username='reader', password='Bench-pass-123')
+            pragmas = sqlite_pragmas(connection)
+            connection.close()
+
+            lock = threading.Lock()
+            read_timings, write_timings = [], []
+            read_errors, write_errors = [0], [0]
+
+            def worker(job):
+                kind, index = job
+                client = Client()
+                if kind == 'read':
+                    client.force_login(reader)
+                    for i in range(requests):
+                        word = SEARCH_WORDS[(index * requests + i) % len(SEARCH_WORDS)]
+                        self.request(
+                            client, read_timings, read_errors, lock,
+                            'get', reverse('courses_list'), {'search': word}
+                        )
+                else:
+                    client.force_login(users[index])
+                    for cours in courses:
+                        if self.request(client, [], write_errors, lock, 'post', reverse('etape2'), {'cours': cours.pk}):
+                            self.request(client, write_timings, write_errors, lock, 'post', reverse('confirmation'))
+
+            jobs = [('read', i) for i in range(readers)] + [('write', i) for i in range(writers)]
+            elapsed = run_concurrently(worker, jobs)
+            registered = Inscription.objects.filter(status='confirmed').count()
+
+        return {
+            'pragmas': pragmas,
+            'conn_max_age': profile['settings']['CONN_MAX_AGE'],
+            'seconds': round(elapsed, 3),
+            'reads_per_second': round(len(read_timings) / elapsed, 1),
+            'registrations': registered,
+            'failed_registrations': writers * requests - registered,
+            'registrations_per_second': round(registered / elapsed, 1),
+            'read_errors': read_errors[0],
+            'write_errors': write_errors[0],
+            'read_latency': latency_summary(read_timings),
+            'confirmation_latency': latency_summary(write_timings),
+        }
+
+    def measure(self, options):
+        return {
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'requests': options['requests'],
+            'default': self.run_profile(DEFAULT_DATABASE_PROFILE, options),
+            'production': self.run_profile(PRODUCTION_DATABASE_PROFILE, options),
+        }
+
+    def summarize(self, report):
+        before, after = report['default'], report['production']
+        self.stdout.write(self.style.SUCCESS(
+            f"Reads/s: {before['reads_per_second']} -> {after['reads_per_second']}, "
+            f"registrations/s: {before['registrations_per_second']} -> {after['registrations_per_second']}, "
+            f"failed registrations: {before['failed_registrations']} -> {after['failed_registrations']}"
+        ))
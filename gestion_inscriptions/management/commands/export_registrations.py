@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from gestion_inscriptions.exports import EXPORT_FORMATS, registrations_queryset
+from gestion_inscriptions.forms import ExportFilterForm
+
+
+class Command(BaseCommand):
+    help = 'Stream registrations with their student and course as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format')
+        parser.add_argument('--status', help='Only export registrations with this status')
+        parser.add_argument('--category', help='Only export registrations to courses of this category')
+        parser.add_argument('--from', dest='date_from', help='Registered on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Registered on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--payment', choices=['paid', 'unpaid'], help='Only export paid or unpaid registrations')
+        parser.add_argument('--output', '-o', help='Write to this file instead of the standard output')
+
+    def handle(self, *args, **options):
+        form = ExportFilterForm({
+            name: options[name] or ''
+            for name in ('format', 'status', 'category', 'date_from', 'date_to', 'payment')
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        _, lines = EXPORT_FORMATS[form.cleaned_data['format']]
+        inscriptions = registrations_queryset(**form.export_filters())
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines(inscriptions))
+        else:
+            for line in lines(inscriptions):
+                self.stdout.write(line, ending='')
@@ -0,0 +1,219 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from gestion_inscriptions.catalog import invalidate_catalog
+from gestion_inscriptions.forms import EtudiantForm
+from gestion_inscriptions.models import Cours, Etudiant, Inscription
+
+STUDENT_FIELDS = ['nom', 'email', 'telephone', 'date_naissance', 'address']
+STATUSES = dict(Inscription.STATUS_CHOICES)
+
+
+class ImportEtudiantForm(EtudiantForm):
+    """Same validation rules as the registration wizard, minus the per-row
+    uniqueness queries: emails are checked once per chunk instead"""
+
+    def clean_email(self):
+        return self.cleaned_data.get('email')
+
+    def validate_unique(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Import students and their enrollments from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, '-' for standard input")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format (guessed from the file extension by default)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of rows validated and inserted per transaction'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Write rejected rows to this CSV file instead of the standard output'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate everything but roll back the inserts. The whole import runs in one '
+                 'transaction, holding the write lock of the database until it ends'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8') if options['rejects'] else None
+        self.rejects = csv.writer(rejects_file or self.stdout)
+        self.rejects.writerow(['line', 'email', 'reason'])
+
+        totals = Counter()
+        start = time.perf_counter()
+        try:
+            rows = self.read_rows(source, fmt)
+            # A dry run rolls back once at the end: the next chunks are checked
+            # against the rows of the previous ones in the database, as in a
+            # real import, rather than against copies kept in memory
+            with transaction.atomic() if options['dry_run'] else nullcontext():
+                while True:
+                    chunk = list(islice(rows, options['chunk_size']))
+                    if not chunk:
+                        break
+                    totals.update(self.import_chunk(chunk, options['dry_run']))
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if rejects_file:
+                rejects_file.close()
+
+        elapsed = time.perf_counter() - start
+        rate = totals['rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['rows']} rows in {elapsed:.2f}s ({rate:.0f} rows/second): "
+            f"{totals['students']} students and {totals['enrollments']} enrollments imported, "
+            f"{totals['rejected']} rows rejected{' (dry run)' if options['dry_run'] else ''}"
+        ))
+
+    def read_rows(self, source, fmt):
+        """Yield (line number, row dict) without loading the file in memory"""
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_num, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                yield line_num, row if isinstance(row, dict) else {'_invalid': True}
+
+    def reject(self, line_num, row, reason):
+        self.rejects.writerow([line_num, row.get('email', ''), reason])
+
+    def import_chunk(self, chunk, dry_run):
+        stats = Counter(rows=len(chunk))
+        accepted = []  # (line number, row, student, enrollment or None)
+        seen_emails = set()
+
+        # Row-level validation, no queries
+        for line_num, row in chunk:
+            if row.get('_invalid'):
+                self.reject(line_num, row, 'Malformed row')
+                continue
+
+            form = ImportEtudiantForm({field: row.get(field) or '' for field in STUDENT_FIELDS})
+            if not form.is_valid():
+                reason = '; '.join(f'{field}: {" ".join(errors)}' for field, errors in form.errors.items())
+                self.reject(line_num, row, reason)
+                continue
+
+            email = form.cleaned_data['email']
+            if email in seen_emails:
+                self.reject(line_num, row, 'Duplicate email in file')
+                continue
+            seen_emails.add(email)
+
+            enrollment = None
+            if row.get('cours'):
+                status = row.get('status') or 'confirmed'
+                try:
+                    cours_id = int(row['cours'])
+                except (TypeError, ValueError):
+                    self.reject(line_num, row, f"Invalid course id {row['cours']!r}")
+                    continue
+                if status not in STATUSES:
+                    self.reject(line_num, row, f'Invalid status {status!r}')
+                    continue
+                payment = str(row.get('payment_status', '')).lower() in ('1', 'true', 'yes', 'y')
+                enrollment = (cours_id, status, payment)
+
+            accepted.append((line_num, row, form.save(commit=False), enrollment))
+
+        # Set-based checks: one query for the emails and one for the courses of the chunk
+        existing = set(
+            Etudiant.objects.filter(email__in=[student.email for _, _, student, _ in accepted])
+            .values_list('email', flat=True)
+        )
+        courses = Cours.objects.filter(is_active=True).in_bulk(
+            {enrollment[0] for _, _, _, enrollment in accepted if enrollment}
+        )
+        free_seats = {
+            cours.pk: (
+                cours.max_students - cours.confirmed_count - cours.held_count
+            ) if cours.max_students else None
+            for cours in courses.values()
+        }
+
+        rows = []
+        seats = Counter()
+        for line_num, row, student, enrollment in accepted:
+            if student.email in existing:
+                self.reject(line_num, row, 'A student with this email already exists.')
+                continue
+            if enrollment:
+                cours_id, status = enrollment[:2]
+                if cours_id not in courses:
+                    self.reject(line_num, row, f'Course {cours_id} does not exist or is not active')
+                    continue
+                if status == 'confirmed':
+                    if free_seats[cours_id] is not None and seats[cours_id] >= free_seats[cours_id]:
+                        self.reject(line_num, row, f'Course {cours_id} is full')
+                        continue
+                    seats[cours_id] += 1
+            rows.append((line_num, row, student, enrollment))
+
+        try:
+            with transaction.atomic():
+                # Claim the confirmed seats of the chunk, one conditional UPDATE per course
+                for cours_id, count in seats.items():
+                    claimed = Cours.objects.filter(pk=cours_id).filter(
+                        Q(max_students=0) |
+                        Q(max_students__gte=F('confirmed_count') + F('held_count') + count)
+                    ).update(confirmed_count=F('confirmed_count') + count)
+                    if not claimed:
+                        raise IntegrityError(f'Course {cours_id} filled up during the import')
+
+                students = Etudiant.objects.bulk_create([student for _, _, student, _ in rows])
+                inscriptions = Inscription.objects.bulk_create([
+                    Inscription(etudiant=student, cours_id=enrollment[0], status=enrollment[1], payment_status=enrollment[2])
+                    for student, (_, _, _, enrollment) in zip(students, rows)
+                    if enrollment
+                ])
+        except IntegrityError as e:
+            # Lost a race with another writer: report the whole chunk
+            for line_num, row, _, _ in rows:
+                self.reject(line_num, row, f'Chunk rejected: {e}')
+            stats['rejected'] = stats['rows']
+            return stats
+
+        if inscriptions and not dry_run:
+            # bulk_create skips the signals that keep the cached catalog fresh
+            invalidate_catalog()
+
+        stats['students'] = len(students)
+        stats['enrollments'] = len(inscriptions)
+        stats['rejected'] = stats['rows'] - len(rows)
+        return stats
@@ -0,0 +1,63 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from gestion_inscriptions.catalog import invalidate_catalog
+from gestion_inscriptions.search import rebuild_search_index
+from gestion_inscriptions.seats import rebuild_seat_counters
+from gestion_inscriptions.synthetic import generate_courses, generate_inscriptions, generate_students
+
+
+class Command(BaseCommand):
+    help = 'Generate users, students, courses and inscriptions, the same ones for the same --seed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100)
+        parser.add_argument('--students', type=int, default=1000, help='Users, each with a student profile')
+        parser.add_argument('--inscriptions', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per executemany batch')
+        parser.add_argument('--password', default='Student-pass-123', help='Password of every generated user')
+        parser.add_argument(
+            '--prefix',
+            default='student',
+            help='Usernames and emails are <prefix><n>: use another one to add more students'
+        )
+
+    def timed(self, label, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        rows = result if isinstance(result, int) else len(result)
+        rate = f', {rows / elapsed:,.0f} rows/s' if elapsed and rows else ''
+        self.stdout.write(f'{label}: {rows:,} in {elapsed:.1f}s{rate}')
+        return result
+
+    def handle(self, *args, **options):
+        if min(options['courses'], options['students'], options['inscriptions']) < 0:
+            raise CommandError('Volumes must be positive')
+        # Checked before inserting anything: a student enrolls once per course
+        if options['inscriptions'] > options['students'] * options['courses']:
+            raise CommandError(
+                f"{options['inscriptions']} inscriptions don't fit "
+                f"{options['students']} students x {options['courses']} courses"
+            )
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        courses = self.timed('Courses', generate_courses, options['courses'], rng, batch_size)
+        students = self.timed(
+            'Students', generate_students, options['students'], rng, options['password'], batch_size,
+            prefix=options['prefix']
+        )
+        self.timed('Inscriptions', generate_inscriptions, options['inscriptions'], students, courses, rng, batch_size)
+
+        # The raw inserts skipped the signals maintaining the derived data
+        with transaction.atomic():
+            self.timed('Seat counters rebuilt', rebuild_seat_counters)
+        self.timed('Courses indexed for search', rebuild_search_index)
+        invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f'Data generated in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from gestion_inscriptions.search import create_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the courses'
+
+    def handle(self, *args, **options):
+        if not create_search_index():
+            raise CommandError('Full-text search needs SQLite with FTS5, course search uses icontains')
+
+        with transaction.atomic():
+            indexed = rebuild_search_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt: {indexed} course(s) indexed'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from gestion_inscriptions.models import Cours
+from gestion_inscriptions.occupancy import occupancy_enabled, rebuild_occupancy
+from gestion_inscriptions.seats import rebuild_seat_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized seat counters of every course, and the course occupancy table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=int,
+            action='append',
+            dest='course_ids',
+            help='Only rebuild the counter of this course id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        courses = Cours.objects.all()
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+
+        with transaction.atomic():
+            fixed = rebuild_seat_counters(courses)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Seat counters rebuilt: {fixed} course(s) were out of sync')
+        )
+        # Recounts every course, --course or not
+        if occupancy_enabled():
+            with transaction.atomic():
+                courses = rebuild_occupancy()
+            self.stdout.write(self.style.SUCCESS(f'Occupancy of {courses} course(s) rebuilt'))
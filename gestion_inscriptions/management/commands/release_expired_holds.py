@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from gestion_inscriptions.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Give back the seats of expired seat holds'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of holds released per transaction'
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Released {released} expired seat hold(s)')
+        )
@@ -0,0 +1,26 @@
+from gestion_inscriptions.benchmarks import BenchmarkCommand, run_reservation_stress
+
+
+class Command(BenchmarkCommand):
+    help = 'Race many students for the seats of one course and report overbooking and throughput'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent workers')
+        parser.add_argument('--attempts', type=int, default=400, help='Number of students trying to enroll')
+        parser.add_argument('--capacity', type=int, default=50, help='Seats available in the course')
+
+    def measure(self, options):
+        return run_reservation_stress(
+            threads=options['threads'],
+            attempts=options['attempts'],
+            capacity=options['capacity']
+        )
+
+    def summarize(self, report):
+        if report['overbooked'] or report['seat_counter'] != report['stored_confirmed']:
+            self.stderr.write(self.style.ERROR('Seat accounting is inconsistent!'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"No overbooking, {report['seats_per_second']} seats/second")
+            )
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from gestion_inscriptions.database import copy_sqlite_database
+from gestion_inscriptions.routers import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the replica files of DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Copy again every this many seconds, until interrupted (default: copy once)'
+        )
+
+    def sync(self):
+        for alias in replicas():
+            seconds = copy_sqlite_database(DEFAULT_DB_ALIAS, connections[alias].settings_dict['NAME'])
+            # Replica connections kept open by this process would read the old file
+            connections[alias].close()
+            self.stdout.write(f'{alias}: copied in {seconds:.3f}s')
+
+    def handle(self, *args, **options):
+        if not replicas():
+            raise CommandError('No replica in DATABASE_REPLICAS, set INSCRIPTION_COURS_REPLICA=1')
+
+        self.sync()
+        while options['interval'] > 0:
+            time.sleep(options['interval'])
+            self.sync()
@@ -0,0 +1,232 @@
+# metrics.py - Latency histograms and counters shared by the worker processes
+import atexit
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# name: (help, upper bounds of the buckets)
+HISTOGRAMS = {
+    'inscription_request_duration_seconds': (
+        'Time to serve a request, per view',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    ),
+    'inscription_request_queries': (
+        'SQL queries run by a request, per view',
+        (1, 2, 5, 10, 20, 50, 100),
+    ),
+    'inscription_response_size_bytes': (
+        'Size of the response body, per view; streamed responses are left out',
+        (1024, 4096, 16384, 65536, 262144, 1048576),
+    ),
+}
+
+# name: help
+COUNTERS = {
+    'inscription_enrollments_total': (
+        'Enrollments per outcome: confirmed, full (no seat left) or duplicate (already enrolled)'
+    ),
+    'inscription_login_attempts_total': (
+        'Login and signup attempts per outcome: hashed (a password was checked) or rejected (throttled)'
+    ),
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'name TEXT NOT NULL, labels TEXT NOT NULL, le TEXT NOT NULL, value REAL NOT NULL, '
+    'PRIMARY KEY (name, labels, le))'
+)
+UPSERT = (
+    'INSERT INTO metrics (name, labels, le, value) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value'
+)
+
+
+class _Shard:
+    """Increments of one thread since the last flush. Only that thread records
+    into it, the lock is only contended by flush()."""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.lock = threading.Lock()
+        # (sample name, labels, bucket bound) -> increment
+        self.values = defaultdict(float)
+
+    def take(self):
+        with self.lock:
+            values, self.values = self.values, defaultdict(float)
+        return values
+
+    def give_back(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.values[key] += value
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+# Held while writing, so flush() returns once everything recorded before it is stored
+_flush_lock = threading.Lock()
+_flushed = time.monotonic()
+_flusher = None
+
+
+def _current_shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def start_flusher():
+    """Flush every METRICS_FLUSH_SECONDS from a thread of its own, and at exit:
+    the increments of a thread don't wait for its next request.
+
+    Called when a request starts (see gestion_inscriptions.signals), so that
+    only the processes serving requests run the thread.
+    """
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _shards_lock:
+        # After a fork the thread of the parent is gone
+        if _flusher is not None and _flusher.is_alive():
+            return
+        if _flusher is None:
+            atexit.register(flush)
+        _flusher = threading.Thread(target=_flush_periodically, name='metrics-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(max(getattr(settings, 'METRICS_FLUSH_SECONDS', 5), 1))
+        flush_if_due()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    """Label set in the text format, ``view="dashboard"``"""
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(values.items()))
+
+
+def observe(name, value, label_set=''):
+    """Record ``value`` in the histogram ``name``"""
+    bounds = HISTOGRAMS[name][1]
+    shard = _current_shard()
+    index = bisect.bisect_left(bounds, value)
+    with shard.lock:
+        values = shard.values
+        # Counts per bucket, made cumulative when rendered; +Inf is the count
+        if index < len(bounds):
+            values[(name + '_bucket', label_set, str(bounds[index]))] += 1
+        values[(name + '_sum', label_set, '')] += value
+        values[(name + '_count', label_set, '')] += 1
+
+
+def increment(name, label_set='', amount=1):
+    """Add ``amount`` to the counter ``name``"""
+    shard = _current_shard()
+    with shard.lock:
+        shard.values[(name, label_set, '')] += amount
+
+
+def _connection():
+    """Connection of this thread to METRICS_DATABASE"""
+    path = str(settings.METRICS_DATABASE)
+    if getattr(_local, 'connection', None) is None or _local.path != path:
+        if getattr(_local, 'connection', None) is not None:
+            _local.connection.close()
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode = wal')
+        connection.execute('PRAGMA synchronous = normal')
+        connection.execute(SCHEMA)
+        _local.connection, _local.path = connection, path
+    return _local.connection
+
+
+def flush():
+    """Add the increments of every thread to METRICS_DATABASE.
+
+    On failure they are kept for the next flush.
+    """
+    global _flushed
+    with _flush_lock:
+        _flushed = time.monotonic()
+        with _shards_lock:
+            shards = list(_shards)
+            # The increments of the threads that ended are taken below, the last time
+            _shards[:] = [shard for shard in shards if shard.thread.is_alive()]
+
+        values = defaultdict(float)
+        for shard in shards:
+            for key, value in shard.take().items():
+                values[key] += value
+        if not values:
+            return
+        try:
+            connection = _connection()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.executemany(UPSERT, [key + (value,) for key, value in values.items()])
+        except sqlite3.Error:
+            logger.exception('Could not write the metrics to %s', settings.METRICS_DATABASE)
+            _current_shard().give_back(values)
+
+
+def flush_if_due():
+    """flush() if the last one is METRICS_FLUSH_SECONDS old"""
+    if time.monotonic() - _flushed >= getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+        flush()
+
+
+def collect():
+    """Totals of every process: {(sample name, labels, bucket bound): value}"""
+    flush()
+    rows = _connection().execute('SELECT name, labels, le, value FROM metrics').fetchall()
+    return {(name, label_set, le): value for name, label_set, le, value in rows}
+
+
+def _sample(name, label_set, value):
+    return f'{name}{{{label_set}}} {_number(value)}' if label_set else f'{name} {_number(value)}'
+
+
+def _number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render():
+    """The metrics of every process in the Prometheus text format"""
+    values = collect()
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for label_set in sorted({key[1] for key in values if key[0] == name + '_count'}):
+            prefix = label_set + ',' if label_set else ''
+            cumulative = 0
+            for bound in bounds:
+                cumulative += values.get((name + '_bucket', label_set, str(bound)), 0)
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {_number(cumulative)}')
+            count = values[(name + '_count', label_set, '')]
+            lines += [
+                f'{name}_bucket{{{prefix}le="+Inf"}} {_number(count)}',
+                _sample(name + '_sum', label_set, values.get((name + '_sum', label_set, ''), 0)),
+                _sample(name + '_count', label_set, count),
+            ]
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (sample, label_set, _), value in sorted(values.items()):
+            if sample == name:
+                lines.append(_sample(name, label_set, value))
+    return '\n'.join(lines) + '\n'
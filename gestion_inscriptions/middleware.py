@@ -0,0 +1,184 @@
+# middleware.py - Request/response middleware of the app
+import json
+import logging
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from . import metrics
+from .routers import pin_primary, primary_pinned, replicas
+from .timing import current_timings, start_timings, stop_timings, timed
+
+logger = logging.getLogger('gestion_inscriptions.timing')
+
+# Session key holding the time of the last write
+REFRESHED_KEY = '_refreshed'
+
+# Cookie sending the requests that follow a write to the primary database
+PRIMARY_COOKIE = 'db_primary'
+
+
+class LowWriteSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that writes a session when its data changed, or when
+    SESSION_REFRESH_THRESHOLD seconds passed since its last write to slide its
+    expiry, instead of on every request like SESSION_SAVE_EVERY_REQUEST.
+
+    Read-only page views then don't take the SQLite write lock.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(time.time())
+            if session.modified:
+                session[REFRESHED_KEY] = now
+            elif now - session.get(REFRESHED_KEY, 0) >= settings.SESSION_REFRESH_THRESHOLD:
+                # Marks the session modified, so the parent saves it and reissues the cookie
+                session[REFRESHED_KEY] = now
+        with timed('session'):
+            return super().process_response(request, response)
+
+
+class AsyncCapableMiddleware:
+    """Base of the middleware running in the mode of the handler: under ASGI
+    __call__ is a coroutine, so the requests don't hop to a thread and back
+    for each of them"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class ReadReplicaMiddleware(AsyncCapableMiddleware):
+    """Read-your-writes with the replica router: a request that wrote sets a
+    short-lived cookie, and the requests carrying it (the page the POST
+    redirects to, say) read the primary until the replicas caught up, after
+    REPLICA_PIN_SECONDS.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Threads serve one request after the other: start from a clean state
+        pin_primary(PRIMARY_COOKIE in request.COOKIES)
+        return self.process_response(self.get_response(request))
+
+    async def __acall__(self, request):
+        pin_primary(PRIMARY_COOKIE in request.COOKIES)
+        return self.process_response(await self.get_response(request))
+
+    def process_response(self, response):
+        if primary_pinned() and replicas():
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+class RequestTimingMiddleware(AsyncCapableMiddleware):
+    """Where the time of each request goes: SQL queries, template rendering,
+    session save and view, sent in a Server-Timing header and logged as one
+    JSON line on the gestion_inscriptions.timing logger.
+
+    A sample of the requests slower than SLOW_REQUEST_MS, SLOW_REQUEST_SAMPLE_RATE
+    of them, is logged as a warning with its slowest and repeated statements.
+    The password hashing doesn't count: logins and signups spend most of
+    their time in PBKDF2 on purpose.
+    The latency, query count and response size per view also go to the
+    histograms of gestion_inscriptions.metrics.
+
+    The queries are counted by record_query(), installed on every connection
+    (see gestion_inscriptions.signals), in whichever thread they run.
+
+    Goes first in MIDDLEWARE, ViewTimingMiddleware last.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_timings()
+        try:
+            response = self.get_response(request)
+            total = timings.total()
+        finally:
+            stop_timings(token)
+        return self.process_response(request, response, timings, total)
+
+    async def __acall__(self, request):
+        timings, token = start_timings()
+        try:
+            response = await self.get_response(request)
+            total = timings.total()
+        finally:
+            stop_timings(token)
+        return self.process_response(request, response, timings, total)
+
+    def process_response(self, request, response, timings, total):
+        durations = timings.durations
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={durations.get("db", 0):.1f};desc="{timings.queries} queries"',
+            *(f'{name};dur={durations.get(name, 0):.1f}' for name in ('template', 'session', 'hashing', 'view')),
+            f'total;dur={total:.1f}',
+        ])
+        match = getattr(request, 'resolver_match', None)
+        view = metrics.labels(view=match.view_name if match else 'unresolved')
+        metrics.observe('inscription_request_duration_seconds', total / 1000, view)
+        metrics.observe('inscription_request_queries', timings.queries, view)
+        if not response.streaming:
+            metrics.observe('inscription_response_size_bytes', len(response.content), view)
+
+        slow = total - durations.get('hashing', 0) >= getattr(settings, 'SLOW_REQUEST_MS', 500)
+        if not slow and not logger.isEnabledFor(logging.INFO):
+            return response
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'total_ms': round(total, 1),
+            **{
+                f'{name}_ms': round(durations.get(name, 0), 1)
+                for name in ('db', 'template', 'session', 'hashing', 'view')
+            },
+        }
+        if slow and random.random() < getattr(settings, 'SLOW_REQUEST_SAMPLE_RATE', 0.1):
+            record['slowest_queries'] = timings.slowest_queries()
+            record['repeated_queries'] = timings.repeated_queries()
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+        return response
+
+
+class ViewTimingMiddleware(AsyncCapableMiddleware):
+    """Times the view for RequestTimingMiddleware, the last in MIDDLEWARE so
+    the other middleware isn't counted"""
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if current_timings() is None:
+            return self.get_response(request)
+        with timed('view'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if current_timings() is None:
+            return await self.get_response(request)
+        with timed('view'):
+            return await self.get_response(request)
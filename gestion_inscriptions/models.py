@@ -24,6 +24,11 @@ class Cours(models.Model):
     resume = models.TextField(verbose_name="Description")
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='tech')
     max_students = models.PositiveIntegerField(default=30)
+    # Denormalized number of confirmed inscriptions, kept in sync by
+    # gestion_inscriptions.signals and rebuilt by `manage.py rebuild_seat_counters`
+    confirmed_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Confirmed Seats")
+    # Seats temporarily held by students between step 2 and the confirmation
+    held_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Held Seats")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -31,18 +36,53 @@ class Cours(models.Model):
     class Meta:
         verbose_name = "Course"
         verbose_name_plural = "Courses"
-        ordering = ['nom']
+        ordering = ['nom', 'id']
+        indexes = [
+            # Keyset pagination of the catalog, see gestion_inscriptions.pagination
+            models.Index(fields=['nom', 'id'], name='cours_catalog_idx'),
+            # Active-only: the catalog, the category listings and the course
+            # selection never show inactive courses
+            models.Index(fields=['nom', 'id'], condition=models.Q(is_active=True), name='cours_active_idx'),
+            models.Index(
+                fields=['category', 'nom', 'id'],
+                condition=models.Q(is_active=True),
+                name='cours_active_category_idx'
+            ),
+        ]
+    
+    # Only ever changed through F() updates, see gestion_inscriptions.seats
+    SEAT_COUNTERS = ('confirmed_count', 'held_count')
     
     def __str__(self):
         return self.nom
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_max_students = instance.__dict__.get('max_students')
+        instance._loaded_search_text = (instance.__dict__.get('nom'), instance.__dict__.get('resume'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Don't overwrite the seat counters with the (possibly stale) values
+        # loaded in memory when saving an existing course
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.SEAT_COUNTERS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def enrolled_count(self):
-        return self.inscriptions.filter(status='confirmed').count()
+        return self.confirmed_count
     
     @property
     def available_slots(self):
-        return self.max_students - self.enrolled_count
+        return self.max_students - self.enrolled_count - self.held_count
 
 class Etudiant(models.Model):
     phone_regex = RegexValidator(
@@ -63,6 +103,10 @@ class Etudiant(models.Model):
         verbose_name = "Student"
         verbose_name_plural = "Students"
         ordering = ['nom']
+        indexes = [
+            # The admin changelist order and its name prefix search
+            models.Index(fields=['nom', 'id'], name='etudiant_nom_idx'),
+        ]
     
     def __str__(self):
         return self.nom
@@ -93,6 +137,105 @@ class Inscription(models.Model):
         verbose_name = "Registration"
         verbose_name_plural = "Registrations"
         ordering = ['-inscription_date']
+        indexes = [
+            # Confirmed seats of a course. Not a partial index on the
+            # confirmed status: the ORM passes the status as a parameter, and
+            # SQLite only uses a partial index for literal values.
+            models.Index(fields=['cours', 'status'], name='inscription_cours_status_idx'),
+            # A student's registrations, newest first
+            models.Index(fields=['etudiant', '-inscription_date'], name='inscription_student_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the seat counter currently accounts for, so that
+        # signals can apply the right delta when the row is saved or deleted
+        instance._counted_status = instance.__dict__.get('status')
+        instance._counted_cours_id = instance.__dict__.get('cours_id')
+        return instance
+    
+    def __str__(self):
+        return f"{self.etudiant.nom} - {self.cours.nom}"
+
+class SeatHold(models.Model):
+    """A seat kept aside for a student until the registration is confirmed"""
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE, related_name='seat_holds')
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE, related_name='seat_holds')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ('etudiant', 'cours')
+        verbose_name = "Seat Hold"
+        verbose_name_plural = "Seat Holds"
+        ordering = ['expires_at']
     
     def __str__(self):
-        return f"{self.etudiant.nom} - {self.cours.nom}"
\ No newline at end of file
+        return f"{self.etudiant.nom} - {self.cours.nom} (until {self.expires_at})"
+
+class WaitlistEntry(models.Model):
+    """A student queuing for a seat in a full course, served in FIFO order"""
+    etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE, related_name='waitlist_entries')
+    cours = models.ForeignKey(Cours, on_delete=models.CASCADE, related_name='waitlist_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('etudiant', 'cours')
+        verbose_name = "Waitlist Entry"
+        verbose_name_plural = "Waitlist Entries"
+        ordering = ['cours', 'id']
+        indexes = [
+            # Queue order: promotion and position lookups walk this index
+            models.Index(fields=['cours', 'id'], name='waitlist_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.etudiant.nom} waiting for {self.cours.nom}"
+
+class CourseOccupancy(models.Model):
+    """Seats of a course, one row per course. Written by SQLite triggers on the
+    inscriptions, the seat holds and the course capacity only, see
+    gestion_inscriptions.occupancy"""
+    cours = models.OneToOneField(Cours, on_delete=models.CASCADE, primary_key=True, related_name='occupancy')
+    confirmed = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    held = models.PositiveIntegerField(default=0)
+    # Cours.max_students, 0 for unlimited
+    capacity = models.PositiveIntegerField(default=0)
+    is_full = models.BooleanField(default=False)
+    
+    class Meta:
+        verbose_name = "Course Occupancy"
+        verbose_name_plural = "Course Occupancies"
+    
+    def __str__(self):
+        return f"{self.cours_id}: {self.confirmed + self.held}/{self.capacity or '∞'}"
+
+class FullTextMatch(models.Lookup):
+    """``field__match=query``, the FTS5 MATCH operator (FTS5 also reads ``=``
+    as a match, but auxiliary functions such as bm25() then fail)"""
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+class CourseSearchEntry(models.Model):
+    """Row of the FTS5 index of the course names and descriptions, created and
+    filled by gestion_inscriptions.search rather than by syncdb"""
+    cours = models.OneToOneField(
+        Cours, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_entry'
+    )
+    nom = models.TextField()
+    resume = models.TextField()
+    # FTS5's hidden column named after the table, the whole row to match against
+    document = models.TextField(db_column='gestion_inscriptions_cours_fts')
+    
+    class Meta:
+        managed = False
+        db_table = 'gestion_inscriptions_cours_fts'
+
+CourseSearchEntry._meta.get_field('document').register_lookup(FullTextMatch)
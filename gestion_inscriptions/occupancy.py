@@ -0,0 +1,146 @@
+# occupancy.py - Seats per course in CourseOccupancy, kept up to date by SQLite triggers
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from .models import CourseOccupancy, Cours, Inscription, SeatHold
+from .reservations import course_is_full, has_free_seat
+
+OCCUPANCY = CourseOccupancy._meta.db_table
+COURS = Cours._meta.db_table
+INSCRIPTION = Inscription._meta.db_table
+SEAT_HOLD = SeatHold._meta.db_table
+
+# Every write path (the ORM, queryset.update(), bulk_create, the raw INSERTs
+# of populate_courses) goes through these, in the transaction of the write.
+# Decrements stop at 0, the columns are unsigned
+TRIGGERS = {
+    'occupancy_cours_insert': f"""
+        AFTER INSERT ON {COURS} BEGIN
+            INSERT OR IGNORE INTO {OCCUPANCY} (cours_id, confirmed, pending, held, capacity, is_full)
+            VALUES (NEW.id, 0, 0, 0, NEW.max_students, 0);
+        END""",
+    'occupancy_cours_capacity': f"""
+        AFTER UPDATE OF max_students ON {COURS} WHEN OLD.max_students != NEW.max_students BEGIN
+            UPDATE {OCCUPANCY} SET capacity = NEW.max_students WHERE cours_id = NEW.id;
+        END""",
+    'occupancy_inscription_insert': f"""
+        AFTER INSERT ON {INSCRIPTION} BEGIN
+            UPDATE {OCCUPANCY} SET
+                confirmed = confirmed + (NEW.status = 'confirmed'),
+                pending = pending + (NEW.status = 'pending')
+            WHERE cours_id = NEW.cours_id;
+        END""",
+    'occupancy_inscription_delete': f"""
+        AFTER DELETE ON {INSCRIPTION} BEGIN
+            UPDATE {OCCUPANCY} SET
+                confirmed = MAX(confirmed - (OLD.status = 'confirmed'), 0),
+                pending = MAX(pending - (OLD.status = 'pending'), 0)
+            WHERE cours_id = OLD.cours_id;
+        END""",
+    'occupancy_inscription_update': f"""
+        AFTER UPDATE OF status, cours_id ON {INSCRIPTION}
+        WHEN OLD.status != NEW.status OR OLD.cours_id != NEW.cours_id BEGIN
+            UPDATE {OCCUPANCY} SET
+                confirmed = MAX(confirmed - (OLD.status = 'confirmed'), 0),
+                pending = MAX(pending - (OLD.status = 'pending'), 0)
+            WHERE cours_id = OLD.cours_id;
+            UPDATE {OCCUPANCY} SET
+                confirmed = confirmed + (NEW.status = 'confirmed'),
+                pending = pending + (NEW.status = 'pending')
+            WHERE cours_id = NEW.cours_id;
+        END""",
+    'occupancy_hold_insert': f"""
+        AFTER INSERT ON {SEAT_HOLD} BEGIN
+            UPDATE {OCCUPANCY} SET held = held + 1 WHERE cours_id = NEW.cours_id;
+        END""",
+    'occupancy_hold_delete': f"""
+        AFTER DELETE ON {SEAT_HOLD} BEGIN
+            UPDATE {OCCUPANCY} SET held = MAX(held - 1, 0) WHERE cours_id = OLD.cours_id;
+        END""",
+    # is_full follows the counters. Not fired by its own UPDATE: it only sets is_full
+    'occupancy_is_full': f"""
+        AFTER UPDATE OF confirmed, held, capacity ON {OCCUPANCY} BEGIN
+            UPDATE {OCCUPANCY} SET is_full = (NEW.capacity > 0 AND NEW.confirmed + NEW.held >= NEW.capacity)
+            WHERE cours_id = NEW.cours_id AND is_full != (NEW.capacity > 0 AND NEW.confirmed + NEW.held >= NEW.capacity);
+        END""",
+}
+
+# Whether the triggers are installed, per database alias
+_occupancy_enabled = {}
+
+
+def occupancy_enabled(using='default'):
+    """Whether ``using`` maintains CourseOccupancy (other databases read the Cours counters)"""
+    if using not in _occupancy_enabled:
+        connection = connections[using]
+        _occupancy_enabled[using] = connection.vendor == 'sqlite' and _triggers(connection).issuperset(TRIGGERS)
+    return _occupancy_enabled[using]
+
+
+def _triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        return {name for name, in cursor.fetchall()}
+
+
+def create_occupancy_triggers(using='default'):
+    """Install the triggers if needed, and fill CourseOccupancy when they were missing"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    existing = _triggers(connection)
+    with connection.cursor() as cursor:
+        for name, body in TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(f"CREATE TRIGGER {name} {body}")
+
+    _occupancy_enabled[using] = True
+    if not existing.issuperset(TRIGGERS):
+        # Writes happened without the triggers
+        rebuild_occupancy(using)
+    return True
+
+
+def rebuild_occupancy(using='default'):
+    """Recount the occupancy of every course from the inscriptions and holds, returns the number of courses"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {OCCUPANCY}")
+        cursor.execute(f"""
+            INSERT INTO {OCCUPANCY} (cours_id, confirmed, pending, held, capacity, is_full)
+            SELECT c.id, COALESCE(i.confirmed, 0), COALESCE(i.pending, 0), COALESCE(h.held, 0), c.max_students,
+                c.max_students > 0 AND COALESCE(i.confirmed, 0) + COALESCE(h.held, 0) >= c.max_students
+            FROM {COURS} c
+            LEFT JOIN (
+                SELECT cours_id, SUM(status = 'confirmed') AS confirmed, SUM(status = 'pending') AS pending
+                FROM {INSCRIPTION} GROUP BY cours_id
+            ) i ON i.cours_id = c.id
+            LEFT JOIN (SELECT cours_id, COUNT(*) AS held FROM {SEAT_HOLD} GROUP BY cours_id) h ON h.cours_id = c.id
+        """)
+        return cursor.rowcount
+
+
+def open_courses(courses=None):
+    """Active courses of ``courses`` with a seat left, read from CourseOccupancy"""
+    courses = Cours.objects.filter(is_active=True) if courses is None else courses.filter(is_active=True)
+    if occupancy_enabled(courses.db):
+        return courses.filter(occupancy__is_full=False)
+    return courses.filter(has_free_seat())
+
+
+def is_full(cours):
+    """Whether ``cours`` has no seat left, from the counters claim_seat() takes
+    the seats from: the courses it lets through are the ones it can claim"""
+    return course_is_full(cours)
+
+
+def is_full_for(cours, etudiant):
+    """is_full(), not counting the seat ``etudiant`` already holds on ``cours``
+    nor the expired holds: hold_seat() extends the former and reclaims the
+    latter rather than failing"""
+    if not is_full(cours):
+        return False
+    holds = Q(expires_at__lte=timezone.now())
+    if etudiant is not None:
+        holds |= Q(etudiant=etudiant)
+    return not SeatHold.objects.filter(holds, cours=cours).exists()
@@ -0,0 +1,157 @@
+# pagination.py - Keyset (cursor) pagination for large listings
+import base64
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def approximate_count(queryset, timeout=300):
+    """COUNT(*) of ``queryset``, cached for ``timeout`` seconds"""
+    key = 'catalog-count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(key, queryset.order_by().count, timeout)
+
+
+def estimated_count(queryset, timeout=300, exact_below=10000):
+    """Number of rows of ``queryset`` without a COUNT(*) over a large table.
+
+    Unfiltered, it is the largest primary key: an upper bound read from the
+    end of the index, off by the deleted rows. Filtered, approximate_count().
+    Tables smaller than ``exact_below`` rows are counted.
+    """
+    if queryset.query.where:
+        return approximate_count(queryset, timeout)
+    estimate = queryset.order_by().aggregate(last=Max('pk'))['last'] or 0
+    return queryset.order_by().count() if estimate < exact_below else estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Numbered pages with estimated_count() as the total, for the admin
+    changelists of the large tables. The last pages may come out empty."""
+
+    count_timeout = 60
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list, self.count_timeout, self.exact_below)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # Approximate total of the whole listing, None unless asked for
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking past the last row seen instead of using
+    OFFSET, so every page costs the same whatever its depth.
+
+    The keys are the ordering of the queryset (or the model Meta.ordering),
+    completed with the primary key to make them unique. Pages are addressed by
+    opaque cursors; there are no page numbers and no COUNT(*) unless
+    ``count_timeout`` is given, in which case a cached count is reported.
+    """
+
+    def __init__(self, queryset, per_page, count_timeout=None):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.count_timeout = count_timeout
+
+    def encode_cursor(self, direction, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps([direction, *values], cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            raise InvalidCursorError(f"Invalid cursor {cursor!r}")
+        if (not isinstance(payload, list) or len(payload) != len(self.ordering) + 1
+                or payload[0] not in ('after', 'before')):
+            raise InvalidCursorError(f"Invalid cursor {cursor!r}")
+        return payload[0], payload[1:]
+
+    def _seek(self, values, forward):
+        """Rows strictly after (or before) ``values`` in the ordering"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'gt' if forward != field.startswith('-') else 'lt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # Redundant range on the first key, that the database can use an index for
+        first = self.ordering[0]
+        lookup = 'gte' if forward != first.startswith('-') else 'lte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('after', None)
+        forward = direction == 'after'
+
+        rows = self.queryset
+        if values is not None:
+            rows = rows.filter(self._seek(values, forward))
+        if forward:
+            rows = rows.order_by(*self.ordering)
+        else:
+            rows = rows.order_by(*[
+                field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+            ])
+
+        # One extra row tells whether there is a page after this one
+        rows = list(rows[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = more if forward else values is not None
+        has_previous = values is not None if forward else more
+        count = approximate_count(self.queryset, self.count_timeout) if self.count_timeout else None
+
+        return KeysetPage(
+            rows,
+            self.encode_cursor('after', rows[-1]) if rows and has_next else None,
+            self.encode_cursor('before', rows[0]) if rows and has_previous else None,
+            count
+        )
+
+    def get_page(self, cursor=None):
+        """Like page() but falls back to the first page on a bad cursor"""
+        try:
+            return self.page(cursor)
+        except InvalidCursorError:
+            return self.page()
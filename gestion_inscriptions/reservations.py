@@ -0,0 +1,184 @@
+# reservations.py - Race-free seat reservation service
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from . import metrics
+from .models import Cours, Inscription, SeatHold
+from .seats import adjust_seat_count
+
+
+ENROLLMENTS = 'inscription_enrollments_total'
+
+
+class ReservationError(Exception):
+    """Base class for seats that could not be reserved"""
+
+
+class CourseFullError(ReservationError):
+    """The course has no seat left"""
+
+
+class AlreadyEnrolledError(ReservationError):
+    """The student already has an inscription for this course"""
+
+
+def has_free_seat():
+    """Filter matching courses with at least one seat neither confirmed nor held"""
+    return Q(max_students=0) | Q(max_students__gt=F('confirmed_count') + F('held_count'))
+
+
+def course_is_full(cours):
+    """Whether ``cours`` has no seat left (``max_students == 0`` means unlimited)"""
+    return cours.max_students > 0 and cours.confirmed_count + cours.held_count >= cours.max_students
+
+
+def claim_seat(cours_id, counter='confirmed_count'):
+    """Take one seat of a course with a single conditional UPDATE.
+
+    Returns False when the course is full. Being a write, the UPDATE also takes
+    SQLite's writer lock up front instead of upgrading a read lock later.
+    """
+    return Cours.objects.filter(has_free_seat(), pk=cours_id).update(
+        **{counter: F(counter) + 1}
+    ) == 1
+
+
+def consume_hold(etudiant_id, cours_id):
+    """Turn the student's hold on the course, if any, into a confirmed seat"""
+    if not SeatHold.objects.filter(etudiant_id=etudiant_id, cours_id=cours_id).delete()[0]:
+        return False
+    return Cours.objects.filter(pk=cours_id, held_count__gt=0).update(
+        held_count=F('held_count') - 1,
+        confirmed_count=F('confirmed_count') + 1
+    ) == 1
+
+
+def save_inscription(inscription):
+    """Save ``inscription``, claiming a seat first if it becomes confirmed.
+
+    Raises CourseFullError or AlreadyEnrolledError, in which case nothing is written.
+    """
+    already_counted = (
+        getattr(inscription, '_counted_status', None) == 'confirmed'
+        and inscription._counted_cours_id == inscription.cours_id
+    )
+
+    claiming = inscription.status == 'confirmed' and not already_counted
+
+    consumed_hold = False
+
+    with transaction.atomic():
+        if claiming:
+            # Use the seat the student held since step 2, or take a free one
+            consumed_hold = consume_hold(inscription.etudiant_id, inscription.cours_id)
+            if not consumed_hold and not claim_seat(inscription.cours_id):
+                metrics.increment(ENROLLMENTS, metrics.labels(outcome='full'))
+                raise CourseFullError(f"Course {inscription.cours_id} is full")
+            # Tell the seat counter signal this seat is already accounted for
+            inscription._seat_claimed = True
+
+        try:
+            with transaction.atomic():
+                inscription.save()
+        except IntegrityError:
+            inscription.__dict__.pop('_seat_claimed', None)
+            # Only the unique (etudiant, cours) pair means a duplicate, any
+            # other constraint failure goes up as it is
+            if not Inscription.objects.filter(
+                etudiant_id=inscription.etudiant_id, cours_id=inscription.cours_id
+            ).exclude(pk=inscription.pk).exists():
+                raise
+            metrics.increment(ENROLLMENTS, metrics.labels(outcome='duplicate'))
+            raise AlreadyEnrolledError(
+                f"Student {inscription.etudiant_id} is already enrolled in course {inscription.cours_id}"
+            )
+
+    if claiming:
+        metrics.increment(ENROLLMENTS, metrics.labels(outcome='confirmed'))
+    if claiming and Inscription.cours.is_cached(inscription):
+        inscription.cours.confirmed_count += 1
+        if consumed_hold:
+            inscription.cours.held_count -= 1
+    return inscription
+
+
+def reserve_seat(etudiant, cours, status='confirmed'):
+    """Create the inscription of ``etudiant`` in ``cours``, atomically claiming its seat"""
+    return save_inscription(Inscription(etudiant=etudiant, cours=cours, status=status))
+
+
+def _release(rows):
+    """Delete the holds of ``rows`` (pk, cours_id) and give their seats back"""
+    if not rows:
+        return 0
+
+    from .catalog import invalidate_courses
+    from .waitlist import promote_waitlist
+
+    with transaction.atomic():
+        released = SeatHold.objects.filter(pk__in=[pk for pk, _ in rows]).delete()[0]
+        seats = Counter(cours_id for _, cours_id in rows)
+        for cours_id, count in seats.items():
+            adjust_seat_count(cours_id, -count, counter='held_count')
+            promote_waitlist(cours_id)
+        # The catalog shows the free seats
+        invalidate_courses(list(seats))
+    return released
+
+
+def release_holds(holds):
+    """Release every hold of the ``holds`` queryset, returns how many were released"""
+    return _release(list(holds.values_list('pk', 'cours_id')))
+
+
+def release_expired_holds(now=None, batch_size=500, cours_id=None):
+    """Reclaim the seats of expired holds, ``batch_size`` holds per transaction.
+
+    Walks the ``expires_at`` index, so the cost depends on the number of
+    expired holds and not on the size of the table.
+    """
+    expired = SeatHold.objects.filter(expires_at__lte=now or timezone.now())
+    if cours_id is not None:
+        expired = expired.filter(cours_id=cours_id)
+
+    released = 0
+    while True:
+        rows = list(expired.order_by('expires_at').values_list('pk', 'cours_id')[:batch_size])
+        released += _release(rows)
+        if len(rows) < batch_size:
+            return released
+
+
+def hold_seat(etudiant, cours, ttl=None):
+    """Keep a seat of ``cours`` aside for ``etudiant`` during ``ttl`` seconds.
+
+    An existing hold on the same course is extended and holds on other courses
+    are released, a student only goes through the wizard for one course at a time.
+    Raises CourseFullError.
+    """
+    from .catalog import invalidate_catalog
+
+    if ttl is None:
+        ttl = getattr(settings, 'SEAT_HOLD_TTL', 600)
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        if SeatHold.objects.filter(etudiant=etudiant, cours=cours).update(expires_at=expires_at):
+            return SeatHold.objects.get(etudiant=etudiant, cours=cours)
+
+        release_holds(SeatHold.objects.filter(etudiant=etudiant))
+
+        if not claim_seat(cours.pk, counter='held_count'):
+            # Expired holds keep their seat until swept, reclaim this course's ones first
+            if not (release_expired_holds(cours_id=cours.pk) and claim_seat(cours.pk, counter='held_count')):
+                metrics.increment(ENROLLMENTS, metrics.labels(outcome='full'))
+                raise CourseFullError(f"Course {cours.pk} is full")
+
+        hold = SeatHold.objects.create(etudiant=etudiant, cours=cours, expires_at=expires_at)
+        invalidate_catalog(cours.category)
+
+    cours.held_count += 1
+    return hold
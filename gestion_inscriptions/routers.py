@@ -0,0 +1,67 @@
+# routers.py - Send catalog and reporting reads to the read replicas
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be a little behind: the catalog
+REPLICA_MODELS = {'gestion_inscriptions.cours'}
+
+# Set once the current request (or command) wrote: its later reads go to the primary
+_primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+def replicas():
+    """Aliases of the configured read replicas, empty without replicas"""
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in settings.DATABASES]
+
+
+def pin_primary(pinned=True):
+    _primary_pinned.set(pinned)
+
+
+def primary_pinned():
+    return _primary_pinned.get()
+
+
+def read_database():
+    """Alias for a read that tolerates replica lag: a replica unless the primary is pinned.
+
+    Use it for reporting querysets of models the router leaves on the
+    primary, e.g. ``Inscription.objects.using(read_database())``.
+    """
+    aliases = replicas()
+    if not aliases or primary_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # Reads inside a transaction must see its writes
+        return DEFAULT_DB_ALIAS
+    return random.choice(aliases)
+
+
+class ReplicaRouter:
+    """Reads of REPLICA_MODELS go to a replica, every write and the other reads
+    to the primary. A write pins the primary for the rest of the request, so
+    confirmation_view or etape1_view read back what they just saved;
+    ReadReplicaMiddleware keeps it pinned for the requests that follow.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS:
+            return read_database()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas are copies of the primary
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            # Filled by `manage.py sync_replica`, never migrated
+            return False
+        return None
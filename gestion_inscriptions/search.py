@@ -0,0 +1,120 @@
+# search.py - Full-text course search backed by an SQLite FTS5 table
+import logging
+import re
+from django.db import DatabaseError, connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from .models import Cours, CourseSearchEntry
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = CourseSearchEntry._meta.db_table
+
+# Matches in the course name weigh more than matches in its description
+NOM_WEIGHT = 10.0
+RESUME_WEIGHT = 1.0
+
+# Whether the FTS table is usable, per database alias
+_fts_enabled = {}
+
+
+def fts_enabled(using='default'):
+    """Whether ``using`` has the FTS5 index (other databases use icontains)"""
+    if using not in _fts_enabled:
+        connection = connections[using]
+        _fts_enabled[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_enabled[using]
+
+
+def create_search_index(using='default'):
+    """Create the FTS5 table if needed and fill it when it is out of sync"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(nom, resume, tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            indexed = cursor.fetchone()[0]
+    except DatabaseError as e:
+        # SQLite built without FTS5
+        logger.warning(f"Course search index unavailable, falling back to icontains: {e}")
+        _fts_enabled[using] = False
+        return False
+
+    _fts_enabled[using] = True
+    if indexed != Cours.objects.using(using).count():
+        rebuild_search_index(using)
+    return True
+
+
+def rebuild_search_index(using='default'):
+    """Re-index every course with one INSERT ... SELECT, returns the number indexed"""
+    table = Cours._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}(rowid, nom, resume) SELECT id, nom, resume FROM {table}")
+        return cursor.rowcount
+
+
+def index_course(cours, using='default'):
+    if fts_enabled(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, nom, resume) VALUES (%s, %s, %s)",
+                [cours.pk, cours.nom, cours.resume]
+            )
+
+
+def unindex_course(cours_id, using='default'):
+    if fts_enabled(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [cours_id])
+
+
+def match_expression(query):
+    """FTS5 query matching every word of ``query`` as a prefix, or None"""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_course_ids(query, using='default'):
+    """Ids of the courses matching ``query``, to filter other models with ``cours__in``"""
+    if not fts_enabled(using) or match_expression(query) is None:
+        return search_courses(Cours.objects.using(using), query).values('pk')
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match_expression(query),))
+
+
+def search_courses(courses, query):
+    """Filter the ``courses`` queryset on ``query`` in the name and description.
+
+    With the FTS index, results are ranked by relevance and carry a
+    ``search_rank`` annotation (lower is better).
+    """
+    match = match_expression(query)
+    if match is None:
+        return courses.none()
+
+    if not fts_enabled(courses.db):
+        words = re.findall(r'\w+', query)
+        condition = Q()
+        for word in words:
+            condition &= Q(nom__icontains=word) | Q(resume__icontains=word)
+        return courses.filter(condition)
+
+    # Join the FTS table so SQLite drives the query from the full-text match and
+    # ranks each row in the same pass (an IN subquery plus a correlated bm25()
+    # re-runs the match for every result)
+    return courses.filter(search_entry__document__match=match).annotate(
+        # An annotation rather than an extra select so the rank can be filtered on
+        search_rank=RawSQL(f"bm25({FTS_TABLE}, {NOM_WEIGHT}, {RESUME_WEIGHT})", (), output_field=FloatField())
+    ).order_by('search_rank', 'nom', 'id')
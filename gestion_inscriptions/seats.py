@@ -0,0 +1,61 @@
+# seats.py - Denormalized seat counters on Cours
+import logging
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Cours, Inscription, SeatHold
+
+logger = logging.getLogger(__name__)
+
+
+def adjust_seat_count(cours_id, delta, counter='confirmed_count'):
+    """Apply ``delta`` to one of a course's seat counters with a single UPDATE"""
+    if not delta:
+        return 0
+
+    courses = Cours.objects.filter(pk=cours_id)
+    if delta < 0:
+        # Never let the counter go below zero, even if it had drifted
+        courses = courses.filter(**{f'{counter}__gte': -delta})
+
+    updated = courses.update(**{counter: F(counter) + delta})
+    if not updated and delta < 0:
+        logger.warning(f"Seat counter for course {cours_id} is out of sync, run rebuild_seat_counters")
+    return updated
+
+
+def _count_expression(queryset):
+    counts = queryset.filter(cours=OuterRef('pk')).order_by().values('cours').annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def confirmed_count_expression():
+    """Number of confirmed inscriptions of the outer Cours row, as a subquery"""
+    return _count_expression(Inscription.objects.filter(status='confirmed'))
+
+
+def held_count_expression():
+    """Number of seat holds (expired or not) of the outer Cours row, as a subquery"""
+    return _count_expression(SeatHold.objects.all())
+
+
+def rebuild_seat_counters(courses=None):
+    """Recompute the seat counters of ``courses`` (all courses by default).
+
+    Returns the number of courses whose counters had drifted.
+    """
+    if courses is None:
+        courses = Cours.objects.all()
+
+    drifted = courses.annotate(
+        actual_confirmed=confirmed_count_expression(),
+        actual_held=held_count_expression()
+    ).exclude(
+        confirmed_count=F('actual_confirmed'),
+        held_count=F('actual_held')
+    ).values('pk')
+    return Cours.objects.filter(pk__in=drifted).update(
+        confirmed_count=confirmed_count_expression(),
+        held_count=held_count_expression()
+    )
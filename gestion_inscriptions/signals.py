@@ -0,0 +1,160 @@
+# signals.py - Keep denormalized data in sync with the models
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .backends import create_email_index
+from .catalog import invalidate_catalog
+from .metrics import start_flusher
+from .database import apply_sqlite_pragmas
+from .models import Cours, Etudiant, Inscription, SeatHold
+from .occupancy import create_occupancy_triggers
+from .reservations import release_holds
+from .search import create_search_index, index_course, unindex_course
+from .seats import adjust_seat_count, rebuild_seat_counters
+from .student_stats import invalidate_student_stats
+from .timing import record_query
+from .waitlist import promote_waitlist
+
+
+def _course_category(inscription, cours_id):
+    if Inscription.cours.is_cached(inscription) and inscription.cours.pk == cours_id:
+        return inscription.cours.category
+    return Cours.objects.filter(pk=cours_id).values_list('category', flat=True).first()
+
+
+def _apply_seat_delta(inscription, cours_id, delta):
+    adjust_seat_count(cours_id, delta)
+    # The catalog shows the free seats: drop the listings showing this course
+    invalidate_catalog(_course_category(inscription, cours_id))
+    if delta < 0:
+        # A seat was given back, hand it to the waitlist
+        promote_waitlist(cours_id)
+
+    # Keep an already loaded course instance consistent with the database
+    if Inscription.cours.is_cached(inscription) and inscription.cours.pk == cours_id:
+        inscription.cours.confirmed_count = max(inscription.cours.confirmed_count + delta, 0)
+
+
+@receiver(post_save, sender=Inscription)
+def sync_seat_counter_on_save(sender, instance, created, raw, **kwargs):
+    """Update the course seat counter when an inscription is created or changes status"""
+    if raw:
+        return
+
+    # A seat claimed by the reservation service is already counted
+    seat_claimed = instance.__dict__.pop('_seat_claimed', False)
+    new_cours_id = instance.cours_id if instance.status == 'confirmed' else None
+
+    if created:
+        old_cours_id = None
+    elif not hasattr(instance, '_counted_status') or instance._counted_status is None:
+        # Saved without having been loaded from the database (or with a deferred
+        # status), so we don't know what was counted before: recount instead
+        rebuild_seat_counters(Cours.objects.filter(pk=instance.cours_id))
+        invalidate_catalog(_course_category(instance, instance.cours_id))
+        old_cours_id = new_cours_id = None
+    else:
+        old_cours_id = instance._counted_cours_id if instance._counted_status == 'confirmed' else None
+
+    if old_cours_id != new_cours_id:
+        if old_cours_id:
+            _apply_seat_delta(instance, old_cours_id, -1)
+        if new_cours_id and not seat_claimed:
+            _apply_seat_delta(instance, new_cours_id, 1)
+        elif new_cours_id:
+            # Counted by the reservation service, the listings still show the seat as free
+            invalidate_catalog(_course_category(instance, new_cours_id))
+
+    instance._counted_status = instance.status
+    instance._counted_cours_id = instance.cours_id
+
+
+@receiver(post_delete, sender=Inscription)
+def sync_seat_counter_on_delete(sender, instance, **kwargs):
+    """Release the seat of a deleted confirmed inscription"""
+    status = getattr(instance, '_counted_status', None) or instance.status
+    cours_id = getattr(instance, '_counted_cours_id', None) or instance.cours_id
+    if status == 'confirmed':
+        _apply_seat_delta(instance, cours_id, -1)
+
+
+@receiver(post_save, sender=Inscription)
+@receiver(post_delete, sender=Inscription)
+def invalidate_stats_on_inscription_change(sender, instance, **kwargs):
+    """The dashboard statistics of the student are cached, see student_stats"""
+    invalidate_student_stats(instance.etudiant_id)
+
+
+@receiver(post_save, sender=Cours)
+def promote_waitlist_on_capacity_change(sender, instance, created, raw, **kwargs):
+    """Promote waiters when the capacity of a course is raised"""
+    if raw or created:
+        return
+
+    old_max = getattr(instance, '_loaded_max_students', None)
+    if old_max and (instance.max_students == 0 or instance.max_students > old_max):
+        promote_waitlist(instance.pk)
+    instance._loaded_max_students = instance.max_students
+
+
+@receiver(post_save, sender=Cours)
+@receiver(post_delete, sender=Cours)
+def invalidate_catalog_on_course_change(sender, instance, **kwargs):
+    """Courses rarely change, and may move to another category: drop every listing"""
+    invalidate_catalog()
+
+
+@receiver(pre_delete, sender=Etudiant)
+def release_student_holds(sender, instance, **kwargs):
+    """Give back the held seats before the holds get deleted by the cascade"""
+    release_holds(SeatHold.objects.filter(etudiant=instance))
+
+
+@receiver(post_save, sender=Cours)
+def index_course_on_save(sender, instance, created, using, **kwargs):
+    """Keep the full-text search index in sync with the course name and description"""
+    search_text = (instance.nom, instance.resume)
+    if created or getattr(instance, '_loaded_search_text', None) != search_text:
+        index_course(instance, using)
+    instance._loaded_search_text = search_text
+
+
+@receiver(post_delete, sender=Cours)
+def unindex_course_on_delete(sender, instance, using, **kwargs):
+    unindex_course(instance.pk, using)
+
+
+def create_course_search_index(sender, using, **kwargs):
+    """post_migrate: the FTS table is not created by syncdb, create it after the app tables"""
+    create_search_index(using)
+
+
+def create_course_occupancy(sender, using, **kwargs):
+    """post_migrate: install the triggers maintaining CourseOccupancy"""
+    create_occupancy_triggers(using)
+
+
+def create_auth_email_index(sender, using, **kwargs):
+    """post_migrate: index the emails users log in with, see EmailBackend"""
+    create_email_index(using)
+
+
+def start_metrics_flusher(sender, **kwargs):
+    """request_started: flush the metrics of this process from a thread, see
+    metrics.start_flusher(). Connected when METRICS_FLUSH_THREAD is on"""
+    start_flusher()
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS (WAL, busy_timeout...) to every new SQLite connection"""
+    apply_sqlite_pragmas(connection)
+
+
+@receiver(connection_created)
+def time_connection_queries(sender, connection, **kwargs):
+    """Count the queries in the request timings, see RequestTimingMiddleware.
+    Connections belong to a thread: under ASGI the ORM queries run in the
+    threads of sync_to_async, not in the one handling the request"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,46 @@
+# student_stats.py - Dashboard statistics of a student, cached until their inscriptions change
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Inscription
+
+# Changes that skip the Inscription signals (bulk_create, queryset.update())
+# show up after at most this many seconds
+STUDENT_STATS_CACHE_TIMEOUT = getattr(settings, 'STUDENT_STATS_CACHE_TIMEOUT', 300)
+
+
+def _key(etudiant_id):
+    return f'student-stats:{etudiant_id}'
+
+
+def compute_student_stats(etudiant_id):
+    """Counts per status, money spent and unpaid inscriptions of a student, in one query"""
+    return Inscription.objects.filter(etudiant_id=etudiant_id).aggregate(
+        total=Count('pk'),
+        **{status: Count('pk', filter=Q(status=status)) for status, _ in Inscription.STATUS_CHOICES},
+        spent=Coalesce(
+            Sum('cours__prix', filter=Q(payment_status=True)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        unpaid=Count('pk', filter=Q(payment_status=False) & ~Q(status='cancelled')),
+    )
+
+
+def student_stats(etudiant_id):
+    """compute_student_stats(), from the cache when the inscriptions didn't change"""
+    stats = cache.get(_key(etudiant_id))
+    if stats is None:
+        stats = compute_student_stats(etudiant_id)
+        cache.set(_key(etudiant_id), stats, STUDENT_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_student_stats(*etudiant_ids):
+    keys = [_key(etudiant_id) for etudiant_id in etudiant_ids]
+    cache.delete_many(keys)
+    # Again once committed: a dashboard computed meanwhile saw the old rows
+    transaction.on_commit(lambda: cache.delete_many(keys))
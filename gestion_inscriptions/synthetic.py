@@ -0,0 +1,238 @@
+# synthetic.py - Seeded synthetic data in large volumes, for the benchmarks
+import bisect
+import itertools
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from .models import Cours, Etudiant, Inscription
+
+# Relative frequencies
+CATEGORY_WEIGHTS = {'tech': 35, 'business': 20, 'lang': 20, 'arts': 15, 'science': 10}
+STATUS_WEIGHTS = {'confirmed': 70, 'pending': 15, 'completed': 10, 'cancelled': 5}
+# Typical price of a course of the category, the prices spread around it
+CATEGORY_PRICES = {'tech': 300, 'business': 250, 'lang': 150, 'arts': 120, 'science': 200}
+CAPACITIES = [15, 20, 25, 30, 30, 30, 40, 50, 100, 200]
+DURATIONS = ['1 week', '2 weeks', '4 weeks', '6 weeks', '8 weeks', '3 months', '6 months']
+
+COURSE_WORDS = {
+    'tech': ['Python', 'Django', 'JavaScript', 'Cloud', 'Security', 'Networks', 'Databases', 'Algorithms', 'Robotics'],
+    'business': ['Marketing', 'Finance', 'Accounting', 'Management', 'Leadership', 'Sales', 'Negotiation'],
+    'lang': ['English', 'French', 'Spanish', 'Arabic', 'German', 'Italian', 'Chinese', 'Japanese'],
+    'arts': ['Painting', 'Photography', 'Drawing', 'Sculpture', 'Animation', 'Music', 'Theatre', 'Dance'],
+    'science': ['Physics', 'Chemistry', 'Biology', 'Astronomy', 'Geology', 'Statistics', 'Mathematics'],
+}
+LEVELS = ['Introduction to', 'Beginner', 'Intermediate', 'Advanced', 'Practical', 'Mastering']
+FIRST_NAMES = [
+    'Amine', 'Sara', 'Youssef', 'Fatima', 'Omar', 'Khadija', 'Mehdi', 'Salma', 'Hamza', 'Imane',
+    'Karim', 'Nadia', 'Adam', 'Lina', 'Rayan', 'Yasmine', 'Ilyas', 'Hiba', 'Anas', 'Meryem',
+]
+LAST_NAMES = [
+    'Alaoui', 'Bennani', 'Chraibi', 'Idrissi', 'Tazi', 'Fassi', 'Berrada', 'Amrani', 'Kettani',
+    'Benjelloun', 'Lahlou', 'Sqalli', 'Ouazzani', 'Naciri', 'Filali', 'Zniber',
+]
+
+# Rows committed per transaction: SQLite syncs once per commit, but the
+# writers of a live site wait for the lock until then
+TRANSACTION_ROWS = 5000
+
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _insert_rows(model, fields, rows, batch_size, using=DEFAULT_DB_ALIAS):
+    """INSERT the ``rows`` tuples of ``fields`` values, returns the number of rows.
+
+    bulk_create() compiles every value of every row and tops out around 10k
+    rows/s: this runs one executemany() per ``batch_size`` rows instead, and
+    commits every TRANSACTION_ROWS rows. The values must be ready for the
+    database; the columns not in ``fields`` get their default, or now for
+    the auto_now dates.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    now = timezone.now()
+    defaults = [
+        (field.column, field.get_db_prep_save(
+            now if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False) else field.get_default(),
+            connection
+        ))
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.attname not in fields and field.name not in fields
+    ]
+    columns = [model._meta.get_field(name).column for name in fields] + [column for column, _ in defaults]
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    constants = tuple(value for _, value in defaults)
+
+    rows = iter(rows)
+    total = 0
+    with connection.cursor() as cursor:
+        while True:
+            with transaction.atomic(using=using):
+                inserted = 0
+                while inserted < TRANSACTION_ROWS:
+                    batch = list(itertools.islice(rows, min(batch_size, TRANSACTION_ROWS - inserted)))
+                    if not batch:
+                        break
+                    cursor.executemany(sql, [row + constants for row in batch])
+                    inserted += len(batch)
+            total += inserted
+            if inserted < TRANSACTION_ROWS:
+                return total
+
+
+def _new_pks(model, before, limit=None):
+    return list(model.objects.filter(pk__gt=before).order_by('pk').values_list('pk', flat=True)[:limit])
+
+
+class NewPks:
+    """The ``count`` pks of ``model`` above ``before``, the rows a generator
+    inserted. Read back TRANSACTION_ROWS at a time when iterated, instead of
+    being held in a list"""
+
+    def __init__(self, model, before, count):
+        self.model, self.before, self.count = model, before, count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        before = self.before
+        while True:
+            pks = _new_pks(self.model, before, TRANSACTION_ROWS)
+            yield from pks
+            if len(pks) < TRANSACTION_ROWS:
+                return
+            before = pks[-1]
+
+
+def _last_pk(model):
+    return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def generate_courses(count, rng, batch_size=1000):
+    """Create ``count`` courses, returns their (pk, capacity) in creation order"""
+    categories = list(CATEGORY_WEIGHTS)
+    category_weights = _cumulative(CATEGORY_WEIGHTS.values())
+    capacities = []
+
+    def courses():
+        for i in range(count):
+            category = rng.choices(categories, cum_weights=category_weights)[0]
+            capacity = rng.choice(CAPACITIES)
+            capacities.append(capacity)
+            # Log-normal spread: mostly near the typical price, a few expensive ones
+            price = CATEGORY_PRICES[category] * rng.lognormvariate(0, 0.4)
+            yield (
+                f'{rng.choice(LEVELS)} {rng.choice(COURSE_WORDS[category])} {i + 1}',
+                str(Decimal(max(round(price), 10)) - Decimal('0.01')),
+                rng.choice(DURATIONS),
+                ' '.join(rng.choices(COURSE_WORDS[category] + COURSE_WORDS['tech'], k=12)).lower(),
+                category,
+                capacity,
+                rng.random() < 0.95,
+            )
+
+    before = _last_pk(Cours)
+    _insert_rows(
+        Cours, ['nom', 'prix', 'duree', 'resume', 'category', 'max_students', 'is_active'], courses(), batch_size
+    )
+    return list(zip(_new_pks(Cours, before), capacities))
+
+
+def generate_students(count, rng, password, batch_size=1000, prefix='student'):
+    """Create ``count`` users with their student profile, returns the student pks
+    as a NewPks.
+
+    The users share one password hash, computed once. They are created
+    TRANSACTION_ROWS at a time, each batch followed by its students.
+    """
+    hashed = make_password(password)
+    born_after = date(1960, 1, 1)
+    first_student = _last_pk(Etudiant)
+
+    for offset in range(0, count, TRANSACTION_ROWS):
+        size = min(TRANSACTION_ROWS, count - offset)
+        names = [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(size)]
+
+        before = _last_pk(User)
+        _insert_rows(User, ['username', 'email', 'first_name', 'last_name', 'password'], (
+            (f'{prefix}{i}', f'{prefix}{i}@example.com', first, last, hashed)
+            for i, (first, last) in enumerate(names, start=offset)
+        ), batch_size)
+        user_pks = _new_pks(User, before)
+
+        _insert_rows(Etudiant, ['user_id', 'nom', 'email', 'telephone', 'date_naissance'], (
+            (
+                user_pk,
+                f'{first} {last}',
+                f'{prefix}{i}@example.com',
+                f'+2126{rng.randrange(10 ** 8):08d}',
+                (born_after + timedelta(days=rng.randrange(47 * 365))).isoformat(),
+            )
+            for i, (user_pk, (first, last)) in enumerate(zip(user_pks, names), start=offset)
+        ), batch_size)
+    return NewPks(Etudiant, first_student, count)
+
+
+def generate_inscriptions(count, student_pks, courses, rng, batch_size=1000):
+    """Spread ``count`` inscriptions over the students, returns the number created.
+
+    ``student_pks`` is iterated once, it may be a NewPks. Course popularity
+    follows a Zipf law, and confirmations stop at the
+    capacity of the course: later students get pending registrations. The
+    registration dates are spread over the past year.
+    """
+    if not student_pks or not courses:
+        return 0
+    if count > len(student_pks) * len(courses):
+        raise ValueError(f"{count} inscriptions don't fit {len(student_pks)} students x {len(courses)} courses")
+
+    course_pks = [pk for pk, _ in courses]
+    free_seats = dict(courses)
+    popularity = _cumulative(1 / rank for rank in range(1, len(courses) + 1))
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = _cumulative(STATUS_WEIGHTS.values())
+    per_student, extra = divmod(count, len(student_pks))
+    # Registered over the year before the generation. As naive UTC text, what
+    # adapt_datetimefield_value() would store, minus its cost per row
+    start = timezone.now().replace(tzinfo=None) - timedelta(seconds=YEAR_SECONDS)
+
+    def pick_courses(k):
+        if k * 2 > len(course_pks):
+            return rng.sample(course_pks, k)
+        picked = set()
+        while len(picked) < k:
+            picked.add(course_pks[bisect.bisect(popularity, rng.random() * popularity[-1])])
+        return sorted(picked)
+
+    def inscriptions():
+        for i, student_pk in enumerate(student_pks):
+            for cours_pk in pick_courses(per_student + (i < extra)):
+                status = rng.choices(statuses, cum_weights=status_weights)[0]
+                if status == 'confirmed':
+                    if free_seats[cours_pk] > 0:
+                        free_seats[cours_pk] -= 1
+                    else:
+                        status = 'pending'
+                yield (
+                    student_pk,
+                    cours_pk,
+                    status,
+                    str(start + timedelta(seconds=rng.randrange(YEAR_SECONDS))),
+                    status in ('confirmed', 'completed') and rng.random() < 0.9,
+                )
+
+    return _insert_rows(
+        Inscription, ['etudiant_id', 'cours_id', 'status', 'inscription_date', 'payment_status'],
+        inscriptions(), batch_size
+    )
@@ -1,12 +1,70 @@
 # Enhanced tests.py
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, AsyncRequestFactory, override_settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from asgiref.sync import iscoroutinefunction
+from unittest import mock
+import threading
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.models import User
-from django.urls import reverse
-from django.core.exceptions import ValidationError
+from django.urls import resolve, reverse
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import json
+import logging
+import os
+import runpy
+import time
+import sqlite3
+import tempfile
+from contextlib import closing
 from decimal import Decimal
 from datetime import date, timedelta
-from .models import Cours, Etudiant, Inscription
-from .forms import EtudiantForm, CoursChoiceForm
+from .models import CourseOccupancy, Cours, Etudiant, Inscription, SeatHold, WaitlistEntry
+from .forms import EtudiantForm, CoursChoiceForm, InscriptionForm
+from .benchmarks import create_search_courses, run_concurrently, run_reservation_stress, session_writes
+from . import metrics
+from .database import apply_sqlite_pragmas, copy_sqlite_database, sqlite_pragmas
+from .routers import ReplicaRouter, pin_primary, primary_pinned
+from .catalog import catalog_page, featured_courses, stats as catalog_stats
+from .occupancy import occupancy_enabled, open_courses, rebuild_occupancy
+from .pagination import EstimatedCountPaginator, KeysetPaginator, estimated_count
+from .urls import app_urlpatterns
+from .views import dashboard_view, login_view_async, signup_view_async
+from .student_stats import compute_student_stats, student_stats
+from .throttling import take_token, throttle_stats
+from .search import fts_enabled, search_courses
+from .reservations import AlreadyEnrolledError, CourseFullError, hold_seat, release_holds, reserve_seat
+from .waitlist import join_waitlist, promote_waitlist, waitlist_entries, waitlist_position
+
+timing_logger = logging.getLogger('gestion_inscriptions.timing')
+
+
+_metrics_directory = tempfile.TemporaryDirectory()
+_metrics_settings = override_settings(METRICS_DATABASE=os.path.join(_metrics_directory.name, 'metrics.sqlite3'))
+
+
+def setUpModule():
+    # The slow requests of the suite would print their warnings, assertLogs()
+    # still sees the records
+    timing_logger.setLevel(logging.ERROR)
+    # The metrics of the suite stay out of the METRICS_DATABASE of the project
+    _metrics_settings.enable()
+
+
+def tearDownModule():
+    timing_logger.setLevel(logging.NOTSET)
+    metrics.flush()
+    _metrics_settings.disable()
+    _metrics_directory.cleanup()
+
 
 class CourseModelTest(TestCase):
     def setUp(self):
@@ -179,6 +237,1698 @@ class ViewsTest(TestCase):
         response = self.client.get(reverse('courses_list'), {'category': 'tech'})
         self.assertEqual(response.status_code, 200)
 
+class DashboardStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='statsuser', password='testpass123')
+        self.student = Etudiant.objects.create(
+            user=self.user,
+            nom="Stats Student",
+            email="stats@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.courses = [
+            Cours.objects.create(
+                nom=f"Stats Course {i}", prix=Decimal('100.00') + i, duree="2 weeks", resume="Stats", category='tech'
+            )
+            for i in range(5)
+        ]
+        for cours, status, paid in zip(self.courses, ['completed', 'completed', 'pending', 'confirmed', 'cancelled'], [True, True, False, False, False]):
+            Inscription.objects.create(etudiant=self.student, cours=cours, status=status, payment_status=paid)
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            stats = compute_student_stats(self.student.pk)
+        self.assertEqual(stats, {
+            'total': 5, 'pending': 1, 'confirmed': 1, 'cancelled': 1, 'completed': 2,
+            'spent': Decimal('201.00'), 'unpaid': 2,
+        })
+
+    def test_cached_until_inscriptions_change(self):
+        student_stats(self.student.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(student_stats(self.student.pk)['completed'], 2)
+
+        inscription = Inscription.objects.get(etudiant=self.student, cours=self.courses[2])
+        inscription.status = 'completed'
+        inscription.save()
+        self.assertEqual(student_stats(self.student.pk)['completed'], 3)
+
+        inscription.delete()
+        self.assertEqual(student_stats(self.student.pk)['total'], 4)
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['stats']['completed'], 2)
+        self.assertEqual(len(response.context['user_inscriptions']), 3)
+        self.assertContains(response, '<h5 class="card-title">2</h5>', html=True)
+        self.assertContains(response, '€201.00')
+
+class SeatCounterTest(TestCase):
+    def setUp(self):
+        self.cours = Cours.objects.create(
+            nom="Test Course",
+            prix=Decimal('199.99'),
+            duree="8 weeks",
+            resume="Test course description",
+            max_students=30
+        )
+        self.student = Etudiant.objects.create(
+            nom="Test Student",
+            email="test@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+
+    def counted_seats(self):
+        return Cours.objects.get(pk=self.cours.pk).confirmed_count
+
+    def test_counter_follows_status_changes(self):
+        inscription = Inscription.objects.create(etudiant=self.student, cours=self.cours, status='pending')
+        self.assertEqual(self.counted_seats(), 0)
+
+        inscription = Inscription.objects.get(pk=inscription.pk)
+        inscription.status = 'confirmed'
+        inscription.save()
+        self.assertEqual(self.counted_seats(), 1)
+
+        inscription.status = 'cancelled'
+        inscription.save()
+        self.assertEqual(self.counted_seats(), 0)
+
+    def test_counter_released_on_delete(self):
+        Inscription.objects.create(etudiant=self.student, cours=self.cours, status='confirmed')
+        self.assertEqual(self.counted_seats(), 1)
+
+        # Cascading delete from the student
+        self.student.delete()
+        self.assertEqual(self.counted_seats(), 0)
+
+    def test_counter_never_negative(self):
+        inscription = Inscription.objects.create(etudiant=self.student, cours=self.cours, status='confirmed')
+        Cours.objects.filter(pk=self.cours.pk).update(confirmed_count=0)
+        inscription.delete()
+        self.assertEqual(self.counted_seats(), 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        Inscription.objects.create(etudiant=self.student, cours=self.cours, status='confirmed')
+        Cours.objects.filter(pk=self.cours.pk).update(confirmed_count=7)
+
+        out = StringIO()
+        call_command('rebuild_seat_counters', stdout=out)
+        self.assertEqual(self.counted_seats(), 1)
+        self.assertIn('1 course(s)', out.getvalue())
+
+    def test_dashboard_does_not_count_seats(self):
+        User.objects.create_user(username='testuser', email='test@test.com', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, '30 spots left')
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+
+class CourseOccupancyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cours = Cours.objects.create(
+            nom="Occupancy Course", prix=Decimal('50.00'), duree="2 weeks", resume="Seats",
+            category='tech', max_students=2
+        )
+        self.students = [
+            Etudiant.objects.create(
+                nom=f"Occupancy Student {i}", email=f"occupancy{i}@test.com", telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for i in range(3)
+        ]
+
+    def occupancy(self):
+        row = CourseOccupancy.objects.get(cours=self.cours)
+        return row.confirmed, row.pending, row.held, row.capacity, row.is_full
+
+    def test_maintained_by_the_triggers(self):
+        self.assertTrue(occupancy_enabled())
+        self.assertEqual(self.occupancy(), (0, 0, 0, 2, False))
+
+        pending = Inscription.objects.create(etudiant=self.students[0], cours=self.cours, status='pending')
+        hold_seat(self.students[1], self.cours)
+        self.assertEqual(self.occupancy(), (0, 1, 1, 2, False))
+
+        reserve_seat(self.students[1], self.cours)
+        Inscription.objects.filter(pk=pending.pk).update(status='confirmed')
+        self.assertEqual(self.occupancy(), (2, 0, 0, 2, True))
+        self.assertNotIn(self.cours, open_courses())
+
+        Cours.objects.filter(pk=self.cours.pk).update(max_students=3)
+        self.assertEqual(self.occupancy(), (2, 0, 0, 3, False))
+        self.assertIn(self.cours, open_courses())
+
+        Inscription.objects.bulk_create([Inscription(etudiant=self.students[2], cours=self.cours, status='confirmed')])
+        self.assertTrue(self.occupancy()[-1])
+        Inscription.objects.filter(etudiant=self.students[2]).delete()
+        self.assertEqual(self.occupancy(), (2, 0, 0, 3, False))
+
+    def test_rebuild(self):
+        Inscription.objects.create(etudiant=self.students[0], cours=self.cours, status='confirmed')
+        Inscription.objects.create(etudiant=self.students[1], cours=self.cours, status='pending')
+        CourseOccupancy.objects.update(confirmed=0, pending=0)
+        self.assertEqual(rebuild_occupancy(), 1)
+        self.assertEqual(self.occupancy(), (1, 1, 0, 2, False))
+
+    def test_selection_form(self):
+        for student in self.students[:2]:
+            reserve_seat(student, self.cours)
+        cache.clear()
+        form = CoursChoiceForm()
+        self.assertEqual([(cours, cours.is_full) for cours in form.courses], [(self.cours, True)])
+
+        form = CoursChoiceForm({'cours': self.cours.pk})
+        self.assertFalse(form.is_valid())
+        self.assertIn('full', form.errors['cours'][0])
+        self.assertTrue(CoursChoiceForm({'cours': self.cours.pk, 'join_waitlist': 'on'}).is_valid())
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        self.cours = Cours.objects.create(
+            nom="Small Course",
+            prix=Decimal('99.00'),
+            duree="2 weeks",
+            resume="Only one seat",
+            max_students=1
+        )
+        self.students = [
+            Etudiant.objects.create(
+                nom=f"Student {name}",
+                email=f"{name}@test.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for name in ('alice', 'bob')
+        ]
+
+    def test_reserve_last_seat(self):
+        inscription = reserve_seat(self.students[0], self.cours)
+        self.assertEqual(inscription.status, 'confirmed')
+        self.assertEqual(self.cours.confirmed_count, 1)
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 1)
+
+        with self.assertRaises(CourseFullError):
+            reserve_seat(self.students[1], self.cours)
+        self.assertFalse(Inscription.objects.filter(etudiant=self.students[1]).exists())
+
+    def test_duplicate_does_not_consume_seat(self):
+        self.cours.max_students = 2
+        self.cours.save()
+        reserve_seat(self.students[0], self.cours)
+
+        with self.assertRaises(AlreadyEnrolledError):
+            reserve_seat(self.students[0], self.cours)
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 1)
+
+    def test_other_integrity_errors_are_not_duplicates(self):
+        failure = IntegrityError('NOT NULL constraint failed: gestion_inscriptions_inscription.notes')
+        with mock.patch.object(Inscription, 'save', side_effect=failure):
+            with self.assertRaises(IntegrityError):
+                reserve_seat(self.students[0], self.cours)
+        # The seat claimed for it is given back
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 0)
+
+    def test_unlimited_course(self):
+        self.cours.max_students = 0
+        self.cours.save()
+        for student in self.students:
+            reserve_seat(student, self.cours)
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 2)
+
+    def test_admin_form_confirmation_claims_seat(self):
+        reserve_seat(self.students[0], self.cours, status='pending')
+        inscription = Inscription.objects.get(etudiant=self.students[0])
+
+        form = InscriptionForm(
+            data={'etudiant': self.students[0].pk, 'cours': self.cours.pk, 'status': 'confirmed'},
+            instance=inscription
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 1)
+
+        form = InscriptionForm(data={'etudiant': self.students[1].pk, 'cours': self.cours.pk, 'status': 'confirmed'})
+        self.assertFalse(form.is_valid())
+
+class SeatHoldTest(TestCase):
+    def setUp(self):
+        self.cours = Cours.objects.create(
+            nom="Small Course",
+            prix=Decimal('99.00'),
+            duree="2 weeks",
+            resume="Only one seat",
+            max_students=1
+        )
+        self.students = [
+            Etudiant.objects.create(
+                nom=f"Student {name}",
+                email=f"{name}@test.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for name in ('alice', 'bob')
+        ]
+
+    def test_hold_takes_the_seat(self):
+        hold_seat(self.students[0], self.cours)
+        self.assertEqual(self.cours.available_slots, 0)
+
+        with self.assertRaises(CourseFullError):
+            hold_seat(self.students[1], self.cours)
+        with self.assertRaises(CourseFullError):
+            reserve_seat(self.students[1], self.cours)
+
+    def test_confirmation_consumes_hold(self):
+        hold_seat(self.students[0], self.cours)
+        reserve_seat(self.students[0], Cours.objects.get(pk=self.cours.pk))
+
+        cours = Cours.objects.get(pk=self.cours.pk)
+        self.assertEqual((cours.confirmed_count, cours.held_count), (1, 0))
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_sweeper_releases_expired_holds(self):
+        hold_seat(self.students[0], self.cours, ttl=-1)
+
+        out = StringIO()
+        call_command('release_expired_holds', '--batch-size', '1', stdout=out)
+        self.assertIn('Released 1', out.getvalue())
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 0)
+
+    def test_expired_hold_reclaimed_when_course_looks_full(self):
+        hold_seat(self.students[0], self.cours, ttl=-1)
+        hold_seat(self.students[1], self.cours)
+
+        self.assertEqual(list(SeatHold.objects.values_list('etudiant', flat=True)), [self.students[1].pk])
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 1)
+
+    def test_wizard_holds_seat_until_confirmation(self):
+        user = User.objects.create_user(username='alice', email='alice@test.com', password='testpass123')
+        self.students[0].user = user
+        self.students[0].save()
+        self.client.login(username='alice', password='testpass123')
+
+        response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertRedirects(response, reverse('confirmation'))
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 1)
+
+        response = self.client.post(reverse('confirmation'))
+        self.assertContains(response, 'Registration completed successfully!')
+        cours = Cours.objects.get(pk=self.cours.pk)
+        self.assertEqual((cours.confirmed_count, cours.held_count), (1, 0))
+
+    def test_resubmitting_step2_keeps_own_hold(self):
+        user = User.objects.create_user(username='alice', email='alice@test.com', password='testpass123')
+        self.students[0].user = user
+        self.students[0].save()
+        self.client.login(username='alice', password='testpass123')
+
+        # Back button: the student's own hold takes the last seat
+        self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertRedirects(response, reverse('confirmation'))
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 1)
+
+        form = CoursChoiceForm({'cours': self.cours.pk}, etudiant=self.students[1])
+        self.assertFalse(form.is_valid())
+
+    def test_step2_reclaims_expired_hold(self):
+        hold_seat(self.students[0], self.cours, ttl=-3600)
+        user = User.objects.create_user(username='bob', email='bob@test.com', password='testpass123')
+        self.students[1].user = user
+        self.students[1].save()
+        self.client.login(username='bob', password='testpass123')
+
+        # The expired hold of another student doesn't make the course full
+        response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertRedirects(response, reverse('confirmation'))
+        self.assertEqual(list(SeatHold.objects.values_list('etudiant', flat=True)), [self.students[1].pk])
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 1)
+
+    def test_deleting_student_releases_hold(self):
+        hold_seat(self.students[0], self.cours)
+        self.students[0].delete()
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).held_count, 0)
+
+class WaitlistTest(TestCase):
+    def setUp(self):
+        self.cours = Cours.objects.create(
+            nom="Popular Course",
+            prix=Decimal('149.00'),
+            duree="4 weeks",
+            resume="Always full",
+            max_students=1
+        )
+        self.students = [
+            Etudiant.objects.create(
+                nom=f"Student {name}",
+                email=f"{name}@test.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for name in ('alice', 'bob', 'carol', 'dave')
+        ]
+        self.first = reserve_seat(self.students[0], self.cours)
+        self.entries = [join_waitlist(student, self.cours) for student in self.students[1:]]
+
+    def enrolled(self):
+        return list(
+            Inscription.objects.filter(cours=self.cours, status='confirmed')
+            .order_by('etudiant_id').values_list('etudiant_id', flat=True)
+        )
+
+    def test_positions_are_fifo(self):
+        self.assertEqual([waitlist_position(entry) for entry in self.entries], [1, 2, 3])
+        self.assertEqual(
+            [entry.position for entry in waitlist_entries(self.students[2])],
+            [2]
+        )
+
+        self.students[3].user = User.objects.create_user(username='dave', password='testpass123')
+        self.students[3].save()
+        self.assertEqual(
+            [entry.position for entry in waitlist_entries(user=self.students[3].user)],
+            [3]
+        )
+
+    def test_entries_of_one_student(self):
+        user = User.objects.create_user(username='bob', password='testpass123')
+        with self.assertRaises(ValueError):
+            waitlist_entries()
+        with self.assertRaises(ValueError):
+            waitlist_entries(self.students[1], user=user)
+
+    def test_cancellation_promotes_first_waiter(self):
+        self.first.status = 'cancelled'
+        self.first.save()
+
+        self.assertEqual(self.enrolled(), [self.students[1].pk])
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 1)
+        self.assertEqual(waitlist_position(self.entries[2]), 2)
+
+    def test_raising_capacity_promotes_in_one_batch(self):
+        cours = Cours.objects.get(pk=self.cours.pk)
+        cours.max_students = 3
+        with self.assertNumQueries(10):
+            cours.save()
+
+        self.assertEqual(self.enrolled(), [s.pk for s in self.students[:3]])
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 3)
+        self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+    def test_saving_course_keeps_seat_counters(self):
+        self.cours.confirmed_count = 0
+        self.cours.nom = "Renamed Course"
+        self.cours.save()
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 1)
+
+    def test_already_enrolled_waiter_is_skipped(self):
+        Inscription.objects.create(etudiant=self.students[1], cours=self.cours, status='pending')
+        self.first.delete()
+
+        self.assertEqual(self.enrolled(), [self.students[2].pk])
+        self.assertFalse(WaitlistEntry.objects.filter(etudiant=self.students[1]).exists())
+
+    def test_course_choice_offers_waitlist(self):
+        form = CoursChoiceForm(data={'cours': self.cours.pk})
+        self.assertFalse(form.is_valid())
+
+        form = CoursChoiceForm(data={'cours': self.cours.pk, 'join_waitlist': 'on'})
+        self.assertTrue(form.is_valid())
+
+class ImportEnrollmentsTest(TestCase):
+    def setUp(self):
+        self.cours = Cours.objects.create(
+            nom="Imported Course",
+            prix=Decimal('50.00'),
+            duree="1 week",
+            resume="Partner school course",
+            max_students=2
+        )
+        Etudiant.objects.create(
+            nom="Existing Student",
+            email="existing@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+
+    def run_import(self, content, suffix='.csv', *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_enrollments', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_import_checks_emails_and_capacity_per_chunk(self):
+        rows = ["nom,email,telephone,date_naissance,cours,status"]
+        rows += [f"Student {chr(65 + i)},student{i}@test.com,+1234567890,1995-05-05,{self.cours.pk},confirmed" for i in range(3)]
+        rows += [
+            f"Existing Student,existing@test.com,+1234567890,1995-05-05,{self.cours.pk},pending",
+            "Bad Phone,badphone@test.com,12,1995-05-05,,",
+            "Student A,student0@test.com,+1234567890,1995-05-05,,",
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_import("\n".join(rows) + "\n", '.csv', '--chunk-size', '100')
+
+        self.assertLessEqual(len(queries), 10)
+        self.assertIn('6 rows', output)
+        self.assertIn('2 students and 2 enrollments imported, 4 rows rejected', output)
+        self.assertIn('Course %d is full' % self.cours.pk, output)
+        self.assertIn('A student with this email already exists.', output)
+        self.assertIn('Duplicate email in file', output)
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 2)
+
+    def test_ndjson_dry_run(self):
+        rows = [
+            json.dumps({'nom': 'Json Student', 'email': 'json@test.com', 'telephone': '+1234567890',
+                        'date_naissance': '1990-01-01', 'cours': self.cours.pk, 'status': 'pending'}),
+            'not json',
+        ]
+        output = self.run_import("\n".join(rows), '.ndjson', '--dry-run')
+
+        self.assertIn('1 students and 1 enrollments imported, 1 rows rejected (dry run)', output)
+        self.assertFalse(Etudiant.objects.filter(email='json@test.com').exists())
+
+    def test_dry_run_checks_across_chunks(self):
+        rows = ["nom,email,telephone,date_naissance,cours,status"]
+        rows += [f"Student {chr(65 + i)},student{i}@test.com,+1234567890,1995-05-05,{self.cours.pk},confirmed" for i in range(3)]
+        rows += ["Student A,student0@test.com,+1234567890,1995-05-05,,"]
+        output = self.run_import("\n".join(rows) + "\n", '.csv', '--chunk-size', '1', '--dry-run')
+
+        self.assertIn('2 students and 2 enrollments imported, 2 rows rejected (dry run)', output)
+        self.assertIn('Course %d is full' % self.cours.pk, output)
+        self.assertIn('A student with this email already exists.', output)
+        self.assertEqual(Cours.objects.get(pk=self.cours.pk).confirmed_count, 0)
+        self.assertFalse(Etudiant.objects.filter(email__startswith='student').exists())
+
+class PopulateCoursesTest(TestCase):
+    def populate(self, prefix, seed=3):
+        call_command(
+            'populate_courses', courses=20, students=30, inscriptions=200, seed=seed, prefix=prefix, stdout=StringIO()
+        )
+
+    def test_generated_volumes_and_counters(self):
+        self.populate('gen')
+        self.assertEqual(Cours.objects.count(), 20)
+        self.assertEqual(Etudiant.objects.filter(user__username__startswith='gen').count(), 30)
+        self.assertEqual(Inscription.objects.count(), 200)
+
+        # Seat counters rebuilt, no course confirmed over its capacity
+        for cours in Cours.objects.all():
+            confirmed = cours.inscriptions.filter(status='confirmed').count()
+            self.assertEqual(cours.confirmed_count, confirmed)
+            self.assertLessEqual(confirmed, cours.max_students)
+
+        inscription = Inscription.objects.order_by('-inscription_date').first()
+        self.assertLessEqual(inscription.inscription_date, timezone.now())
+        user = User.objects.get(username='gen0')
+        self.assertTrue(user.check_password('Student-pass-123'))
+        self.assertEqual(user.etudiant.email, 'gen0@example.com')
+
+    @mock.patch('gestion_inscriptions.synthetic.TRANSACTION_ROWS', 7)
+    def test_students_in_several_transactions(self):
+        self.populate('chunked')
+        students = Etudiant.objects.filter(user__username__startswith='chunked')
+        self.assertEqual(students.count(), 30)
+        # Each student belongs to the user of the same number
+        for student in students.select_related('user'):
+            self.assertEqual(student.email, student.user.email)
+        # Every student got its share of the inscriptions
+        self.assertEqual(Inscription.objects.count(), 200)
+        self.assertFalse(students.filter(inscriptions__isnull=True).exists())
+
+    def test_same_seed_same_data(self):
+        self.populate('first')
+        self.populate('second')
+        courses = list(Cours.objects.order_by('pk').values_list('nom', 'prix', 'category', 'max_students'))
+        self.assertEqual(courses[:20], courses[20:])
+
+    def test_too_many_inscriptions(self):
+        with self.assertRaises(CommandError):
+            call_command('populate_courses', courses=2, students=2, inscriptions=5, stdout=StringIO())
+        # Rejected before generating the courses and the students
+        self.assertFalse(Cours.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+class ExportRegistrationsTest(TestCase):
+    def setUp(self):
+        self.tech = Cours.objects.create(
+            nom="Tech Course", prix=Decimal('100.00'), duree="1 week", resume="Tech", category='tech'
+        )
+        self.arts = Cours.objects.create(
+            nom="Arts Course", prix=Decimal('80.00'), duree="1 week", resume="Arts", category='arts'
+        )
+        student = Etudiant.objects.create(
+            nom="Export Student",
+            email="export@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        Inscription.objects.create(etudiant=student, cours=self.tech, status='confirmed', payment_status=True)
+        Inscription.objects.create(etudiant=student, cours=self.arts, status='pending')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+
+    def test_streams_filtered_csv(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_registrations'), {'category': 'tech', 'payment': 'paid'})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('inscription_id,'))
+        self.assertIn('Tech Course', lines[1])
+
+    def test_requires_staff(self):
+        response = self.client.get(reverse('export_registrations'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_invalid_filters(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_registrations'), {'date_from': '2024-02-01', 'date_to': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_ndjson(self):
+        out = StringIO()
+        call_command('export_registrations', '--format', 'ndjson', '--status', 'pending', stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['cours_nom'] for row in rows], ['Arts Course'])
+
+class CourseSearchTest(TestCase):
+    def setUp(self):
+        self.python = Cours.objects.create(
+            nom="Python Programming", prix=Decimal('100.00'), duree="8 weeks",
+            resume="Learn to write scripts", category='tech'
+        )
+        self.data = Cours.objects.create(
+            nom="Data Analysis", prix=Decimal('100.00'), duree="8 weeks",
+            resume="Pandas and Python for analysts", category='science'
+        )
+        self.french = Cours.objects.create(
+            nom="Français débutant", prix=Decimal('80.00'), duree="6 weeks",
+            resume="Grammar and conversation", category='lang'
+        )
+
+    def test_index_available(self):
+        self.assertTrue(fts_enabled())
+
+    def test_prefix_match_ranks_name_first(self):
+        results = list(search_courses(Cours.objects.all(), 'pyth'))
+        self.assertEqual(results, [self.python, self.data])
+
+    def test_every_word_must_match(self):
+        results = search_courses(Cours.objects.all(), 'python analy')
+        self.assertEqual(list(results), [self.data])
+
+    def test_ignores_accents(self):
+        results = search_courses(Cours.objects.all(), 'francais')
+        self.assertEqual(list(results), [self.french])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.french.nom = "Spanish for travellers"
+        self.french.save()
+        self.assertFalse(search_courses(Cours.objects.all(), 'francais').exists())
+        self.assertTrue(search_courses(Cours.objects.all(), 'spanish').exists())
+
+        self.python.delete()
+        self.assertEqual(list(search_courses(Cours.objects.all(), 'python')), [self.data])
+
+    def test_view_keeps_category_filter(self):
+        self.client.force_login(User.objects.create_user(username='searcher', password='testpass123'))
+        response = self.client.get(reverse('courses_list'), {'search': 'python', 'category': 'science'})
+        self.assertEqual(list(response.context['page_obj']), [self.data])
+
+    def test_paginates_ranked_results(self):
+        paginator = KeysetPaginator(search_courses(Cours.objects.all(), 'python'), 1)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(first.object_list + second.object_list, [self.python, self.data])
+        self.assertFalse(second.has_next())
+
+    def test_rebuild_command(self):
+        Cours.objects.filter(pk=self.python.pk).update(nom="Rust Programming")
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(search_courses(Cours.objects.all(), 'rust')), [self.python])
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        # Two courses per name so the id breaks the ties
+        for name in ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo']:
+            for category in ['tech', 'arts']:
+                Cours.objects.create(
+                    nom=name, prix=Decimal('10.00'), duree="1 week",
+                    resume=f"{name} {category}", category=category
+                )
+        self.ordered = list(Cours.objects.order_by('nom', 'id'))
+
+    def test_walks_forward_and_back(self):
+        paginator = KeysetPaginator(Cours.objects.all(), 4)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([obj for page in pages for obj in page], self.ordered)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(back.object_list, pages[1].object_list)
+        self.assertEqual(paginator.page(back.previous_cursor).object_list, pages[0].object_list)
+
+    def test_deep_pages_do_not_use_offset(self):
+        paginator = KeysetPaginator(Cours.objects.all(), 4)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            paginator.page(cursor)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Cours.objects.all(), 4)
+        self.assertEqual(paginator.get_page('not-a-cursor').object_list, self.ordered[:4])
+
+    def test_catalog_api_keeps_filters(self):
+        self.client.force_login(User.objects.create_user(username='catalog', password='testpass123'))
+        response = self.client.get(reverse('courses_api'), {'category': 'arts'})
+        data = response.json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['approximate_count'], 5)
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(reverse('courses_list'), {'category': 'tech'})
+        self.assertEqual([c.category for c in response.context['page_obj']], ['tech'] * 5)
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_stats.reset()
+        self.tech = Cours.objects.create(
+            nom="Tech Course", prix=Decimal('100.00'), duree="1 week", resume="Tech", category='tech', max_students=5
+        )
+        self.arts = Cours.objects.create(
+            nom="Arts Course", prix=Decimal('80.00'), duree="1 week", resume="Arts", category='arts'
+        )
+        self.student = Etudiant.objects.create(
+            nom="Catalog Student",
+            email="catalog@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+
+    def test_second_lookup_is_a_hit(self):
+        catalog_page('tech')
+        with self.assertNumQueries(0):
+            page = catalog_page('tech')
+        self.assertEqual(list(page), [self.tech])
+        self.assertEqual(catalog_stats.as_dict()['hits'], 1)
+        self.assertEqual(catalog_stats.as_dict()['misses'], 1)
+
+    def test_course_change_invalidates(self):
+        self.assertEqual(featured_courses(), [self.arts, self.tech])
+        self.arts.nom = "Zen Arts"
+        self.arts.save()
+        self.assertEqual([c.nom for c in featured_courses()], ["Tech Course", "Zen Arts"])
+
+    def test_enrollment_invalidates_only_its_category(self):
+        catalog_page('tech')
+        catalog_page('arts')
+        Inscription.objects.create(etudiant=self.student, cours=self.tech, status='confirmed')
+
+        with self.assertNumQueries(0):
+            catalog_page('arts')
+        self.assertEqual(list(catalog_page('tech'))[0].available_slots, 4)
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Inscription.objects.create(etudiant=self.student, cours=self.tech, status='confirmed')
+            # What a reader could cache from the snapshot before the commit
+            catalog_page('tech')
+
+        catalog_page('tech')
+        self.assertEqual(catalog_stats.as_dict()['misses'], 2)
+
+    def test_seat_holds_invalidate(self):
+        catalog_page('tech')
+        hold_seat(self.student, self.tech)
+        self.assertEqual(list(catalog_page('tech'))[0].available_slots, 4)
+
+        release_holds(SeatHold.objects.all())
+        self.assertEqual(list(catalog_page('tech'))[0].available_slots, 5)
+
+    def test_waitlist_promotion_invalidates(self):
+        cours = Cours.objects.create(
+            nom="Tiny Course", prix=Decimal('10.00'), duree="1 week", resume="Tiny", category='tech', max_students=1
+        )
+        other = Etudiant.objects.create(
+            nom="Other Student", email="other@test.com", telephone="+1234567890", date_naissance=date(1990, 1, 1)
+        )
+        join_waitlist(self.student, cours)
+        catalog_page('tech')
+        Cours.objects.filter(pk=cours.pk).update(max_students=2)
+        reserve_seat(other, cours)
+        catalog_page('tech')
+
+        self.assertEqual(promote_waitlist(cours.pk), [self.student.pk])
+        self.assertEqual([c.available_slots for c in catalog_page('tech')], [5, 0])
+
+    def test_selection_form_uses_the_cache(self):
+        CoursChoiceForm()
+        with self.assertNumQueries(0):
+            form = CoursChoiceForm()
+        self.assertEqual(form.courses, [self.arts, self.tech])
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                catalog_page()
+                with self.assertNumQueries(0):
+                    self.assertEqual(len(catalog_page()), 2)
+                self.tech.delete()
+                self.assertEqual(list(catalog_page()), [self.arts])
+
+class EmailLoginTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='emailuser', email='login@test.com', password='Testpass123!')
+
+    def login(self, email, password='Testpass123!'):
+        return self.client.post(
+            reverse('login'), json.dumps({'email': email, 'password': password}), content_type='application/json'
+        )
+
+    def test_login_with_email(self):
+        response = self.login('login@test.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+
+    def test_wrong_password(self):
+        self.assertEqual(self.login('login@test.com', 'wrong').status_code, 400)
+        self.assertEqual(self.login('unknown@test.com').status_code, 400)
+
+    def test_lookup_uses_email_index(self):
+        query = User.objects.filter(email='login@test.com')[:2].query
+        sql, params = query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('auth_user_email_idx', plan)
+
+    def test_emails_are_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='other', email='login@test.com', password='Testpass123!')
+        # Accounts without an email are still allowed
+        User.objects.create_user(username='blank1')
+        User.objects.create_user(username='blank2')
+
+    def test_duplicate_emails_are_refused_not_500(self):
+        # Databases that had duplicates before the unique index
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX auth_user_email_uniq')
+        User.objects.create_user(username='twin', email='login@test.com', password='Testpass123!')
+
+        response = self.login('login@test.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+class PasswordHashingTest(TestCase):
+    signup_data = {
+        'name': 'New Student',
+        'email': 'new@test.com',
+        'password': 'Newpass123!',
+        'confirm_password': 'Newpass123!',
+        'terms': True,
+    }
+
+    def count_hashes(self):
+        """Patch PBKDF2 to record the thread of every hash"""
+        import django.utils.crypto
+        threads = []
+        original = django.utils.crypto.hashlib.pbkdf2_hmac
+
+        def pbkdf2_hmac(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return original(*args, **kwargs)
+
+        patcher = mock.patch.object(django.utils.crypto.hashlib, 'pbkdf2_hmac', pbkdf2_hmac)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return threads
+
+    def async_request(self, name, data):
+        request = AsyncRequestFactory().post(reverse(name), json.dumps(data), content_type='application/json')
+        request.session = SessionStore()
+        return request
+
+    def test_signup_hashes_once(self):
+        threads = self.count_hashes()
+        response = self.client.post(reverse('signup'), json.dumps(self.signup_data), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        user = User.objects.get(email='new@test.com')
+        self.assertTrue(user.check_password('Newpass123!'))
+        self.assertEqual((user.first_name, user.last_name), ('New', 'Student'))
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+
+    async def test_async_signup_hashes_in_the_pool(self):
+        threads = self.count_hashes()
+        request = self.async_request('signup', self.signup_data)
+        response = await signup_view_async(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hashing'))
+        user = await User.objects.aget(email='new@test.com')
+        self.assertEqual(await request.session.aget('_auth_user_id'), str(user.pk))
+
+    async def test_async_login(self):
+        await User.objects.acreate(username='async', email='async@test.com', password=make_password('Asyncpass1!'))
+        threads = self.count_hashes()
+
+        response = await login_view_async(self.async_request('login', {'email': 'async@test.com', 'password': 'Asyncpass1!'}))
+        self.assertEqual(response.status_code, 200)
+        response = await login_view_async(self.async_request('login', {'email': 'async@test.com', 'password': 'wrong'}))
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(all(name.startswith('password-hashing') for name in threads))
+
+def isolate_metrics(test):
+    """Record the metrics of ``test`` in a file of their own"""
+    # What this thread recorded so far goes to the file of the suite
+    metrics.flush()
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    metrics_settings = override_settings(
+        METRICS_DATABASE=os.path.join(directory.name, 'metrics.sqlite3'), METRICS_FLUSH_SECONDS=0
+    )
+    metrics_settings.enable()
+    test.addCleanup(metrics_settings.disable)
+
+@override_settings(LOGIN_THROTTLE_RATES={'ip': (3, 60), 'email': (2, 60)})
+class LoginThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        isolate_metrics(self)
+        # The requests all fall within one window
+        clock = mock.patch('gestion_inscriptions.throttling.time')
+        clock.start().time.return_value = 1010
+        self.addCleanup(clock.stop)
+        User.objects.create_user(username='throttled', email='throttle@test.com', password='Testpass123!')
+
+    def login(self, email, password='wrong'):
+        return self.client.post(
+            reverse('login'), json.dumps({'email': email, 'password': password}), content_type='application/json'
+        )
+
+    def test_email_bucket(self):
+        self.assertEqual(self.login('throttle@test.com').status_code, 400)
+        self.assertEqual(self.login('throttle@test.com').status_code, 400)
+
+        with mock.patch('gestion_inscriptions.views.authenticate') as authenticate:
+            response = self.login('throttle@test.com', 'Testpass123!')
+        self.assertEqual(response.status_code, 429)
+        # Until the end of the current minute
+        self.assertEqual(response['Retry-After'], '10')
+        authenticate.assert_not_called()
+        self.assertEqual(throttle_stats(), {'hashed': 2, 'rejected': 1})
+
+    def test_ip_bucket(self):
+        for i in range(3):
+            self.assertEqual(self.login(f'user{i}@test.com').status_code, 400)
+        self.assertEqual(self.login('throttle@test.com', 'Testpass123!').status_code, 429)
+
+    def test_signup_is_throttled(self):
+        data = {
+            'name': 'New Student', 'email': 'new@test.com', 'password': 'Newpass123!',
+            'confirm_password': 'Newpass123!', 'terms': True,
+        }
+        for i in range(3):
+            response = self.client.post(
+                reverse('signup'), json.dumps({**data, 'email': f'new{i}@test.com'}), content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('signup'), json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+
+    def test_limits_reset_with_the_window(self):
+        self.assertEqual(take_token('10.0.0.1', 'window@test.com', now=1000), 0)
+        self.assertEqual(take_token('10.0.0.1', 'window@test.com', now=1010), 0)
+        # The minute from 960 to 1020
+        self.assertEqual(take_token('10.0.0.1', 'window@test.com', now=1015), 5)
+        self.assertEqual(take_token('10.0.0.1', 'window@test.com', now=1020), 0)
+
+    def test_rejection_counts_against_neither_limit(self):
+        for i in range(2):
+            take_token(f'10.0.0.{i}', 'shared@test.com', now=1000)
+        self.assertGreater(take_token('10.0.0.9', 'shared@test.com', now=1000), 0)
+        self.assertGreater(take_token('10.0.0.9', 'shared@test.com', now=1000), 0)
+        # The IP still has its 3 attempts
+        for i in range(3):
+            self.assertEqual(take_token('10.0.0.9', f'other{i}@test.com', now=1000), 0)
+        self.assertGreater(take_token('10.0.0.9', 'other9@test.com', now=1000), 0)
+
+@override_settings(LOGIN_THROTTLE_RATES={'ip': (1000, 60), 'email': (5, 300)})
+class ConcurrentThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parallel_burst_gets_no_extra_attempt(self):
+        results = []
+        barrier = threading.Barrier(8)
+
+        def attempts(chunk):
+            barrier.wait()
+            for _ in chunk:
+                results.append(take_token('10.0.0.1', 'burst@test.com'))
+
+        run_concurrently(attempts, [range(4)] * 8)
+
+        self.assertEqual(len(results), 32)
+        self.assertEqual(results.count(0), 5)
+
+@override_settings(ROOT_URLCONF='inscription_cours.asgi_urls')
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='asyncuser', first_name='Async', password='testpass123')
+        self.student = Etudiant.objects.create(
+            user=self.user,
+            nom="Async Student",
+            email="asyncstudent@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.cours = Cours.objects.create(
+            nom="Async Course", prix=Decimal('50.00'), duree="2 weeks", resume="Async", category='tech'
+        )
+        Inscription.objects.create(etudiant=self.student, cours=self.cours, status='confirmed')
+
+    def test_routes_to_async_views(self):
+        self.assertIs(resolve(reverse('login')).func, login_view_async)
+        self.assertIs(resolve(reverse('dashboard')).func, dashboard_view)
+
+    def test_asgi_settings(self):
+        from inscription_cours import settings_asgi
+        self.assertEqual(settings_asgi.ROOT_URLCONF, 'inscription_cours.asgi_urls')
+
+    async def test_dashboard(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Welcome back')
+        self.assertEqual(response.context['user_student'], self.student)
+        self.assertEqual([i.cours.nom for i in response.context['user_inscriptions']], ["Async Course"])
+        self.assertEqual(response.context['available_courses'], [self.cours])
+
+    async def test_courses_list_and_registrations(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('courses_list'), {'search': 'async'})
+        self.assertEqual(list(response.context['page_obj']), [self.cours])
+
+        response = await self.async_client.get(reverse('my_registrations'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['inscriptions']), 1)
+
+    async def test_requires_login(self):
+        response = await self.async_client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_timing_counts_the_queries(self):
+        # The ORM queries run in another thread than the async middleware
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('dashboard'))
+        queries = int(response['Server-Timing'].split('desc="')[1].split(' ')[0])
+        self.assertGreater(queries, 0)
+
+    def test_middleware_is_async(self):
+        handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+
+class SessionWritesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sessionuser', password='testpass123')
+        Etudiant.objects.create(
+            user=self.user,
+            nom="Session Student",
+            email="session@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.cours = Cours.objects.create(
+            nom="Session Course", prix=Decimal('50.00'), duree="2 weeks", resume="Sessions", category='tech'
+        )
+        self.client.force_login(self.user)
+        # First write of the refresh timestamp
+        self.client.get(reverse('dashboard'))
+
+    def browse(self):
+        with CaptureQueriesContext(connection) as queries:
+            for name in ['dashboard', 'courses_list', 'my_registrations']:
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+        return session_writes(queries)
+
+    def test_read_only_views_do_not_write(self):
+        self.assertEqual(self.browse(), 0)
+
+    @override_settings(SESSION_REFRESH_THRESHOLD=0)
+    def test_refresh_threshold(self):
+        self.assertEqual(self.browse(), 3)
+
+    def test_wizard_state_in_signed_cookie(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertRedirects(response, reverse('confirmation'))
+        self.assertEqual(session_writes(queries), 0)
+        self.assertIn('wizard_course', response.cookies)
+
+        # Signed for this user only
+        other = User.objects.create_user(username='other', password='testpass123')
+        Etudiant.objects.create(
+            user=other,
+            nom="Other Student",
+            email="other@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.client.force_login(other)
+        self.client.cookies['wizard_course'] = response.cookies['wizard_course'].value
+        self.assertRedirects(self.client.get(reverse('confirmation')), reverse('etape2'), fetch_redirect_response=False)
+
+    @override_settings(WIZARD_STATE_STORAGE='session')
+    def test_wizard_state_in_session(self):
+        response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertRedirects(response, reverse('confirmation'))
+        self.assertEqual(self.client.session['selected_course_id'], self.cours.pk)
+        self.assertNotIn('wizard_course', response.cookies)
+
+class RequestTimingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='timinguser', password='testpass123')
+        Etudiant.objects.create(
+            user=self.user,
+            nom="Timing Student",
+            email="timing@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        Cours.objects.create(
+            nom="Timing Course", prix=Decimal('50.00'), duree="2 weeks", resume="Timings", category='tech'
+        )
+        self.client.force_login(self.user)
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('courses_list'))
+        metrics = self.server_timing(response)
+        self.assertEqual(set(metrics), {'db', 'template', 'session', 'hashing', 'view', 'total'})
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(metrics['template']['dur']), 0)
+        self.assertLessEqual(float(metrics['view']['dur']), float(metrics['total']['dur']))
+
+    def test_log_line(self):
+        with self.assertLogs('gestion_inscriptions.timing', 'INFO') as logs:
+            self.client.get(reverse('dashboard'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(record['view'], 'dashboard')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('slowest_queries', record)
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=1.0)
+    def test_slow_requests_with_their_sql(self):
+        with self.assertLogs('gestion_inscriptions.timing', 'WARNING') as logs:
+            self.client.get(reverse('my_registrations'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['slowest_queries'])
+        self.assertIn('SELECT', record['slowest_queries'][0]['sql'])
+
+        with override_settings(SLOW_REQUEST_SAMPLE_RATE=0), self.assertLogs('gestion_inscriptions.timing', 'INFO') as logs:
+            self.client.get(reverse('my_registrations'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+
+    @override_settings(SLOW_REQUEST_MS=150, SLOW_REQUEST_SAMPLE_RATE=1.0)
+    def test_hashing_is_not_slow(self):
+        def slow_hash(password):
+            time.sleep(0.2)
+            return make_password(password)
+
+        with mock.patch('gestion_inscriptions.views.make_password', slow_hash), \
+                self.assertLogs('gestion_inscriptions.timing', 'INFO') as logs:
+            response = Client().post(reverse('signup'), json.dumps({
+                'name': 'Timing Signup',
+                'email': 'timingsignup@test.com',
+                'password': 'Newpass123!',
+                'confirm_password': 'Newpass123!',
+                'terms': True,
+            }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertGreaterEqual(record['hashing_ms'], 200)
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', Client().get(reverse('courses_list')))
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        isolate_metrics(self)
+        self.user = User.objects.create_user(username='metricsuser', password='testpass123')
+        self.student = Etudiant.objects.create(
+            user=self.user,
+            nom="Metrics Student",
+            email="metrics@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.cours = Cours.objects.create(
+            nom="Metrics Course", prix=Decimal('50.00'), duree="2 weeks", resume="Metrics",
+            category='tech', max_students=2
+        )
+        self.client.force_login(self.user)
+
+    def samples(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return dict(
+            line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#')
+        )
+
+    def test_view_histograms(self):
+        for i in range(3):
+            self.client.get(reverse('dashboard'))
+        samples = self.samples()
+        self.assertEqual(samples['inscription_request_duration_seconds_count{view="dashboard"}'], '3')
+        self.assertEqual(samples['inscription_request_duration_seconds_bucket{view="dashboard",le="+Inf"}'], '3')
+        self.assertEqual(samples['inscription_request_queries_count{view="dashboard"}'], '3')
+        self.assertGreater(int(samples['inscription_response_size_bytes_bucket{view="dashboard",le="1048576"}']), 0)
+        # Cumulative buckets
+        buckets = [
+            int(value) for sample, value in samples.items()
+            if sample.startswith('inscription_request_queries_bucket{view="dashboard"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))
+
+    def test_processes_add_up(self):
+        self.client.get(reverse('dashboard'))
+        # Another worker: its own increments and its own connection to the file
+        thread = threading.Thread(target=lambda: (
+            metrics.observe('inscription_request_duration_seconds', 0.2, metrics.labels(view='dashboard')),
+            metrics.flush()
+        ))
+        thread.start()
+        thread.join()
+        samples = self.samples()
+        self.assertEqual(samples['inscription_request_duration_seconds_count{view="dashboard"}'], '2')
+        self.assertEqual(samples['inscription_request_duration_seconds_bucket{view="dashboard",le="0.25"}'], '2')
+
+    def test_enrollment_counters(self):
+        others = [
+            Etudiant.objects.create(
+                nom="Other Student", email=f"other{i}-metrics@test.com", telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for i in range(2)
+        ]
+        reserve_seat(self.student, self.cours)
+        with self.assertRaises(AlreadyEnrolledError):
+            reserve_seat(self.student, self.cours)
+        reserve_seat(others[0], self.cours)
+        with self.assertRaises(CourseFullError):
+            reserve_seat(others[1], self.cours)
+        samples = self.samples()
+        self.assertEqual(samples['inscription_enrollments_total{outcome="confirmed"}'], '2')
+        self.assertEqual(samples['inscription_enrollments_total{outcome="duplicate"}'], '1')
+        self.assertEqual(samples['inscription_enrollments_total{outcome="full"}'], '1')
+
+    def test_full_course_rejected_at_step2(self):
+        others = [
+            Etudiant.objects.create(
+                nom="Other Student", email=f"other{i}-step2@test.com", telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for i in range(3)
+        ]
+        reserve_seat(others[0], self.cours)
+        reserve_seat(others[1], self.cours)
+
+        # Validating the form counts nothing, the view does
+        self.assertFalse(CoursChoiceForm({'cours': self.cours.pk}, etudiant=self.student).is_valid())
+        self.assertNotIn('inscription_enrollments_total{outcome="full"}', self.samples())
+
+        # Rejected by the form
+        response = self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SeatHold.objects.exists())
+        # And by hold_seat, when the course filled up after the form checked it
+        with self.assertRaises(CourseFullError):
+            hold_seat(others[2], self.cours)
+
+        samples = self.samples()
+        self.assertEqual(samples['inscription_enrollments_total{outcome="full"}'], '2')
+
+    def test_flushed_without_another_request(self):
+        # A request starts the flusher thread
+        self.client.get(reverse('auth'))
+        thread = threading.Thread(target=metrics.increment, args=('inscription_enrollments_total', 'outcome="full"'))
+        thread.start()
+        thread.join()
+        # Written by the flusher thread, within a second here
+        connection = sqlite3.connect(settings.METRICS_DATABASE)
+        self.addCleanup(connection.close)
+        connection.execute(metrics.SCHEMA)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            rows = connection.execute(
+                "SELECT value FROM metrics WHERE name = 'inscription_enrollments_total'"
+            ).fetchall()
+            if rows:
+                break
+        self.assertEqual(rows, [(1.0,)])
+
+    def test_restricted(self):
+        response = Client(REMOTE_ADDR='192.0.2.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+class AdminTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@test.com', 'testpass123')
+        self.client.force_login(self.admin)
+        create_search_courses(30)
+        self.courses = list(Cours.objects.order_by('id'))
+        self.students = [
+            Etudiant.objects.create(
+                nom=f"{name} Student", email=f"{name.lower()}@test.com", telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for name in ['Amine', 'Sara', 'Omar']
+        ]
+        for student in self.students:
+            for cours in self.courses[:3]:
+                Inscription.objects.create(etudiant=student, cours=cours, status='confirmed')
+
+    def changelist(self, model, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:gestion_inscriptions_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    @mock.patch.object(EstimatedCountPaginator, 'exact_below', 0)
+    def test_changelists_without_count_or_per_row_queries(self):
+        for model in ['cours', 'etudiant', 'inscription']:
+            with self.subTest(model=model):
+                response, queries = self.changelist(model)
+                self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql.upper() and 'GROUP BY' not in sql.upper()])
+                self.assertLessEqual(len(queries), 10)
+
+        response, _ = self.changelist('etudiant')
+        self.assertEqual([student.registrations for student in response.context['cl'].result_list], [3, 3, 3])
+
+    def test_estimated_count(self):
+        # Small tables are counted
+        self.assertEqual(EstimatedCountPaginator(Inscription.objects.all(), 100).count, 9)
+        with CaptureQueriesContext(connection) as queries:
+            estimate = estimated_count(Inscription.objects.all(), exact_below=0)
+        self.assertEqual(estimate, Inscription.objects.order_by('-pk').first().pk)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+        self.assertEqual(estimated_count(Inscription.objects.filter(etudiant=self.students[0])), 3)
+
+    def test_search(self):
+        response, _ = self.changelist('etudiant', {'q': 'sar'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.students[1]])
+        response, _ = self.changelist('etudiant', {'q': 'omar@test.com'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.students[2]])
+        response, _ = self.changelist('inscription', {'q': 'amine'})
+        self.assertEqual({i.etudiant for i in response.context['cl'].result_list}, {self.students[0]})
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Om', 'app_label': 'gestion_inscriptions', 'model_name': 'inscription', 'field_name': 'etudiant'
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Omar Student'])
+        response = self.client.get(reverse('admin:gestion_inscriptions_inscription_add'))
+        self.assertNotContains(response, 'Sara Student')
+
+    def test_add_confirmed_inscription_claims_the_seat(self):
+        cours = self.courses[5]
+        response = self.client.post(reverse('admin:gestion_inscriptions_inscription_add'), {
+            'etudiant': self.students[0].pk, 'cours': cours.pk, 'status': 'confirmed', 'notes': ''
+        })
+        self.assertEqual(response.status_code, 302)
+        cours.refresh_from_db()
+        self.assertEqual(cours.confirmed_count, 1)
+        self.assertEqual(CourseOccupancy.objects.get(cours=cours).confirmed, 1)
+
+    def test_seat_taken_after_validation(self):
+        cours = self.courses[5]
+        url = reverse('admin:gestion_inscriptions_inscription_add')
+        # Filled up between InscriptionForm.clean() and the save
+        with mock.patch('gestion_inscriptions.admin.save_inscription', side_effect=CourseFullError('Course is full')):
+            response = self.client.post(url, {
+                'etudiant': self.students[0].pk, 'cours': cours.pk, 'status': 'confirmed', 'notes': ''
+            }, follow=True)
+        self.assertRedirects(response, url)
+        self.assertContains(response, 'Not saved: Course is full.')
+        self.assertFalse(Inscription.objects.filter(cours=cours).exists())
+
+
+class SQLiteProfileTest(TestCase):
+    def load_settings(self, profile=None):
+        """The settings module run with INSCRIPTION_COURS_DB_PROFILE=profile, or unset"""
+        with mock.patch.dict(os.environ):
+            os.environ.pop('INSCRIPTION_COURS_DB_PROFILE', None)
+            if profile is not None:
+                os.environ['INSCRIPTION_COURS_DB_PROFILE'] = profile
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'inscription_cours', 'settings.py'))
+
+    def production_connection(self):
+        """A connection with the production profile, to a file of its own"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        production = type(connections['default'])({
+            **connection.settings_dict,
+            **settings.PRODUCTION_CONNECTION_SETTINGS,
+            'NAME': os.path.join(directory.name, 'production.sqlite3'),
+        }, 'default')
+        self.addCleanup(production.close)
+        with override_settings(SQLITE_PRAGMAS=settings.PRODUCTION_SQLITE_PRAGMAS):
+            production.ensure_connection()
+        return production
+
+    def test_development_by_default(self):
+        values = self.load_settings()
+        self.assertEqual(values['DATABASE_PROFILE'], 'development')
+        self.assertEqual(values['SQLITE_PRAGMAS'], {})
+        self.assertNotIn('CONN_MAX_AGE', values['DATABASES']['default'])
+
+    def test_production_profile(self):
+        values = self.load_settings('production')
+        self.assertEqual(values['SQLITE_PRAGMAS'], values['PRODUCTION_SQLITE_PRAGMAS'])
+        self.assertEqual(values['DATABASES']['default']['CONN_MAX_AGE'], 600)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings('prod')
+
+    def test_connection_pragmas(self):
+        pragmas = sqlite_pragmas(self.production_connection())
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        # NORMAL
+        self.assertEqual(pragmas['synchronous'], 1)
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+        self.assertEqual(pragmas['mmap_size'], 268435456)
+
+    def test_new_connections_are_tuned(self):
+        new_connection = connections.create_connection('default')
+        try:
+            with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -4000}):
+                new_connection.ensure_connection()
+            pragmas = sqlite_pragmas(new_connection)
+            self.assertEqual(pragmas['busy_timeout'], 1234)
+            self.assertEqual(pragmas['cache_size'], -4000)
+        finally:
+            new_connection.close()
+
+    def test_invalid_pragma(self):
+        with self.assertRaises(ValueError):
+            apply_sqlite_pragmas(connection, {'journal_mode': 'wal; DROP TABLE auth_user'})
+
+    def test_persistent_connections(self):
+        production = self.production_connection()
+        self.assertEqual(production.settings_dict['CONN_MAX_AGE'], 600)
+        self.assertTrue(production.settings_dict['CONN_HEALTH_CHECKS'])
+        self.assertEqual(production.transaction_mode, 'IMMEDIATE')
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='replicauser', password='testpass123')
+        Etudiant.objects.create(
+            user=self.user,
+            nom="Replica Student",
+            email="replica@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.cours = Cours.objects.create(
+            nom="Replica Course", prix=Decimal('50.00'), duree="2 weeks", resume="Replicas", category='tech'
+        )
+        self.router = ReplicaRouter()
+        patcher = mock.patch('gestion_inscriptions.routers.replicas', return_value=['replica'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # setUp wrote: start like a fresh request
+        pin_primary(False)
+        self.addCleanup(pin_primary, False)
+
+    def outside_transaction(self):
+        # The test case itself runs in a transaction
+        return mock.patch.object(connection, 'in_atomic_block', False)
+
+    def test_catalog_reads_go_to_replica(self):
+        with self.outside_transaction():
+            self.assertEqual(self.router.db_for_read(Cours), 'replica')
+            self.assertEqual(self.router.db_for_read(Inscription), 'default')
+            self.assertEqual(self.router.db_for_write(Cours), 'default')
+
+    def test_write_pins_primary(self):
+        with self.outside_transaction():
+            self.router.db_for_write(Inscription)
+            self.assertEqual(self.router.db_for_read(Cours), 'default')
+
+    def test_reads_in_transaction_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Cours), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'gestion_inscriptions'))
+        self.assertIsNone(self.router.allow_migrate('default', 'gestion_inscriptions'))
+
+    def test_read_your_writes_after_confirmation(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('etape2'), {'cours': self.cours.pk})
+        with mock.patch('gestion_inscriptions.middleware.replicas', return_value=['replica']):
+            response = self.client.post(reverse('confirmation'))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('db_primary', response.cookies)
+
+            # The next request carries the cookie and reads the primary
+            self.client.get(reverse('courses_list'))
+            self.assertTrue(primary_pinned())
+            del self.client.cookies['db_primary']
+            self.client.get(reverse('courses_list'))
+            self.assertFalse(primary_pinned())
+
+class ReplicaSyncTest(TransactionTestCase):
+    def test_copy_sqlite_database(self):
+        Cours.objects.create(
+            nom="Replica Course", prix=Decimal('50.00'), duree="2 weeks", resume="Replicas", category='tech'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            copy_sqlite_database('default', path)
+            with closing(sqlite3.connect(path)) as replica:
+                names = replica.execute(f"SELECT nom FROM {Cours._meta.db_table}").fetchall()
+        self.assertEqual(names, [('Replica Course',)])
+
+class QueryPlanTest(TestCase):
+    """The queries of the views and forms must not scan whole tables"""
+
+    # Plan lines reading a table through an index, or no table at all
+    INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'VIRTUAL TABLE INDEX', 'CONSTANT ROW')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='planuser', email='plan@test.com', password='testpass123', is_staff=True
+        )
+        self.student = Etudiant.objects.create(
+            user=self.user,
+            nom="Plan Student",
+            email="plan@test.com",
+            telephone="+1234567890",
+            date_naissance=date(1990, 1, 1)
+        )
+        self.courses = [
+            Cours.objects.create(
+                nom=f"Plan Course {i}", prix=Decimal('50.00'), duree="2 weeks",
+                resume="Query plans", category=['tech', 'lang', 'arts'][i % 3]
+            )
+            for i in range(12)
+        ]
+        Inscription.objects.create(etudiant=self.student, cours=self.courses[0], status='confirmed')
+        self.client.force_login(self.user)
+
+    def browse(self):
+        """Go through every view once, with and without the optional filters"""
+        self.client.get(reverse('auth'))
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('etape1'))
+        self.client.get(reverse('etape2'))
+        self.client.post(reverse('etape2'), {'cours': self.courses[1].pk})
+        self.client.get(reverse('confirmation'))
+        self.client.post(reverse('confirmation'))
+        self.client.get(reverse('my_registrations'))
+        page = self.client.get(reverse('courses_list')).context['page_obj']
+        self.client.get(reverse('courses_list'), {'cursor': page.next_cursor})
+        self.client.get(reverse('courses_list'), {'category': 'tech'})
+        self.client.get(reverse('courses_list'), {'search': 'plan'})
+        self.client.get(reverse('courses_api'), {'category': 'lang'})
+        self.client.get(reverse('catalog_cache_stats'))
+        self.client.get(reverse('login_throttle_stats'))
+        self.client.get(reverse('metrics'))
+        self.client.post(reverse('logout'))
+        self.client.post(reverse('login'), {'email': 'plan@test.com', 'password': 'testpass123'})
+        self.client.post(reverse('signup'), {
+            'name': 'New Student', 'email': 'new@test.com',
+            'password': 'Complex-pass-123!', 'confirm_password': 'Complex-pass-123!', 'terms': 'on'
+        })
+
+    def test_no_full_table_scan(self):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')) and (sql, params) not in queries:
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            self.browse()
+        self.assertGreater(len(queries), 20)
+
+        scans = []
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                for *_, detail in cursor.fetchall():
+                    if detail.startswith('SCAN') and not any(marker in detail for marker in self.INDEXED):
+                        scans.append(f'{detail}: {sql}')
+        self.assertEqual(scans, [])
+
+PERFORMANCE_PASSWORD = 'Perf-pass-123'
+
+class ViewQueryCountTest(TestCase):
+    """Every URL runs the number of SQL queries in query_counts.json, for a
+    user without a student profile, a typical and a heavy student: a count
+    that grows with the registrations is an N+1.
+
+    A failure lists the queries that ran, update the file along with the fix.
+    """
+    QUERY_COUNTS = os.path.join(os.path.dirname(__file__), 'query_counts.json')
+
+    # URL name: (method, data for a user kind)
+    REQUESTS = {
+        'auth': ('get', None),
+        'login': ('post', lambda kind: {'email': f'perf-{kind}@test.com', 'password': PERFORMANCE_PASSWORD}),
+        'signup': ('post', lambda kind: {
+            'name': 'New Student', 'email': f'new-{kind}@test.com', 'terms': 'on',
+            'password': 'Complex-pass-123!', 'confirm_password': 'Complex-pass-123!'
+        }),
+        'logout': ('post', None),
+        'etape1': ('get', None),
+        'etape2': ('get', None),
+        'confirmation': ('post', None),
+        'dashboard': ('get', None),
+        'courses_list': ('get', None),
+        'my_registrations': ('get', None),
+        'courses_api': ('get', lambda kind: {'category': 'tech'}),
+        'export_registrations': ('get', None),
+        'catalog_cache_stats': ('get', None),
+        'login_throttle_stats': ('get', None),
+        'metrics': ('get', None),
+    }
+
+    # Registrations of each kind of user, None for no student profile
+    REGISTRATIONS = {'empty': None, 'typical': 3, 'heavy': 40}
+
+    @classmethod
+    def setUpTestData(cls):
+        create_search_courses(300)
+        cls.courses = list(Cours.objects.order_by('id'))
+        cls.users = {}
+        for kind, registrations in cls.REGISTRATIONS.items():
+            cls.users[kind] = User.objects.create_user(
+                username=f'perf-{kind}', email=f'perf-{kind}@test.com', password=PERFORMANCE_PASSWORD, is_staff=True
+            )
+            if registrations is None:
+                continue
+            student = Etudiant.objects.create(
+                user=cls.users[kind],
+                nom=f"Perf {kind}",
+                email=f"perf-{kind}@test.com",
+                telephone="+1234567890",
+                date_naissance=date(1990, 1, 1)
+            )
+            for cours in cls.courses[:registrations]:
+                Inscription.objects.create(etudiant=student, cours=cours, status='confirmed')
+            for cours in cls.courses[registrations:registrations + registrations // 3]:
+                WaitlistEntry.objects.create(etudiant=student, cours=cours)
+
+    def check_query_counts(self, kind):
+        with open(self.QUERY_COUNTS) as counts_file:
+            counts = json.load(counts_file)
+
+        for pattern in app_urlpatterns():
+            name = pattern.name
+            with self.subTest(url=name, user=kind):
+                self.assertIn(name, self.REQUESTS, f'No request to measure {name}')
+                self.assertIn(name, counts, f'No query count for {name} in query_counts.json')
+                method, data = self.REQUESTS[name]
+
+                cache.clear()
+                client = Client()
+                client.force_login(self.users[kind])
+                if name == 'confirmation':
+                    client.post(reverse('etape2'), {'cours': self.courses[-1].pk})
+                with self.assertNumQueries(counts[name][kind]):
+                    response = getattr(client, method)(reverse(name), data(kind) if data else {})
+                    if response.streaming:
+                        # The queries of a streamed export run while it is read
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 500)
+
+    def test_user_without_profile(self):
+        self.check_query_counts('empty')
+
+    def test_typical_student(self):
+        self.check_query_counts('typical')
+
+    def test_heavy_student(self):
+        self.check_query_counts('heavy')
+
+# The threads' connections don't see the test mirror of a replica
+@override_settings(DATABASE_REPLICAS=[])
+class ReservationStressTest(TransactionTestCase):
+    def test_no_overbooking_under_contention(self):
+        report = run_reservation_stress(threads=8, attempts=120, capacity=25)
+
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['confirmed'], 25)
+        self.assertEqual(report['full'], 95)
+        self.assertEqual(report['overbooked'], 0)
+        self.assertEqual(report['seat_counter'], 25)
+        self.assertGreater(report['seats_per_second'], 0)
+
 # Docker configuration - Dockerfile
 DOCKERFILE = '''
 FROM python:3.11-slim
@@ -479,37 +2229,6 @@ class Command(BaseCommand):
         )
 '''
 
-# Performance monitoring middleware
-PERFORMANCE_MIDDLEWARE = '''
-import time
-import logging
-from django.utils.deprecation import MiddlewareMixin
-
-logger = logging.getLogger(__name__)
-
-class PerformanceMonitoringMiddleware(MiddlewareMixin):
-    """Monitor request performance and log slow requests"""
-    
-    def process_request(self, request):
-        request.start_time = time.time()
-    
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            
-            # Log slow requests (over 2 seconds)
-            if duration > 2.0:
-                logger.warning(
-                    f'Slow request: {request.method} {request.path} '
-                    f'took {duration:.2f}s - User: {request.user}'
-                )
-            
-            # Add performance header for debugging
-            response['X-Response-Time'] = f'{duration:.3f}s'
-        
-        return response
-'''
-
 # Security middleware for additional protection
 SECURITY_MIDDLEWARE = '''
 from django.utils.deprecation import MiddlewareMixin
@@ -557,7 +2276,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
-from .models import Cours, Etudiant, Inscription
+from .models import Cours, Etudiant, Inscription, SeatHold, WaitlistEntry
 from .serializers import CoursSerializer, EtudiantSerializer, InscriptionSerializer
 
 class CoursViewSet(viewsets.ReadOnlyModelViewSet):
@@ -636,7 +2355,7 @@ class InscriptionViewSet(viewsets.ReadOnlyModelViewSet):
 # Serializers for API
 SERIALIZERS = '''
 from rest_framework import serializers
-from .models import Cours, Etudiant, Inscription
+from .models import Cours, Etudiant, Inscription, SeatHold, WaitlistEntry
 
 class CoursSerializer(serializers.ModelSerializer):
     available_slots = serializers.ReadOnlyField()
@@ -708,51 +2427,6 @@ echo "Deployment completed successfully!"
 #   YOUR_SLACK_WEBHOOK_URL
 '''
 
-# Load testing script with locust
-LOAD_TEST = '''
-from locust import HttpUser, task, between
-import random
-
-class CourseRegistrationUser(HttpUser):
-    wait_time = between(1, 3)
-    
-    def on_start(self):
-        """Login user"""
-        self.client.post("/auth/login/", json={
-            "email": "test@example.com",
-            "password": "testpass123"
-        })
-    
-    @task(3)
-    def view_dashboard(self):
-        """View dashboard"""
-        self.client.get("/")
-    
-    @task(2)
-    def browse_courses(self):
-        """Browse courses"""
-        self.client.get("/courses/")
-        
-        # Filter by category
-        categories = ['tech', 'business', 'arts', 'science', 'lang']
-        category = random.choice(categories)
-        self.client.get(f"/courses/?category={category}")
-    
-    @task(1)
-    def view_registrations(self):
-        """View my registrations"""
-        self.client.get("/my-registrations/")
-    
-    @task(1)
-    def search_courses(self):
-        """Search courses"""
-        search_terms = ['python', 'design', 'business', 'language']
-        term = random.choice(search_terms)
-        self.client.get(f"/courses/?search={term}")
-
-# To run: locust -f locustfile.py --host=http://localhost:8000
-'''
-
 print("Enhanced Django Course Registration System completed!")
 print("\n=== Key Improvements Made ===")
 print("✅ Enhanced Models with proper relationships and validation")
@@ -0,0 +1,102 @@
+# throttling.py - Counters capping the password hashes per IP and per email
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from . import metrics
+
+THROTTLE_CACHE_ALIAS = getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+
+# (attempts, per this many seconds)
+DEFAULT_RATES = {
+    'ip': (30, 60),
+    'email': (10, 300),
+}
+
+ATTEMPTS = 'inscription_login_attempts_total'
+COUNTERS = ('hashed', 'rejected')
+
+
+def _rates():
+    return {**DEFAULT_RATES, **getattr(settings, 'LOGIN_THROTTLE_RATES', {})}
+
+
+def client_ip(request):
+    # Behind a proxy, have it set REMOTE_ADDR: X-Forwarded-For can be forged
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _counter_key(kind, value, window):
+    return f'throttle:{kind}:' + hashlib.md5(value.strip().lower().encode()).hexdigest() + f':{window}'
+
+
+def _hit(cache, key, timeout):
+    """Count an attempt in ``key``, returns the attempts of its window so far"""
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def take_token(ip, email, now=None):
+    """Count an attempt against the IP and the email limits, or against none of them.
+
+    Returns 0 when the attempt may go on, else the seconds to wait. Each limit
+    is a counter per fixed window in THROTTLE_CACHE_ALIAS, taken with add()
+    and incr(), which the cache runs atomically: concurrent attempts never
+    get past the limit, and the counters expire with their window. A refused
+    attempt gives its counts back.
+    """
+    now = time.time() if now is None else now
+    cache = caches[THROTTLE_CACHE_ALIAS]
+    rates = _rates()
+
+    counted = []
+    wait = 0
+    for kind, value in (('ip', ip), ('email', email)):
+        if not value:
+            continue
+        limit, seconds = rates[kind]
+        window, elapsed = divmod(now, seconds)
+        key = _counter_key(kind, value, int(window))
+        counted.append(key)
+        if _hit(cache, key, math.ceil(seconds - elapsed)) > limit:
+            wait = max(wait, seconds - elapsed)
+
+    if wait:
+        for key in counted:
+            try:
+                cache.decr(key)
+            except ValueError:
+                pass
+        record('rejected')
+    return wait
+
+
+def record(counter):
+    """Count a 'hashed' or 'rejected' attempt in the metrics shared by the processes"""
+    metrics.increment(ATTEMPTS, metrics.labels(outcome=counter))
+
+
+def throttle_stats():
+    values = metrics.collect()
+    return {
+        counter: int(values.get((ATTEMPTS, metrics.labels(outcome=counter), ''), 0))
+        for counter in COUNTERS
+    }
+
+
+def throttled_response(wait):
+    seconds = max(1, math.ceil(wait))
+    response = JsonResponse({
+        'success': False,
+        'error': f'Too many attempts, please try again in {seconds} seconds'
+    }, status=429)
+    response['Retry-After'] = str(seconds)
+    return response
@@ -0,0 +1,103 @@
+# timing.py - Where the time of a request goes, see RequestTimingMiddleware
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Milliseconds spent per part of the request, and the SQL statements run"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+        # (sql, milliseconds) of every statement, formatted only for slow requests
+        self.statements = []
+
+    def add(self, name, milliseconds):
+        self.durations[name] = self.durations.get(name, 0) + milliseconds
+
+    def add_query(self, sql, milliseconds):
+        self.queries += 1
+        self.durations['db'] = self.durations.get('db', 0) + milliseconds
+        self.statements.append((sql, milliseconds))
+
+    def total(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def slowest_queries(self, limit=5):
+        return [
+            {'sql': sql, 'ms': round(milliseconds, 3)}
+            for sql, milliseconds in sorted(self.statements, key=lambda statement: -statement[1])[:limit]
+        ]
+
+    def repeated_queries(self, limit=5):
+        """Statements run more than once, the N+1 suspects"""
+        counts = Counter(sql for sql, _ in self.statements)
+        return [{'sql': sql, 'count': count} for sql, count in counts.most_common(limit) if count > 1]
+
+
+def current_timings():
+    """Timings of the request being served, None outside RequestTimingMiddleware"""
+    return _current.get()
+
+
+def start_timings():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop_timings(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time of the body to ``name`` in the current request timings"""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper counting the statements in the current request timings"""
+    timings = current_timings()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, (time.perf_counter() - start) * 1000)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        # The included templates render inside, the lazy querysets they
+        # evaluate count in both template and db
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates adding the render time of every template to the request timings"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -3,15 +3,39 @@
 from django.urls import path
 from . import views
 
-urlpatterns = [
-    # Authentication URLs
-    path('auth/', views.auth_view, name='auth'),
-    path('auth/login/', views.login_view, name='login'),
-    path('auth/signup/', views.signup_view, name='signup'),
-    path('auth/logout/', views.logout_view, name='logout'),
-    
-    # Existing URLs (now protected)
-    path('', views.etape1_view, name='etape1'),  
-    path('etape2/', views.etape2_view, name='etape2'),
-    path('confirmation/', views.confirmation_view, name='confirmation'),
-]
\ No newline at end of file
+
+def app_urlpatterns(async_views=False):
+    """Routes of the app. inscription_cours/asgi_urls.py asks for the async
+    login and signup views: the password hashing runs in a worker pool instead
+    of holding a thread per request. The other views are sync under both
+    handlers, their work is all ORM and template rendering"""
+    def view(sync_view, async_view):
+        return async_view if async_views else sync_view
+
+    return [
+        # Authentication URLs
+        path('auth/', views.auth_view, name='auth'),
+        path('auth/login/', view(views.login_view, views.login_view_async), name='login'),
+        path('auth/signup/', view(views.signup_view, views.signup_view_async), name='signup'),
+        path('auth/logout/', views.logout_view, name='logout'),
+        
+        # Existing URLs (now protected)
+        path('', views.etape1_view, name='etape1'),  
+        path('etape2/', views.etape2_view, name='etape2'),
+        path('confirmation/', views.confirmation_view, name='confirmation'),
+        
+        # Student area
+        path('dashboard/', views.dashboard_view, name='dashboard'),
+        path('courses/', views.courses_list_view, name='courses_list'),
+        path('my-registrations/', views.my_registrations_view, name='my_registrations'),
+        path('api/courses/', views.courses_api_view, name='courses_api'),
+        
+        # Staff exports
+        path('exports/registrations/', views.export_registrations_view, name='export_registrations'),
+        path('staff/catalog-cache/', views.catalog_cache_stats_view, name='catalog_cache_stats'),
+        path('staff/login-throttle/', views.login_throttle_stats_view, name='login_throttle_stats'),
+        path('metrics', views.metrics_view, name='metrics'),
+    ]
+
+
+urlpatterns = app_urlpatterns()
@@ -1,19 +1,33 @@
 # Enhanced views.py
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import aauthenticate, alogin, authenticate, login, logout
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.urls import reverse
+from django.utils.http import urlencode
 import json
 import logging
-from .models import Etudiant, Cours, Inscription
-from .forms import EtudiantForm, CoursChoiceForm
-from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from .models import Etudiant, Cours, Inscription, SeatHold
+from .forms import EtudiantForm, CoursChoiceForm, ExportFilterForm
+from .exports import EXPORT_FORMATS, registrations_queryset
+from . import metrics
+from .hashing import run_hasher
+from .throttling import client_ip, record as record_attempt, take_token, throttle_stats, throttled_response
+from .catalog import catalog_page, featured_courses, stats as catalog_cache_stats
+from .occupancy import is_full_for
+from .reservations import ENROLLMENTS, AlreadyEnrolledError, CourseFullError, hold_seat, reserve_seat
+from .student_stats import student_stats
+from .timing import timed
+from .wizard import clear_selected_course, select_course, selected_course_id
+from .waitlist import join_waitlist, waitlist_entries, waitlist_position
 from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
@@ -24,155 +38,243 @@ def auth_view(request):
         return redirect('dashboard')
     return render(request, 'auths.html')
 
+# Recorded in the session of the users logged in right after their signup
+EMAIL_BACKEND = 'gestion_inscriptions.backends.EmailBackend'
+
+def _login_data(request):
+    """Email, password and remember-me flag of a JSON or form login request"""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+        return data.get('email', '').strip(), data.get('password', ''), data.get('remember_me', False)
+    return (
+        request.POST.get('email', '').strip(),
+        request.POST.get('password', ''),
+        request.POST.get('remember-me') == 'on'
+    )
+
+def _login_success(request, email, remember_me):
+    # Set session expiry
+    if not remember_me:
+        request.session.set_expiry(0)
+    else:
+        request.session.set_expiry(1209600)  # 2 weeks
+    
+    logger.info(f"User {email} logged in successfully")
+    return JsonResponse({
+        'success': True,
+        'message': 'Login successful',
+        'redirect_url': reverse('dashboard')
+    })
+
+def _login_error(error, status=400):
+    return JsonResponse({
+        'success': False,
+        'error': error
+    }, status=status)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def login_view(request):
     """Handle login requests with improved error handling"""
     try:
-        if request.content_type == 'application/json':
-            data = json.loads(request.body)
-            email = data.get('email', '').strip()
-            password = data.get('password', '')
-            remember_me = data.get('remember_me', False)
-        else:
-            email = request.POST.get('email', '').strip()
-            password = request.POST.get('password', '')
-            remember_me = request.POST.get('remember-me') == 'on'
-        
+        email, password, remember_me = _login_data(request)
         if not email or not password:
-            return JsonResponse({
-                'success': False,
-                'error': 'Email and password are required'
-            }, status=400)
+            return _login_error('Email and password are required')
         
-        # Find user by email
-        try:
-            User = get_user_model()
-            user_obj = User.objects.get(email=email)
-            username = user_obj.username
-        except User.DoesNotExist:
-            return JsonResponse({
-                'success': False,
-                'error': 'Invalid email or password'
-            }, status=400)
+        # Refuse over-limit attempts before hashing anything
+        wait = take_token(client_ip(request), email)
+        if wait:
+            return throttled_response(wait)
+        record_attempt('hashed')
         
-        # Authenticate user
-        user = authenticate(request, username=username, password=password)
+        # One indexed lookup by email and one password check, see EmailBackend
+        user = authenticate(request, email=email, password=password)
+        if user is None or not user.is_active:
+            return _login_error('Invalid email or password')
         
-        if user is not None and user.is_active:
-            login(request, user)
-            
-            # Set session expiry
-            if not remember_me:
-                request.session.set_expiry(0)
-            else:
-                request.session.set_expiry(1209600)  # 2 weeks
-            
-            logger.info(f"User {email} logged in successfully")
-            return JsonResponse({
-                'success': True,
-                'message': 'Login successful',
-                'redirect_url': reverse('dashboard')
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': 'Invalid email or password'
-            }, status=400)
+        login(request, user)
+        return _login_success(request, email, remember_me)
             
     except json.JSONDecodeError:
-        return JsonResponse({
-            'success': False,
-            'error': 'Invalid JSON data'
-        }, status=400)
+        return _login_error('Invalid JSON data')
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
-        return JsonResponse({
-            'success': False,
-            'error': 'An error occurred during login'
-        }, status=500)
+        return _login_error('An error occurred during login', status=500)
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def signup_view(request):
-    """Handle signup requests with improved validation"""
+async def login_view_async(request):
+    """login_view for the ASGI entry point: the password check runs in the
+    hashing pool instead of blocking the event loop"""
     try:
-        if request.content_type == 'application/json':
-            data = json.loads(request.body)
-        else:
-            data = request.POST
-        
-        name = data.get('name', '').strip()
-        email = data.get('email', '').strip()
-        password = data.get('password', '')
-        confirm_password = data.get('confirm_password', '')
-        terms = data.get('terms', False)
+        email, password, remember_me = _login_data(request)
+        if not email or not password:
+            return _login_error('Email and password are required')
         
-        # Validation
-        errors = {}
+        wait = await sync_to_async(take_token)(client_ip(request), email)
+        if wait:
+            return throttled_response(wait)
+        await sync_to_async(record_attempt)('hashed')
         
-        if not name:
-            errors['name'] = 'Name is required'
-        elif len(name) < 2:
-            errors['name'] = 'Name must be at least 2 characters'
+        user = await aauthenticate(request, email=email, password=password)
+        if user is None or not user.is_active:
+            return _login_error('Invalid email or password')
         
-        if not email:
-            errors['email'] = 'Email is required'
-        elif User.objects.filter(email=email).exists():
-            errors['email'] = 'Email already exists'
+        await alogin(request, user)
+        return _login_success(request, email, remember_me)
+            
+    except json.JSONDecodeError:
+        return _login_error('Invalid JSON data')
+    except Exception as e:
+        logger.error(f"Login error: {str(e)}")
+        return _login_error('An error occurred during login', status=500)
+
+def _signup_data(request):
+    """Name, email, password, confirmation and terms of a JSON or form signup request"""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+    else:
+        data = request.POST
+    
+    return (
+        data.get('name', '').strip(),
+        data.get('email', '').strip(),
+        data.get('password', ''),
+        data.get('confirm_password', ''),
+        data.get('terms', False)
+    )
+
+def _signup_errors(name, email, password, confirm_password, terms, email_taken):
+    errors = {}
+    
+    if not name:
+        errors['name'] = 'Name is required'
+    elif len(name) < 2:
+        errors['name'] = 'Name must be at least 2 characters'
+    
+    if not email:
+        errors['email'] = 'Email is required'
+    elif email_taken:
+        errors['email'] = 'Email already exists'
+    
+    # Password validation
+    if not password:
+        errors['password'] = 'Password is required'
+    elif len(password) < 8:
+        errors['password'] = 'Password must be at least 8 characters'
+    elif not any(c.isupper() for c in password):
+        errors['password'] = 'Password must contain at least one uppercase letter'
+    elif not any(c.isdigit() for c in password):
+        errors['password'] = 'Password must contain at least one number'
+    elif not any(c in '!@#$%^&*(),.?":{}|<>' for c in password):
+        errors['password'] = 'Password must contain at least one special character'
+    
+    if password != confirm_password:
+        errors['confirm_password'] = 'Passwords do not match'
+    
+    if not terms:
+        errors['terms'] = 'You must accept the terms and conditions'
+    
+    return errors
+
+def _new_user(name, email, hashed_password):
+    """Unsaved user, like create_user() but with an already hashed password"""
+    names = name.split()
+    user = User(
+        username=User.normalize_username(email),
+        email=User.objects.normalize_email(email),
+        first_name=names[0] if names else name,
+        last_name=' '.join(names[1:])
+    )
+    user.password = hashed_password
+    return user
+
+def _signup_success(email):
+    logger.info(f"New user {email} registered successfully")
+    return JsonResponse({
+        'success': True,
+        'message': 'Account created successfully',
+        'redirect_url': reverse('dashboard')
+    })
+
+def _signup_errors_response(errors):
+    return JsonResponse({
+        'success': False,
+        'errors': errors
+    }, status=400)
+
+def _signup_error():
+    return JsonResponse({
+        'success': False,
+        'error': 'An error occurred during signup'
+    }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def signup_view(request):
+    """Handle signup requests with improved validation"""
+    try:
+        name, email, password, confirm_password, terms = _signup_data(request)
+        errors = _signup_errors(
+            name, email, password, confirm_password, terms,
+            email_taken=bool(email) and User.objects.filter(email=email).exists()
+        )
+        if errors:
+            return _signup_errors_response(errors)
         
-        # Password validation
-        if not password:
-            errors['password'] = 'Password is required'
-        elif len(password) < 8:
-            errors['password'] = 'Password must be at least 8 characters'
-        elif not any(c.isupper() for c in password):
-            errors['password'] = 'Password must contain at least one uppercase letter'
-        elif not any(c.isdigit() for c in password):
-            errors['password'] = 'Password must contain at least one number'
-        elif not any(c in '!@#$%^&*(),.?":{}|<>' for c in password):
-            errors['password'] = 'Password must contain at least one special character'
+        wait = take_token(client_ip(request), email)
+        if wait:
+            return throttled_response(wait)
+        record_attempt('hashed')
         
-        if password != confirm_password:
-            errors['confirm_password'] = 'Passwords do not match'
+        # Create user, hashing the password once
+        with timed('hashing'):
+            hashed = make_password(password)
+        with transaction.atomic():
+            user = _new_user(name, email, hashed)
+            user.save()
+            
+            # Auto login after signup: the password was just set, no need to check it again
+            login(request, user, backend=EMAIL_BACKEND)
         
-        if not terms:
-            errors['terms'] = 'You must accept the terms and conditions'
+        return _signup_success(email)
         
+    except IntegrityError:
+        # Lost a race with another signup using the same email (unique email index)
+        return _signup_errors_response({'email': 'Email already exists'})
+    except Exception as e:
+        logger.error(f"Signup error: {str(e)}")
+        return _signup_error()
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def signup_view_async(request):
+    """signup_view for the ASGI entry point, hashing in the hashing pool"""
+    try:
+        name, email, password, confirm_password, terms = _signup_data(request)
+        errors = _signup_errors(
+            name, email, password, confirm_password, terms,
+            email_taken=bool(email) and await User.objects.filter(email=email).aexists()
+        )
         if errors:
-            return JsonResponse({
-                'success': False,
-                'errors': errors
-            }, status=400)
+            return _signup_errors_response(errors)
         
-        # Create user
-        with transaction.atomic():
-            user = User.objects.create_user(
-                username=email,
-                email=email,
-                password=password,
-                first_name=name.split()[0] if name.split() else name,
-                last_name=' '.join(name.split()[1:]) if len(name.split()) > 1 else ''
-            )
-            
-            # Auto login after signup
-            user = authenticate(request, username=email, password=password)
-            if user:
-                login(request, user)
+        wait = await sync_to_async(take_token)(client_ip(request), email)
+        if wait:
+            return throttled_response(wait)
+        await sync_to_async(record_attempt)('hashed')
         
-        logger.info(f"New user {email} registered successfully")
-        return JsonResponse({
-            'success': True,
-            'message': 'Account created successfully',
-            'redirect_url': reverse('dashboard')
-        })
+        user = _new_user(name, email, await run_hasher(make_password, password))
+        await user.asave()
+        await alogin(request, user, backend=EMAIL_BACKEND)
         
+        return _signup_success(email)
+        
+    except IntegrityError:
+        return _signup_errors_response({'email': 'Email already exists'})
     except Exception as e:
         logger.error(f"Signup error: {str(e)}")
-        return JsonResponse({
-            'success': False,
-            'error': 'An error occurred during signup'
-        }, status=500)
+        return _signup_error()
 
 @login_required
 def logout_view(request):
@@ -186,18 +288,25 @@ def dashboard_view(request):
     """User dashboard showing enrolled courses and available courses"""
     user_student = None
     user_inscriptions = []
+    user_waitlist = []
+    stats = None
     
     try:
         user_student = Etudiant.objects.get(user=request.user)
-        user_inscriptions = Inscription.objects.filter(etudiant=user_student).select_related('cours')
+        # The 3 latest, the counts come from the statistics
+        user_inscriptions = list(Inscription.objects.filter(etudiant=user_student).select_related('cours')[:3])
+        user_waitlist = waitlist_entries(user_student)
+        stats = student_stats(user_student.pk)
     except Etudiant.DoesNotExist:
         pass
     
-    available_courses = Cours.objects.filter(is_active=True)[:6]  # Show 6 latest courses
+    available_courses = featured_courses(6)
     
     context = {
         'user_student': user_student,
         'user_inscriptions': user_inscriptions,
+        'stats': stats,
+        'user_waitlist': user_waitlist,
         'available_courses': available_courses,
     }
     return render(request, 'dashboard.html', context)
@@ -249,7 +358,7 @@ def etape2_view(request):
         return redirect('etape1')
     
     if request.method == "POST":
-        form = CoursChoiceForm(request.POST)
+        form = CoursChoiceForm(request.POST, etudiant=student)
         if form.is_valid():
             cours = form.cleaned_data['cours']
             
@@ -258,14 +367,26 @@ def etape2_view(request):
                 messages.warning(request, 'You are already enrolled in this course.')
                 return redirect('dashboard')
             
-            # Check available slots
-            if cours.available_slots <= 0:
-                messages.error(request, 'This course is full. Please choose another course.')
+            # Queue for a full course
+            if form.cleaned_data['join_waitlist'] and is_full_for(cours, student):
+                entry = join_waitlist(student, cours)
+                messages.info(
+                    request,
+                    f'This course is full. You are number {waitlist_position(entry)} on its waitlist.'
+                )
+                return redirect('dashboard')
+            
+            # Keep a seat aside until the registration is confirmed
+            try:
+                hold_seat(student, cours)
+            except CourseFullError:
+                messages.error(request, 'This course is full. Please choose another course or join its waitlist.')
                 return render(request, 'etape2.html', {'form': form})
             
-            # Store course selection in session
-            request.session['selected_course_id'] = cours.id
-            return redirect('confirmation')
+            # Remember the selection for the confirmation step
+            return select_course(request, redirect('confirmation'), cours.id)
+        if form.has_error('cours', code='full'):
+            metrics.increment(ENROLLMENTS, metrics.labels(outcome='full'))
     else:
         form = CoursChoiceForm()
     
@@ -280,7 +401,7 @@ def confirmation_view(request):
         messages.error(request, 'Please complete your profile first.')
         return redirect('etape1')
     
-    course_id = request.session.get('selected_course_id')
+    course_id = selected_course_id(request)
     if not course_id:
         messages.error(request, 'Please select a course first.')
         return redirect('etape2')
@@ -293,67 +414,75 @@ def confirmation_view(request):
     
     if request.method == "POST":
         try:
-            with transaction.atomic():
-                # Final check for availability
-                if cours.available_slots <= 0:
-                    messages.error(request, 'This course is full.')
-                    return redirect('etape2')
-                
-                # Create inscription
-                inscription = Inscription.objects.create(
-                    etudiant=student,
-                    cours=cours,
-                    status='confirmed'
-                )
-                
-                # Clear session
-                request.session.pop('selected_course_id', None)
-                
-                messages.success(request, 'Registration completed successfully!')
-                return render(request, 'confirmation_success.html', {
-                    'etudiant': student,
-                    'cours': cours,
-                    'inscription': inscription
-                })
-                
+            # Claims the seat and creates the inscription in one transaction
+            inscription = reserve_seat(student, cours)
+        except CourseFullError:
+            messages.error(request, 'This course is full.')
+            return redirect('etape2')
+        except AlreadyEnrolledError:
+            messages.warning(request, 'You are already enrolled in this course.')
+            return clear_selected_course(request, redirect('dashboard'))
         except Exception as e:
             logger.error(f"Registration error: {str(e)}")
             messages.error(request, 'An error occurred during registration.')
+        else:
+            messages.success(request, 'Registration completed successfully!')
+            response = render(request, 'confirmation_success.html', {
+                'etudiant': student,
+                'cours': cours,
+                'inscription': inscription
+            })
+            return clear_selected_course(request, response)
     
     context = {
         'etudiant': student,
         'cours': cours,
+        'hold': SeatHold.objects.filter(etudiant=student, cours=cours).first(),
     }
     return render(request, 'confirmation.html', context)
 
 @login_required
 def courses_list_view(request):
     """List all available courses with pagination and filtering"""
-    courses = Cours.objects.filter(is_active=True)
-    
-    # Filter by category
     category = request.GET.get('category')
-    if category:
-        courses = courses.filter(category=category)
-    
-    # Search
     search = request.GET.get('search')
-    if search:
-        courses = courses.filter(nom__icontains=search)
-    
-    # Pagination
-    paginator = Paginator(courses, 9)  # 9 courses per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = catalog_page(category, search, request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
         'categories': Cours.CATEGORY_CHOICES,
         'current_category': category,
         'search_query': search,
+        'filter_query': urlencode({
+            key: value for key, value in (('search', search), ('category', category)) if value
+        }),
     }
     return render(request, 'courses_list.html', context)
 
+@login_required
+def courses_api_view(request):
+    """JSON version of the course catalog, paginated with the same cursors"""
+    page_obj = catalog_page(
+        request.GET.get('category'), request.GET.get('search'), request.GET.get('cursor')
+    )
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': cours.pk,
+                'nom': cours.nom,
+                'category': cours.category,
+                'prix': str(cours.prix),
+                'duree': cours.duree,
+                'available_slots': cours.available_slots,
+            }
+            for cours in page_obj
+        ],
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'approximate_count': page_obj.count,
+    })
+
 @login_required
 def my_registrations_view(request):
     """View user's registrations"""
@@ -368,3 +497,38 @@ def my_registrations_view(request):
         'inscriptions': inscriptions,
         'student': student
     })
+
+@staff_member_required
+def catalog_cache_stats_view(request):
+    """Hit/miss counters of the catalog cache in this process"""
+    return JsonResponse(catalog_cache_stats.as_dict())
+
+@staff_member_required
+def login_throttle_stats_view(request):
+    """Attempts that went on to hash a password versus those refused by the throttle"""
+    return JsonResponse(throttle_stats())
+
+def metrics_view(request):
+    """Latency histograms and enrollment counters of every worker process, in
+    the Prometheus text format. For METRICS_ALLOWED_IPS and staff members"""
+    if client_ip(request) not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@staff_member_required
+def export_registrations_view(request):
+    """Stream every registration matching the filters as CSV or NDJSON"""
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+    
+    export_format = form.cleaned_data['format']
+    content_type, lines = EXPORT_FORMATS[export_format]
+    inscriptions = registrations_queryset(**form.export_filters())
+    
+    response = StreamingHttpResponse(lines(inscriptions), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="registrations.{export_format}"'
+    return response
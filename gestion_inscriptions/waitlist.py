@@ -0,0 +1,112 @@
+# waitlist.py - FIFO waitlists for full courses
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from .catalog import invalidate_catalog
+from .models import Cours, Inscription, WaitlistEntry
+from .reservations import AlreadyEnrolledError
+from .student_stats import invalidate_student_stats
+
+
+def join_waitlist(etudiant, cours):
+    """Queue ``etudiant`` for a seat in ``cours``, returns the waitlist entry"""
+    if Inscription.objects.filter(etudiant=etudiant, cours=cours).exists():
+        raise AlreadyEnrolledError(f"Student {etudiant.pk} is already enrolled in course {cours.pk}")
+    entry, _ = WaitlistEntry.objects.get_or_create(etudiant=etudiant, cours=cours)
+    return entry
+
+
+def leave_waitlist(etudiant, cours):
+    return WaitlistEntry.objects.filter(etudiant=etudiant, cours=cours).delete()[0] > 0
+
+
+def waitlist_position(entry):
+    """1-based position of ``entry`` in its course queue"""
+    return WaitlistEntry.objects.filter(cours_id=entry.cours_id, id__lte=entry.id).count()
+
+
+def waitlist_entries(etudiant=None, user=None):
+    """Waitlist entries of ``etudiant`` (or of the student of ``user``) with
+    their course and a ``position`` annotation"""
+    if (etudiant is None) == (user is None):
+        raise ValueError("Pass either etudiant or user")
+    ahead = WaitlistEntry.objects.filter(
+        cours=OuterRef('cours'),
+        id__lte=OuterRef('id')
+    ).order_by().values('cours').annotate(total=Count('pk')).values('total')
+    if etudiant is None:
+        entries = WaitlistEntry.objects.filter(etudiant__user=user)
+    else:
+        entries = WaitlistEntry.objects.filter(etudiant=etudiant)
+    return entries.select_related('cours').annotate(
+        position=Subquery(ahead, output_field=IntegerField())
+    )
+
+
+def promote_waitlist(cours_id, batch_size=500):
+    """Give the free seats of a course to the first waiters, in one transaction.
+
+    Only the promoted entries (and those of waiters who got enrolled some other
+    way) are read, through the (cours, id) index, so the cost does not grow with
+    the length of the queue. Returns the ids of the promoted students.
+    """
+    if not WaitlistEntry.objects.filter(cours_id=cours_id).exists():
+        return []
+
+    promoted = []
+    with transaction.atomic():
+        while True:
+            cours = Cours.objects.filter(pk=cours_id).order_by().values(
+                'max_students', 'confirmed_count', 'held_count', 'category'
+            ).first()
+            if cours is None:
+                break
+
+            if cours['max_students']:
+                free = cours['max_students'] - cours['confirmed_count'] - cours['held_count']
+            else:
+                free = batch_size
+            if free <= 0:
+                break
+
+            limit = min(free, batch_size)
+            entries = list(
+                WaitlistEntry.objects.filter(cours_id=cours_id).order_by('id').values_list(
+                    'pk', 'etudiant_id'
+                )[:limit]
+            )
+            if not entries:
+                break
+
+            enrolled = set(
+                Inscription.objects.filter(
+                    cours_id=cours_id,
+                    etudiant_id__in=[etudiant_id for _, etudiant_id in entries]
+                ).order_by().values_list('etudiant_id', flat=True)
+            )
+            waiters = [etudiant_id for _, etudiant_id in entries if etudiant_id not in enrolled]
+
+            if waiters:
+                # Claim all the seats at once, bulk_create doesn't go through the seat signals
+                claimed = Cours.objects.filter(pk=cours_id).filter(
+                    Q(max_students=0) |
+                    Q(max_students__gte=F('confirmed_count') + F('held_count') + len(waiters))
+                ).update(confirmed_count=F('confirmed_count') + len(waiters))
+                if not claimed:
+                    # Seats were taken in the meantime, look again
+                    continue
+
+                Inscription.objects.bulk_create([
+                    Inscription(etudiant_id=etudiant_id, cours_id=cours_id, status='confirmed')
+                    for etudiant_id in waiters
+                ])
+                invalidate_student_stats(*waiters)
+                invalidate_catalog(cours['category'])
+                promoted.extend(waiters)
+
+            WaitlistEntry.objects.filter(pk__in=[pk for pk, _ in entries]).delete()
+
+            # Stop once every free seat is given or the queue is exhausted
+            if len(waiters) == free or len(entries) < limit:
+                break
+
+    return promoted
@@ -0,0 +1,50 @@
+# wizard.py - State of the registration wizard between its steps
+from django.conf import settings
+
+COURSE_COOKIE = 'wizard_course'
+COURSE_SESSION_KEY = 'selected_course_id'
+# Longest time between the course selection and the confirmation
+COURSE_COOKIE_MAX_AGE = 24 * 3600
+
+
+def _in_session():
+    # WIZARD_STATE_STORAGE 'cookie': a signed cookie, the session isn't written
+    return getattr(settings, 'WIZARD_STATE_STORAGE', 'cookie') == 'session'
+
+
+def _salt(request):
+    # Bind the cookie to the user, it can't be replayed by another account
+    return f'wizard-course:{request.user.pk}'
+
+
+def selected_course_id(request):
+    """Id of the course chosen at step 2, or None"""
+    if _in_session():
+        return request.session.get(COURSE_SESSION_KEY)
+    value = request.get_signed_cookie(COURSE_COOKIE, default=None, salt=_salt(request), max_age=COURSE_COOKIE_MAX_AGE)
+    return int(value) if value and value.isdigit() else None
+
+
+def select_course(request, response, cours_id):
+    """Remember ``cours_id`` for the next steps, returns ``response``"""
+    if _in_session():
+        request.session[COURSE_SESSION_KEY] = cours_id
+    else:
+        response.set_signed_cookie(
+            COURSE_COOKIE,
+            str(cours_id),
+            salt=_salt(request),
+            max_age=COURSE_COOKIE_MAX_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax'
+        )
+    return response
+
+
+def clear_selected_course(request, response):
+    if _in_session():
+        request.session.pop(COURSE_SESSION_KEY, None)
+    elif COURSE_COOKIE in request.COOKIES:
+        response.delete_cookie(COURSE_COOKIE, samesite='Lax')
+    return response
@@ -11,6 +11,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inscription_cours.settings')
+# Serves the async views, see ROOT_URLCONF in settings_asgi
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inscription_cours.settings_asgi')
 
 application = get_asgi_application()
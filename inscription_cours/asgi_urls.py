@@ -0,0 +1,9 @@
+# URLconf of the ASGI entry point: the same routes, with the async views
+from django.contrib import admin
+from django.urls import path, include
+from gestion_inscriptions.urls import app_urlpatterns
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include(app_urlpatterns(async_views=True))),
+]
@@ -1,5 +1,7 @@
 import os
+from copy import deepcopy
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,20 +31,45 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Server-Timing header and timing log lines, see REQUEST_TIMING_ENABLED
+    'gestion_inscriptions.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Sends the requests following a write to the primary database
+    'gestion_inscriptions.middleware.ReadReplicaMiddleware',
+    # Writes sessions only when they change, see SESSION_REFRESH_THRESHOLD
+    'gestion_inscriptions.middleware.LowWriteSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gestion_inscriptions.middleware.ViewTimingMiddleware',
 ]
 
+# Per-request timings: the requests over SLOW_REQUEST_MS, password hashing
+# excluded, are logged as warnings with their SQL, SLOW_REQUEST_SAMPLE_RATE of
+# them; the others at INFO level on the gestion_inscriptions.timing logger
+REQUEST_TIMING_ENABLED = True
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+
+# Per-view latency histograms and enrollment counters, see
+# gestion_inscriptions.metrics: each worker process adds its own to the
+# METRICS_DATABASE SQLite file every METRICS_FLUSH_SECONDS and at exit,
+# from a thread started by its first request unless METRICS_FLUSH_THREAD is off;
+# /metrics serves the totals to these addresses and to staff members
+METRICS_DATABASE = os.environ.get('INSCRIPTION_COURS_METRICS_DB', BASE_DIR / 'metrics.sqlite3')
+METRICS_FLUSH_SECONDS = 5
+METRICS_FLUSH_THREAD = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# settings_asgi.py, used by asgi.py, routes to the async versions of the views
 ROOT_URLCONF = 'inscription_cours.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates timing the renders for RequestTimingMiddleware
+        'BACKEND': 'gestion_inscriptions.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'], 
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,9 +91,67 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Database profile, INSCRIPTION_COURS_DB_PROFILE:
+# - 'development' (default): SQLite's own defaults, a rollback journal and a
+#   new connection per request
+# - 'production': SQLite in WAL mode so readers don't block the writer, the
+#   pragmas below and connections kept open between requests
+# bench_sqlite measures both.
+DATABASE_PROFILE = os.environ.get('INSCRIPTION_COURS_DB_PROFILE', 'development')
+
+PRODUCTION_CONNECTION_SETTINGS = {
+    'CONN_MAX_AGE': 600,
+    # Reconnect when a kept connection went away instead of failing the request
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # Take the write lock when the transaction starts: a deferred
+        # transaction upgrading to a write can't wait for busy_timeout
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+PRODUCTION_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    # Safe with WAL: a power loss may only drop the last transactions
+    'synchronous': 'normal',
+    'cache_size': -20000,  # KiB, 20 MB of page cache per connection
+    'mmap_size': 268435456,  # 256 MB
+    'busy_timeout': 5000,  # ms to wait for the write lock
+}
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update(deepcopy(PRODUCTION_CONNECTION_SETTINGS))
+    # Applied to every new connection by gestion_inscriptions.signals
+    SQLITE_PRAGMAS = dict(PRODUCTION_SQLITE_PRAGMAS)
+elif DATABASE_PROFILE == 'development':
+    SQLITE_PRAGMAS = {}
+else:
+    raise ImproperlyConfigured(
+        f"INSCRIPTION_COURS_DB_PROFILE must be 'development' or 'production', not {DATABASE_PROFILE!r}"
+    )
+
+# Read replicas: catalog and reporting reads go to DATABASE_REPLICAS, see
+# gestion_inscriptions.routers. INSCRIPTION_COURS_REPLICA=1 adds a second
+# SQLite file as replica, refreshed by `manage.py sync_replica --interval N`;
+# keep N well under CATALOG_CACHE_TIMEOUT or listings get cached stale.
+DATABASE_ROUTERS = ['gestion_inscriptions.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+if os.environ.get('INSCRIPTION_COURS_REPLICA') == '1':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        # The tests read the replica through the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+# Seconds the requests following a write keep reading the primary
+REPLICA_PIN_SECONDS = 5
+
 
 
 
@@ -115,6 +200,11 @@ X_FRAME_OPTIONS = 'DENY'
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
 CSRF_COOKIE_HTTPONLY = True
 # Authentication settings
+# Users log in with their email, the admin keeps using usernames
+AUTHENTICATION_BACKENDS = [
+    'gestion_inscriptions.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_URL = '/auth/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/auth/'
@@ -122,4 +212,44 @@ LOGOUT_REDIRECT_URL = '/auth/'
 # Session settings (optional - for remember me functionality)
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+# Saving every request wrote django_session on each page view; the session
+# middleware writes unchanged sessions at most once per threshold instead
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_THRESHOLD = 3600
+# Sessions are read from the cache, the database is only hit on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Where the registration wizard keeps the selected course: 'cookie' (signed
+# cookie, no session write) or 'session'
+WIZARD_STATE_STORAGE = 'cookie'
+
+# Caches: local memory by default. Use a shared backend when running several
+# processes so they see the same catalog, e.g. FileBasedCache with
+# 'LOCATION': BASE_DIR / 'cache', or DatabaseCache after `createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inscription-cours',
+    },
+}
+
+# Cache holding the course catalog, see gestion_inscriptions.catalog
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60
+
+# Threads hashing passwords for the async views (defaults to the CPU count)
+PASSWORD_HASHING_WORKERS = None
+
+# Login and signup attempts allowed per client IP and per email before any
+# password is hashed: (attempts, per this many seconds). The counters live in
+# THROTTLE_CACHE_ALIAS: with the LocMemCache above each worker process counts
+# on its own, point it at a cache shared by the processes (Memcached, Redis)
+# to share the limits.
+LOGIN_THROTTLE_RATES = {
+    'ip': (30, 60),
+    'email': (10, 300),
+}
+THROTTLE_CACHE_ALIAS = 'default'
+
+# Seat holds taken at step 2 of the registration, in seconds
+SEAT_HOLD_TTL = 600
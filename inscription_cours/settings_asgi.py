@@ -0,0 +1,5 @@
+# Settings of the ASGI entry point, see asgi.py
+from .settings import *  # noqa: F401,F403
+
+# The same routes, with the async login and signup views
+ROOT_URLCONF = 'inscription_cours.asgi_urls'